@@ -0,0 +1,210 @@
+"""
+JSON API для чтения новостей и комментариев.
+
+Ответы собираются прямо из строк values_list(): модели не создаются,
+шаблоны не рендерятся. Параметр fields= оставляет в ответе только
+перечисленные поля, и только они читаются из базы. Списки отдаются
+страницами по курсору: курсор — закодированные значения сортировки
+последней строки, поэтому следующая страница читается по индексу
+без OFFSET.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date, datetime
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import generic
+
+from .models import Comment, News, comment_count
+
+# Поле ответа -> выражение для values_list().
+NEWS_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'date': 'date',
+    'excerpt': 'excerpt',
+    'views': 'views',
+    'comment_count': 'comment_count',
+}
+NEWS_DETAIL_FIELDS = {**NEWS_FIELDS, 'text': 'text'}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+# Наибольший id: BigAutoField хранит 64-битное целое.
+MAX_ID = 2 ** 63 - 1
+NEWS_DEFAULT_FIELDS = ('id', 'title', 'date', 'excerpt', 'comment_count')
+COMMENT_DEFAULT_FIELDS = tuple(COMMENT_FIELDS)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(
+        json.dumps(values).encode()
+    ).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)
+        ))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequest('Некорректный курсор.')
+
+
+class ApiView(generic.View):
+    """Общая часть ответов API: выбор полей, ETag и заголовки кэша."""
+    fields = {}
+    default_fields = ()
+
+    def get_fields(self):
+        requested = self.request.GET.get('fields')
+        if not requested:
+            return self.default_fields
+        names = tuple(dict.fromkeys(
+            name.strip() for name in requested.split(',') if name.strip()
+        ))
+        unknown = set(names) - set(self.fields)
+        if unknown or not names:
+            raise BadRequest(
+                'Неизвестные поля: ' + ', '.join(sorted(unknown))
+            )
+        return names
+
+    def get(self, request, *args, **kwargs):
+        try:
+            payload = self.get_payload(self.get_fields())
+        except BadRequest as error:
+            return JsonResponse(
+                {'error': str(error)}, status=HTTPStatus.BAD_REQUEST
+            )
+        response = JsonResponse(payload)
+        etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.NEWS_API_MAX_AGE
+        )
+        return get_conditional_response(
+            request, etag=etag, response=response
+        )
+
+    def get_payload(self, fields):
+        raise NotImplementedError
+
+    def rows(self, queryset, fields, extra=()):
+        """
+        Словари с полями fields из строк queryset и сами строки.
+
+        Поля extra (нужные для курсора) читаются в конец строки,
+        но в словари не попадают.
+        """
+        lookups = [self.fields[name] for name in fields] + list(extra)
+        rows = list(queryset.values_list(*lookups))
+        return [dict(zip(fields, row)) for row in rows], rows
+
+
+class CursorListApi(ApiView):
+    """
+    Список страницами по NEWS_API_PAGE_SIZE.
+
+    Строки сортируются по order_field, затем по id; курсор хранит
+    эти значения у последней строки страницы.
+    """
+    order_field = None
+    # Тип поля сортировки: date или datetime.
+    order_type = None
+    descending = False
+
+    def get_queryset(self, fields):
+        raise NotImplementedError
+
+    def get_payload(self, fields):
+        field, sign = self.order_field, '-' if self.descending else ''
+        queryset = self.get_queryset(fields).order_by(
+            sign + field, sign + 'id'
+        )
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                value, last_id = decode_cursor(cursor)
+                value = self.order_type.fromisoformat(value)
+                last_id = int(last_id)
+            except (TypeError, ValueError):
+                raise BadRequest('Некорректный курсор.')
+            # Число больше 64 бит SQLite не сравнивает.
+            if not 0 <= last_id <= MAX_ID:
+                raise BadRequest('Некорректный курсор.')
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'id__{lookup}': last_id})
+            )
+        size = settings.NEWS_API_PAGE_SIZE
+        results, rows = self.rows(
+            queryset[:size + 1], fields, extra=(field, 'id')
+        )
+        next_cursor = None
+        if len(results) > size:
+            results = results[:size]
+            value, last_id = rows[size - 1][-2:]
+            next_cursor = encode_cursor([value.isoformat(), last_id])
+        return {'results': results, 'next': next_cursor}
+
+
+def news_queryset(fields):
+    """Новости с числом комментариев, если оно нужно."""
+    queryset = News.objects.all()
+    if 'comment_count' in fields:
+        queryset = queryset.annotate(comment_count=comment_count())
+    return queryset
+
+
+class NewsListApi(CursorListApi):
+    """Новости от новых к старым."""
+    fields = NEWS_FIELDS
+    default_fields = NEWS_DEFAULT_FIELDS
+    order_field = 'date'
+    order_type = date
+    descending = True
+
+    def get_queryset(self, fields):
+        return news_queryset(fields)
+
+
+class NewsDetailApi(ApiView):
+    """Одна новость."""
+    fields = NEWS_DETAIL_FIELDS
+    default_fields = NEWS_DEFAULT_FIELDS + ('text',)
+
+    def get_payload(self, fields):
+        results, _ = self.rows(
+            news_queryset(fields).filter(pk=self.kwargs['pk']), fields
+        )
+        if not results:
+            raise Http404('Новость не найдена.')
+        return results[0]
+
+
+class CommentListApi(CursorListApi):
+    """Комментарии к новости от старых к новым."""
+    fields = COMMENT_FIELDS
+    default_fields = COMMENT_DEFAULT_FIELDS
+    order_field = 'created'
+    order_type = datetime
+
+    def get_queryset(self, fields):
+        if not News.objects.filter(pk=self.kwargs['pk']).exists():
+            raise Http404('Новость не найдена.')
+        return Comment.objects.filter(news_id=self.kwargs['pk'])
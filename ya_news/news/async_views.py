@@ -0,0 +1,101 @@
+"""
+Асинхронные варианты страниц чтения для ASGI.
+
+Под ASGI синхронное представление целиком уходит в поток через
+sync_to_async. Здесь в отдельный пул из NEWS_ASYNC_DB_WORKERS потоков
+уходит только работа с базой: представление собирает контекст, все
+запросы выполняются там же, а шаблон рендерится в цикле событий.
+Запросов одновременно не больше, чем потоков в пуле, сколько бы
+клиентов ни ждало ответа.
+
+Соединения с базой у каждого потока пула свои, поэтому вокруг работы
+с базой вызывается close_old_connections(), как Django делает
+в начале и в конце обычного запроса.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from django.shortcuts import render
+
+from . import counters
+from .views import NewsComment, NewsDetail, NewsList
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.NEWS_ASYNC_DB_WORKERS,
+            thread_name_prefix='news-db',
+        )
+    return _executor
+
+
+def _in_pool(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db(func, *args):
+    """Выполняет func в пуле потоков для работы с базой."""
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), _in_pool, func, *args
+    )
+
+
+def _evaluate(request, context):
+    """
+    Выполняет все запросы, которые понадобятся шаблону.
+
+    Наборы записей загружаются, пользователь из сессии читается
+    заранее: в цикле событий обращаться к базе нельзя.
+    """
+    for value in context.values():
+        if isinstance(value, QuerySet):
+            len(value)
+    request.user.is_authenticated
+    return context
+
+
+def _news_list_context(request):
+    view = NewsList()
+    view.setup(request)
+    view.object_list = view.get_queryset()
+    return _evaluate(request, view.get_context_data())
+
+
+def _news_detail_context(request, pk):
+    view = NewsDetail()
+    view.setup(request, pk=pk)
+    view.object = view.get_object()
+    view.object.views += counters.pending(view.object.pk) + 1
+    counters.hit(view.object.pk)
+    return _evaluate(request, view.get_context_data(object=view.object))
+
+
+async def news_list(request):
+    """Главная страница, как NewsList."""
+    context = await run_in_db(_news_list_context, request)
+    return render(request, NewsList.template_name, context)
+
+
+async def news_detail(request, pk):
+    """
+    Страница новости, как NewsDetailView.
+
+    Отправка комментария — редкая запись, её обслуживает синхронное
+    представление.
+    """
+    if request.method == 'POST':
+        return await sync_to_async(NewsComment.as_view())(request, pk=pk)
+    context = await run_in_db(_news_detail_context, request, pk)
+    return render(request, NewsDetail.template_name, context)
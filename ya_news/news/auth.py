@@ -0,0 +1,33 @@
+"""
+Пользователь запроса из кэша.
+
+AuthenticationMiddleware на каждый запрос загружает пользователя
+из сессии, это запрос к auth_user. CachedModelBackend хранит
+загруженного пользователя в кэше NEWS_USER_CACHE_TIMEOUT секунд.
+Запись удаляется, когда пользователь сохранён (в том числе при смене
+пароля), удалён или вышел. Кэш общий для всех процессов (см. CACHES),
+поэтому удаление сразу видно каждому воркеру.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'news:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша."""
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.NEWS_USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(user_id):
+    """Удаляет пользователя из кэша."""
+    cache.delete(USER_KEY.format(user_id=user_id))
@@ -0,0 +1,52 @@
+"""
+Поколения данных новостей.
+
+Номер поколения увеличивается при каждом изменении данных. Всё, что
+построено по этим данным и хранится в кэше или в памяти процесса,
+помнит номер поколения и считается устаревшим, когда номер сменился.
+"""
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'news:generation:{scope}'
+
+
+def _initial_generation():
+    # Поколение, созданное заново после вытеснения ключа, не должно
+    # совпасть с одним из прежних, поэтому начинаем от текущего времени.
+    return int(time.time() * 1000)
+
+
+def get_generation(scope, create=True):
+    """
+    Текущее поколение данных scope.
+
+    Без create отсутствующее поколение не создаётся, а возвращается None.
+    """
+    key = GENERATION_KEY.format(scope=scope)
+    generation = cache.get(key)
+    if generation is None and create:
+        cache.add(key, _initial_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(scope):
+    """
+    Отмечает, что данные scope изменились.
+
+    Если поколения ещё нет, ничего не создаёт: по нему ничего
+    не построено, а следующее get_generation() начнёт поколение,
+    не совпадающее с прежними.
+    """
+    key = GENERATION_KEY.format(scope=scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return None
+
+
+def forget_generation(scope):
+    """Удаляет поколение данных, которых больше нет."""
+    cache.delete(GENERATION_KEY.format(scope=scope))
@@ -0,0 +1,92 @@
+"""
+Счётчики просмотров новостей.
+
+Просмотры копятся в памяти процесса и раз в NEWS_VIEWS_FLUSH_INTERVAL
+секунд записываются в базу: новости с одинаковым приростом обновляются
+одним запросом UPDATE ... SET views = views + N. Прирост складывается
+с тем, что уже в базе, поэтому процессы сбрасывают свои счётчики
+независимо и не мешают друг другу. При завершении процесса накопленное
+тоже записывается. Если база недоступна, просмотры остаются в памяти
+до следующего сброса, а страница открывается как обычно.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+_pending = Counter()
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def hit(news_id):
+    """Учитывает просмотр новости."""
+    with _lock:
+        _pending[news_id] += 1
+        due = (
+            time.monotonic() - _flushed_at
+            >= settings.NEWS_VIEWS_FLUSH_INTERVAL
+        )
+    if due:
+        try:
+            flush()
+        except DatabaseError:
+            # Просмотры вернулись в _pending: запишем при следующем сбросе.
+            logger.exception('Не удалось записать просмотры новостей')
+
+
+def pending(news_id):
+    """Просмотры новости, ещё не записанные в базу этим процессом."""
+    with _lock:
+        return _pending[news_id]
+
+
+def flush():
+    """Записывает накопленные просмотры в базу."""
+    from .models import News
+
+    global _flushed_at
+    with _lock:
+        deltas = _pending.copy()
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    by_delta = defaultdict(list)
+    for news_id, delta in deltas.items():
+        by_delta[delta].append(news_id)
+    for delta, news_ids in list(by_delta.items()):
+        try:
+            News.objects.filter(id__in=news_ids).update(
+                views=F('views') + delta
+            )
+        except Exception:
+            # Не теряем просмотры: запишем их при следующем сбросе.
+            with _lock:
+                for rest_delta, rest_ids in by_delta.items():
+                    for news_id in rest_ids:
+                        _pending[news_id] += rest_delta
+            raise
+        del by_delta[delta]
+    return sum(deltas.values())
+
+
+def reset():
+    """Забывает накопленные просмотры, не записывая их."""
+    with _lock:
+        _pending.clear()
+
+
+@atexit.register
+def _flush_on_exit():
+    if not _pending:
+        return
+    try:
+        flush()
+    except Exception:
+        # База при завершении процесса может быть уже недоступна.
+        pass
@@ -0,0 +1,162 @@
+"""
+Ленты RSS и Atom.
+
+Готовая лента хранится в кэше под ключом с поколением данных
+(см. news.cache) и строится заново, только когда поколение сменилось.
+Ответ несёт ETag и Last-Modified, поэтому на повторный запрос
+читалки без изменений отвечаем 304, не обращаясь к базе.
+"""
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache as django_cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+
+from . import cache
+from .models import News
+
+FEED_KEY = 'news:feed:{name}:{generation}:{site}'
+
+
+def comments_scope(news_id):
+    return f'comments:{news_id}'
+
+
+class CachedFeed(Feed):
+    """Лента, которая строится заново только при изменении данных."""
+
+    def get_scope(self, **kwargs):
+        """Поколение каких данных определяет содержимое ленты."""
+        raise NotImplementedError
+
+    def cache_key(self, generation, site):
+        return FEED_KEY.format(
+            name=type(self).__name__, generation=generation, site=site
+        )
+
+    def __call__(self, request, *args, **kwargs):
+        site = hashlib.md5(
+            request.build_absolute_uri('/').encode()
+        ).hexdigest()
+        scope = self.get_scope(**kwargs)
+        generation = cache.get_generation(scope, create=False)
+        entry = None
+        if generation is not None:
+            entry = django_cache.get(self.cache_key(generation, site))
+        if entry is None:
+            if generation is None:
+                # Поколение заводится только для существующего объекта:
+                # иначе каждый запрошенный pk оставлял бы в кэше ключ.
+                self.get_object(request, *args, **kwargs)
+                generation = cache.get_generation(scope)
+            key = self.cache_key(generation, site)
+            response = super().__call__(request, *args, **kwargs)
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(
+                    hashlib.md5(response.content).hexdigest()
+                ),
+                'last_modified': int(time.time()),
+            }
+            django_cache.set(key, entry, settings.NEWS_FEED_CACHE_TIMEOUT)
+        response = HttpResponse(
+            entry['content'], content_type=entry['content_type']
+        )
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        patch_cache_control(response, max_age=settings.NEWS_FEED_MAX_AGE)
+        return get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+            response=response,
+        )
+
+
+class LatestNewsFeed(CachedFeed):
+    title = 'YaNews: последние новости'
+    description = 'Свежие новости YaNews.'
+
+    def get_scope(self, **kwargs):
+        return 'news'
+
+    def link(self):
+        return reverse('news:home')
+
+    def items(self):
+        return News.objects.defer('text')[:settings.NEWS_FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.excerpt
+
+    def item_link(self, item):
+        return reverse('news:detail', kwargs={'pk': item.pk})
+
+    def item_pubdate(self, item):
+        return datetime.combine(item.date, datetime.min.time())
+
+
+class LatestNewsAtomFeed(LatestNewsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestNewsFeed.description
+
+
+class CommentsFeed(CachedFeed):
+    """Комментарии к одной новости."""
+    item_guid_is_permalink = False
+
+    def get_scope(self, **kwargs):
+        return comments_scope(kwargs['pk'])
+
+    def get_object(self, request, pk):
+        return get_object_or_404(News.objects.only('id', 'title'), pk=pk)
+
+    def title(self, obj):
+        return f'Комментарии: {obj.title}'
+
+    def description(self, obj):
+        return f'Комментарии к новости «{obj.title}».'
+
+    def link(self, obj):
+        return reverse('news:detail', kwargs={'pk': obj.pk}) + '#comments'
+
+    def items(self, obj):
+        return obj.comment_set.select_related('author').order_by(
+            '-created'
+        )[:settings.NEWS_FEED_ITEMS]
+
+    def item_title(self, item):
+        return str(item.author)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse(
+            'news:detail', kwargs={'pk': item.news_id}
+        ) + '#comments'
+
+    def item_guid(self, item):
+        return f'comment-{item.pk}'
+
+    def item_pubdate(self, item):
+        return item.created
+
+
+class CommentsAtomFeed(CommentsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
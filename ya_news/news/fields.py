@@ -0,0 +1,55 @@
+import lzma
+import zlib
+
+from django.db import models
+
+# Однобайтовый префикс сжатого значения и функции алгоритма.
+ALGORITHMS = {
+    'zlib': (b'z', zlib.compress, zlib.decompress),
+    'lzma': (b'x', lzma.compress, lzma.decompress),
+}
+DECOMPRESSORS = {
+    prefix: decompress for prefix, _, decompress in ALGORITHMS.values()
+}
+
+
+class CompressedTextField(models.TextField):
+    """
+    Текстовое поле, которое хранит большие значения сжатыми.
+
+    Значения от threshold байт записываются в базу как двоичные данные
+    с префиксом алгоритма, короткие — обычной строкой. Строки читаются
+    как есть, поэтому записи, сохранённые до сжатия, остаются рабочими.
+    Фильтры по тексту сжатые значения не находят: ни поиск по содержимому
+    (contains и т. п.), ни точное совпадение (exact, in), потому что
+    в базе лежат байты, а не строка.
+    """
+
+    def __init__(self, *args, algorithm='zlib', threshold=1024, **kwargs):
+        self.algorithm = algorithm
+        self.threshold = threshold
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.algorithm != 'zlib':
+            kwargs['algorithm'] = self.algorithm
+        if self.threshold != 1024:
+            kwargs['threshold'] = self.threshold
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, (bytes, memoryview)):
+            value = bytes(value)
+            return DECOMPRESSORS[value[:1]](value[1:]).decode()
+        return value
+
+    def get_db_prep_save(self, value, connection):
+        value = super().get_db_prep_save(value, connection)
+        if value is None:
+            return value
+        data = value.encode()
+        if len(data) < self.threshold:
+            return value
+        prefix, compress, _ = ALGORITHMS[self.algorithm]
+        return prefix + compress(data)
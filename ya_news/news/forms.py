@@ -1,6 +1,7 @@
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
+from . import minhash
 from .models import Comment
 
 BAD_WORDS = (
@@ -9,6 +10,7 @@ BAD_WORDS = (
     # Дополните список на своё усмотрение.
 )
 WARNING = 'Не ругайтесь!'
+DUPLICATE_WARNING = 'Такой комментарий уже есть, не повторяйтесь!'
 
 
 class CommentForm(ModelForm):
@@ -24,4 +26,9 @@ class CommentForm(ModelForm):
         for word in BAD_WORDS:
             if word in lowered_text:
                 raise ValidationError(WARNING)
+        if self.instance.news_id and minhash.find_duplicate(
+            self.instance.news_id, text,
+            author_id=self.instance.author_id, exclude_id=self.instance.pk,
+        ):
+            raise ValidationError(DUPLICATE_WARNING)
         return text
@@ -0,0 +1,118 @@
+"""
+Рейтинг обсуждаемых новостей.
+
+Оценка новости — число комментариев, где каждый комментарий со временем
+теряет вес: за HOT_NEWS_HALF_LIFE секунд вдвое. Оценки хранятся
+в HotNews. Новый комментарий прибавляет к оценке единицу одним
+запросом UPDATE, а команда decay_hot_news периодически уменьшает все
+оценки на прошедшее время и удаляет остывшие. Комментарии к новостям
+старше HOT_NEWS_MAX_AGE_DAYS дней не учитываются.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Comment, HotNews, News
+
+
+def _min_date():
+    return timezone.localdate() - timedelta(
+        days=settings.HOT_NEWS_MAX_AGE_DAYS
+    )
+
+
+def _decay_factor(seconds):
+    return 0.5 ** (max(seconds, 0) / settings.HOT_NEWS_HALF_LIFE)
+
+
+def comment_added(comment):
+    """Прибавляет комментарий к оценке его новости."""
+    if not News.objects.filter(
+        pk=comment.news_id, date__gte=_min_date()
+    ).exists():
+        return
+    if HotNews.objects.filter(news_id=comment.news_id).update(
+        score=F('score') + 1
+    ):
+        return
+    try:
+        with transaction.atomic():
+            HotNews.objects.create(
+                news_id=comment.news_id, score=1, updated=comment.created
+            )
+    except IntegrityError:
+        # Строку только что создал параллельный запрос.
+        HotNews.objects.filter(news_id=comment.news_id).update(
+            score=F('score') + 1
+        )
+
+
+def comment_deleted(comment):
+    """Вычитает удалённый комментарий с тем весом, что у него остался."""
+    hot = HotNews.objects.filter(news_id=comment.news_id).only(
+        'updated'
+    ).first()
+    if hot is None or comment.created is None:
+        return
+    weight = _decay_factor(
+        (hot.updated - comment.created).total_seconds()
+    )
+    HotNews.objects.filter(pk=hot.pk).update(
+        score=Greatest(F('score') - weight, 0.0)
+    )
+
+
+def decay(now=None):
+    """
+    Уменьшает оценки на время, прошедшее с прошлого пересчёта.
+
+    Строки с одинаковым временем пересчёта обновляются одним запросом;
+    обычно это все строки, кроме созданных после прошлого запуска.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        updated_at = set(HotNews.objects.values_list('updated', flat=True))
+        for updated in updated_at:
+            HotNews.objects.filter(updated=updated).update(
+                score=F('score') * _decay_factor(
+                    (now - updated).total_seconds()
+                ),
+                updated=now,
+            )
+        HotNews.objects.filter(
+            Q(score__lt=settings.HOT_NEWS_MIN_SCORE)
+            | Q(news__date__lt=_min_date())
+        ).delete()
+
+
+def rebuild(now=None):
+    """Пересчитывает оценки по всем комментариям к свежим новостям."""
+    now = now or timezone.now()
+    scores = {}
+    for news_id, created in Comment.objects.filter(
+        news__date__gte=_min_date()
+    ).values_list('news_id', 'created').iterator():
+        weight = _decay_factor((now - created).total_seconds())
+        scores[news_id] = scores.get(news_id, 0.0) + weight
+    rows = [
+        HotNews(news_id=news_id, score=score, updated=now)
+        for news_id, score in scores.items()
+        if score >= settings.HOT_NEWS_MIN_SCORE
+    ]
+    with transaction.atomic():
+        HotNews.objects.all().delete()
+        HotNews.objects.bulk_create(rows)
+    return len(rows)
+
+
+def popular():
+    """Самые обсуждаемые новости с их оценками."""
+    return HotNews.objects.filter(
+        score__gte=settings.HOT_NEWS_MIN_SCORE
+    ).select_related('news').only(
+        'score', 'news__id', 'news__title', 'news__date'
+    )[:settings.HOT_NEWS_COUNT]
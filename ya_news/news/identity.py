@@ -0,0 +1,36 @@
+"""
+Объекты, уже загруженные за время запроса.
+
+Представление за один запрос может несколько раз попросить один и тот
+же объект: в post() и ещё раз в get_success_url(). Карта объектов
+хранится в самом запросе, поэтому её видят и представления, которым
+запрос передан дальше (NewsDetailView -> NewsComment).
+"""
+
+
+def get_map(request):
+    """Карта объектов запроса."""
+    try:
+        return request._identity_map
+    except AttributeError:
+        request._identity_map = {}
+        return request._identity_map
+
+
+class IdentityMapMixin:
+    """
+    get_object() обращается к базе один раз за запрос.
+
+    Ключ — модель и параметры URL, а не pk: объект, найденный другим
+    запросом к базе, мог не пройти фильтр get_queryset() этого
+    представления.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        key = (self.model._meta.label, tuple(sorted(self.kwargs.items())))
+        objects = get_map(self.request)
+        if key not in objects:
+            objects[key] = super().get_object()
+        return objects[key]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news import minhash
+from news.models import Comment, CommentFingerprint
+
+
+class Command(BaseCommand):
+    """Пересчитывает ключи поиска дубликатов для всех комментариев."""
+    help = 'Заполняет индекс почти одинаковых комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        count = 0
+        for comment in Comment.objects.only(
+            'id', 'news_id', 'text'
+        ).iterator(chunk_size=batch_size):
+            batch.append(comment)
+            if len(batch) == batch_size:
+                count += self.save_batch(batch)
+                batch = []
+        count += self.save_batch(batch)
+        self.stdout.write(f'Обработано комментариев: {count}')
+
+    @staticmethod
+    def save_batch(comments):
+        with transaction.atomic():
+            CommentFingerprint.objects.filter(
+                comment__in=comments
+            ).delete()
+            CommentFingerprint.objects.bulk_create(
+                fingerprint for comment in comments
+                for fingerprint in minhash.fingerprints(comment)
+            )
+        return len(comments)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from news import rollups
+
+
+class Command(BaseCommand):
+    """Пересчитывает сводку по дням для архива."""
+    help = 'Заново считает число новостей и комментариев по дням.'
+
+    def handle(self, *args, **options):
+        count = rollups.backfill()
+        self.stdout.write(f'Дней в сводке: {count}')
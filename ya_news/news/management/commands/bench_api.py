@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from news import querycache
+from news.models import Comment, News
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Сравнение JSON API с HTML-страницами по числу строк в секунду.
+
+    Строка — новость в списке или комментарий на странице новости.
+    Все данные создаются в транзакции и откатываются в конце.
+    """
+    help = 'Замер JSON API против HTML-страниц.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--news', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                author = User.objects.create(username='bench_api')
+                News.objects.bulk_create(
+                    News(title=f'Новость {index}', text='Текст новости. ' * 50)
+                    for index in range(options['news'])
+                )
+                news = News.objects.first()
+                Comment.objects.bulk_create(
+                    Comment(
+                        news=news, author=author, text=f'Комментарий {index}'
+                    )
+                    for index in range(options['comments'])
+                )
+                self.client = Client(SERVER_NAME='localhost')
+                count = options['requests']
+                page = min(settings.NEWS_API_PAGE_SIZE, options['comments'])
+                for label, url, rows in (
+                    ('Главная, HTML', reverse('news:home'),
+                     settings.NEWS_COUNT_ON_HOME_PAGE),
+                    ('Список, API', reverse('news:api_news'),
+                     settings.NEWS_API_PAGE_SIZE),
+                    ('Новость, HTML',
+                     reverse('news:detail', args=(news.pk,)),
+                     options['comments']),
+                    ('Комментарии, API',
+                     reverse('news:api_comments', args=(news.pk,)), page),
+                ):
+                    self.measure(label, url, rows, count)
+                transaction.set_rollback(True)
+        finally:
+            # bulk_create не меняет поколений кэша запросов: без этого
+            # страницы с откатанными новостями остались бы в кэше.
+            for model in (News, Comment):
+                querycache.model_changed(model)
+
+    def measure(self, label, url, rows, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            self.client.get(url)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label}: {elapsed / count * 1000:.2f} мс на запрос, '
+            f'{rows * count / elapsed:.0f} строк/с'
+        )
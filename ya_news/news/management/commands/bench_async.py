@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path, reverse
+
+from news import signals, urls
+from news.models import Comment, News
+from yanews import urls as root_urls
+
+User = get_user_model()
+
+
+class SiteUrls:
+    """Корневые маршруты сайта с заданными страницами чтения."""
+
+    def __init__(self, async_pages):
+        self.urlpatterns = [
+            path('', include(
+                (urls.news_patterns(async_pages), urls.app_name)
+            )),
+            *(
+                pattern for pattern in root_urls.urlpatterns
+                if getattr(pattern, 'urlconf_name', None) is not urls
+            ),
+        ]
+
+
+@contextmanager
+def news_urls(async_views):
+    """Маршруты страниц чтения с синхронными или асинхронными views."""
+    with override_settings(
+        NEWS_ASYNC_VIEWS=async_views, ROOT_URLCONF=SiteUrls(async_views)
+    ):
+        yield
+
+
+@contextmanager
+def without_stats_signals():
+    """
+    Удаление без правки сводок по дням и рейтинга обсуждаемых.
+
+    Данные замера созданы bulk_create и в них не попали, а удаление
+    иначе вычло бы их из сводки за сегодня.
+    """
+    handlers = (
+        (signals.uncount_news, News),
+        (signals.uncount_comment, Comment),
+        (signals.comment_deleted, Comment),
+    )
+    for handler, sender in handlers:
+        post_delete.disconnect(handler, sender=sender)
+    try:
+        yield
+    finally:
+        for handler, sender in handlers:
+            post_delete.connect(handler, sender=sender)
+
+
+class ThreadPeak:
+    """Наибольшее число потоков процесса за время замера."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.running = True
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+
+    def watch(self):
+        while self.running:
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.005)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.running = False
+        self.thread.join()
+
+
+class Command(BaseCommand):
+    """
+    Сравнение страниц чтения под WSGI и ASGI при сотнях клиентов.
+
+    WSGI: синхронные views, поток на клиента, как у многопоточного
+    сервера. ASGI: асинхронные views (news.async_views), клиенты —
+    корутины, запросы к базе идут через пул NEWS_ASYNC_DB_WORKERS.
+    Приложения вызываются в процессе, без сетевого сервера. Данные
+    записываются в базу (потокам нужны свои соединения, транзакцию
+    другого соединения они не видят), а в конце удаляются по ключам:
+    остальные новости базы замер не трогает.
+    """
+    help = 'Замер страниц чтения под WSGI и ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5)
+        parser.add_argument('--news', type=int, default=100)
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Замерить пик памяти (tracemalloc сильно замедляет '
+                 'запросы, поэтому скорость в этом режиме не сравнима).',
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.create(username='bench_async')
+        last_id = News.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        created = []
+        try:
+            # SQLite не возвращает ключи из bulk_create: находим их
+            # по заголовкам среди новостей новее last_id.
+            News.objects.bulk_create(
+                News(title=f'bench_async {index}', text='Текст новости.')
+                for index in range(options['news'])
+            )
+            created = list(News.objects.filter(
+                id__gt=last_id, title__startswith='bench_async '
+            ).values_list('id', flat=True))
+            news = News.objects.get(id__gt=last_id, title='bench_async 0')
+            Comment.objects.bulk_create(
+                Comment(news=news, author=author, text=f'Комментарий {i}')
+                for i in range(20)
+            )
+            paths = [
+                reverse('news:home'), reverse('news:detail', args=(news.pk,))
+            ]
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for label, run in (('WSGI', self.run_wsgi),
+                                   ('ASGI', self.run_asgi)):
+                    self.measure(label, run, paths, options)
+        finally:
+            with without_stats_signals():
+                News.objects.filter(id__in=created).delete()
+                author.delete()
+
+    def measure(self, label, run, paths, options):
+        clients, count = options['clients'], options['requests']
+        if options['memory']:
+            tracemalloc.start()
+        with ThreadPeak() as threads:
+            started = time.perf_counter()
+            statuses = run(paths, clients, count)
+            elapsed = time.perf_counter() - started
+        total = clients * count * len(paths)
+        failed = sum(status != 200 for status in statuses)
+        report = (
+            f'{label}: {total / elapsed:.0f} запросов/с, '
+            f'потоков до {threads.peak}, ошибок {failed}'
+        )
+        if options['memory']:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report += f', память до {peak_memory / 1024 / 1024:.1f} МБ'
+        self.stdout.write(report)
+
+    def run_wsgi(self, paths, clients, count):
+        def client_session(_):
+            client = Client()
+            try:
+                return [
+                    client.get(url).status_code
+                    for _ in range(count) for url in paths
+                ]
+            finally:
+                connection.close()
+
+        with news_urls(async_views=False):
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                return [
+                    status for statuses in executor.map(
+                        client_session, range(clients)
+                    ) for status in statuses
+                ]
+
+    def run_asgi(self, paths, clients, count):
+        async def client_session():
+            client = AsyncClient()
+            statuses = []
+            for _ in range(count):
+                for url in paths:
+                    statuses.append((await client.get(url)).status_code)
+            return statuses
+
+        async def run_all():
+            results = await asyncio.gather(
+                *(client_session() for _ in range(clients))
+            )
+            return [status for statuses in results for status in statuses]
+
+        with news_urls(async_views=True):
+            return asyncio.run(run_all())
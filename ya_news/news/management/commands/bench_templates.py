@@ -0,0 +1,87 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from news import querycache
+from news.models import Comment, News
+
+User = get_user_model()
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def templates_setting(cached):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['OPTIONS']['loaders'] = (
+        [('django.template.loaders.cached.Loader', LOADERS)]
+        if cached else LOADERS
+    )
+    return templates
+
+
+class Command(BaseCommand):
+    """
+    Время запроса к страницам с кэширующим загрузчиком шаблонов и без.
+
+    Без кэша каждый запрос заново читает и разбирает шаблон страницы
+    со всеми родительскими и включёнными. Данные создаются
+    в транзакции и откатываются в конце.
+    """
+    help = 'Замер страниц с кэшем шаблонов и без.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                author = User.objects.create(username='bench_templates')
+                News.objects.bulk_create(
+                    News(title=f'Новость {index}', text='Текст новости.')
+                    for index in range(settings.NEWS_COUNT_ON_HOME_PAGE)
+                )
+                news = News.objects.first()
+                Comment.objects.bulk_create(
+                    Comment(news=news, author=author, text=f'Комментарий {i}')
+                    for i in range(20)
+                )
+                pages = (
+                    ('Главная', reverse('news:home')),
+                    ('Новость', reverse('news:detail', args=(news.pk,))),
+                    ('Вход', reverse('users:login')),
+                )
+                for label, url in pages:
+                    plain, cached = (
+                        self.measure(url, options['requests'], cached)
+                        for cached in (False, True)
+                    )
+                    self.stdout.write(
+                        f'{label}: без кэша {plain:.2f} мс, '
+                        f'с кэшем {cached:.2f} мс, '
+                        f'экономия {plain - cached:.2f} мс на запрос'
+                    )
+                transaction.set_rollback(True)
+        finally:
+            # bulk_create не меняет поколений кэша запросов: без этого
+            # страницы с откатанными новостями остались бы в кэше.
+            for model in (News, Comment):
+                querycache.model_changed(model)
+
+    def measure(self, url, count, cached):
+        with override_settings(TEMPLATES=templates_setting(cached)):
+            client = Client(SERVER_NAME='localhost')
+            # Первый запрос заполняет кэш и в замер не входит.
+            client.get(url)
+            started = time.perf_counter()
+            for _ in range(count):
+                client.get(url)
+            return (time.perf_counter() - started) / count * 1000
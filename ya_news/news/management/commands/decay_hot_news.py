@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from news import hot
+
+
+class Command(BaseCommand):
+    """Уменьшает оценки обсуждаемых новостей на прошедшее время."""
+    help = (
+        'Пересчитывает рейтинг обсуждаемых новостей. Запускайте '
+        'периодически, например раз в несколько минут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Посчитать рейтинг заново по всем комментариям.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = hot.rebuild()
+            self.stdout.write(f'Новостей в рейтинге: {count}')
+        else:
+            hot.decay()
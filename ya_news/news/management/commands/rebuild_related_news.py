@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from news import similarity
+
+
+class Command(BaseCommand):
+    """Пересчитывает списки похожих для всех новостей."""
+    help = 'Заново строит таблицу похожих новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = similarity.rebuild(options['batch_size'])
+        self.stdout.write(f'Обработано новостей: {count}')
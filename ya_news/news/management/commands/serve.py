@@ -0,0 +1,71 @@
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import get_internal_wsgi_application
+
+from news.prefork import Arbiter
+from yanews import warmup
+
+
+class Command(BaseCommand):
+    """
+    Pre-fork сервер для боевого запуска и нагрузочных тестов.
+
+    Приложение загружается до fork(), воркеры слушают общий сокет
+    и перезапускаются после --max-requests запросов. Статику
+    не раздаёт: это работа веб-сервера перед приложением.
+    """
+    help = 'Запускает приложение в нескольких процессах-воркерах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--max-requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        host, _, port = options['bind'].rpartition(':')
+        try:
+            port = int(port)
+        except ValueError:
+            port = -1
+        if (
+            not 0 <= port <= 65535 or options['workers'] < 1
+            or options['max_requests'] < 1
+        ):
+            raise CommandError(
+                'Ожидается --bind хост:порт, --workers >= 1 '
+                'и --max-requests >= 1.'
+            )
+        if options['workers'] > 1 and isinstance(
+            caches[settings.SESSION_CACHE_ALIAS], LocMemCache
+        ):
+            self.stderr.write(
+                'Кэш сессий в памяти процесса: выход из аккаунта увидит '
+                'только один воркер. Укажите общий кэш в CACHES.'
+            )
+        application = get_internal_wsgi_application()
+        # Соединения с базой воркеры откроют сами.
+        warmup.run(database=False)
+        arbiter = Arbiter(
+            application,
+            (host or '127.0.0.1', port),
+            options['workers'],
+            options['max_requests'],
+            self.log,
+        )
+        host, port = arbiter.address
+        self.log(
+            f'Слушаю http://{host}:{port}/, воркеров: {options["workers"]}'
+        )
+        counts = arbiter.run()
+        self.log(
+            f'Остановлен. Запросов: {sum(counts.values())}, '
+            f'воркеров сменилось: {len(counts)}'
+        )
+
+    def log(self, message):
+        self.stdout.write(message)
+        self.stdout.flush()
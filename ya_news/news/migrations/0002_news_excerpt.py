@@ -0,0 +1,28 @@
+# Generated by Django 3.2.15 on 2026-10-19 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    for news in News.objects.only('id', 'text').iterator():
+        excerpt = Truncator(news.text).words(settings.NEWS_EXCERPT_WORDS)
+        News.objects.filter(pk=news.pk).update(excerpt=excerpt[:255])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.15 on 2026-10-19 09:52
+
+from django.db import migrations
+import news.fields
+
+
+def compress_existing_rows(apps, schema_editor):
+    """Перезаписывает большие тексты, чтобы они сохранились сжатыми."""
+    News = apps.get_model('news', 'News')
+    threshold = News._meta.get_field('text').threshold
+    for obj in News.objects.only('id', 'text').iterator():
+        if len(obj.text.encode()) >= threshold:
+            News.objects.filter(pk=obj.pk).update(text=obj.text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_news_excerpt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='news',
+            name='text',
+            field=news.fields.CompressedTextField(),
+        ),
+        migrations.RunPython(
+            compress_existing_rows, migrations.RunPython.noop
+        ),
+    ]
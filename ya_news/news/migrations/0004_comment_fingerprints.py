@@ -0,0 +1,27 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_compress_news_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news.comment')),
+                ('news', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news.news')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='commentfingerprint',
+            index=models.Index(fields=['news', 'key'], name='comment_fingerprint_idx'),
+        ),
+    ]
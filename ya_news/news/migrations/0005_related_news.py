@@ -0,0 +1,26 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_comment_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedNews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('news', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='news.news')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='news.news')),
+            ],
+            options={
+                'ordering': ('-score',),
+            },
+        ),
+    ]
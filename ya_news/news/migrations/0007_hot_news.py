@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_news_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotNews',
+            fields=[
+                ('news', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hot', serialize=False, to='news.news')),
+                ('score', models.FloatField(default=0)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('-score',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hotnews',
+            index=models.Index(fields=['-score'], name='hot_news_score_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:12
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_stats(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    Comment = apps.get_model('news', 'Comment')
+    DailyStats = apps.get_model('news', 'DailyStats')
+    stats = {}
+    for day, count in News.objects.values_list('date').annotate(
+        Count('id')
+    ).order_by():
+        stats[day] = DailyStats(day=day, news_count=count)
+    for day, count in Comment.objects.annotate(
+        day=TruncDate('created')
+    ).values_list('day').annotate(Count('id')).order_by():
+        stats.setdefault(day, DailyStats(day=day)).comment_count = count
+    DailyStats.objects.bulk_create(stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_hot_news'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('news_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('day',),
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
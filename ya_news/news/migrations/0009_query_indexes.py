@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['news', 'created'], name='comment_news_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-date', '-id'], name='news_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relatednews',
+            index=models.Index(fields=['news', '-score'], name='related_news_score_idx'),
+        ),
+    ]
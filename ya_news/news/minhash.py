@@ -0,0 +1,112 @@
+"""
+Поиск почти одинаковых комментариев автора к новости.
+
+Для текста комментария считается MinHash-подпись по символьным
+шинглам. Подпись делится на полосы, и ключ каждой полосы сохраняется
+в CommentFingerprint. Комментарии, у которых совпала хотя бы одна
+полоса, — кандидаты в дубликаты; для них сходство Жаккара считается
+точно. Поиск кандидатов — один запрос по индексу (news, key).
+"""
+import heapq
+import random
+import re
+import struct
+import zlib
+from hashlib import blake2b
+
+from django.conf import settings
+
+SHINGLE_SIZE = 5
+BANDS = 16
+ROWS = 4
+# 64 перестановки по 1000 шинглам — около 15 мс.
+MAX_SHINGLES = 1000
+PRIME = (1 << 61) - 1
+_random = random.Random(35)
+PERMUTATIONS = [
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(BANDS * ROWS)
+]
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text):
+    """Символьные шинглы текста без учёта регистра и пунктуации."""
+    normalized = ' '.join(WORD_RE.findall(text.lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {
+        normalized[index:index + SHINGLE_SIZE]
+        for index in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def band_keys(text_shingles):
+    """Ключи полос MinHash-подписи."""
+    if not text_shingles:
+        return []
+    # Подпись считается по MAX_SHINGLES шинглам с наименьшими хешами:
+    # у похожих текстов выборка почти одна и та же, а время не растёт
+    # с размером текста.
+    hashes = heapq.nsmallest(MAX_SHINGLES, {
+        zlib.crc32(shingle.encode()) for shingle in text_shingles
+    })
+    signature = [
+        min([(a * value + b) % PRIME for value in hashes])
+        for a, b in PERMUTATIONS
+    ]
+    return [
+        int.from_bytes(blake2b(
+            struct.pack(f'<B{ROWS}Q', band,
+                        *signature[band * ROWS:(band + 1) * ROWS]),
+            digest_size=8,
+        ).digest(), 'little', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def find_duplicate(news_id, text, author_id=None, exclude_id=None):
+    """
+    Комментарий к новости, почти совпадающий с текстом, или None.
+
+    С author_id ищутся только комментарии этого автора: короткое
+    «Спасибо!» разные читатели пишут независимо друг от друга.
+    """
+    from .models import Comment, CommentFingerprint
+
+    text_shingles = shingles(text)
+    candidates = CommentFingerprint.objects.filter(
+        news_id=news_id, key__in=band_keys(text_shingles)
+    ).exclude(comment_id=exclude_id).values_list('comment_id', flat=True)
+    comments = Comment.objects.filter(id__in=set(candidates))
+    if author_id is not None:
+        comments = comments.filter(author_id=author_id)
+    for comment in comments.only('id', 'text'):
+        if jaccard(text_shingles, shingles(comment.text)) >= (
+            settings.COMMENT_DUPLICATE_THRESHOLD
+        ):
+            return comment
+    return None
+
+
+def fingerprints(comment):
+    from .models import CommentFingerprint
+
+    return [
+        CommentFingerprint(news_id=comment.news_id, comment=comment, key=key)
+        for key in set(band_keys(shingles(comment.text)))
+    ]
+
+
+def index_comment(comment):
+    """Пересчитывает ключи полос комментария."""
+    from .models import CommentFingerprint
+
+    CommentFingerprint.objects.filter(comment=comment).delete()
+    CommentFingerprint.objects.bulk_create(fingerprints(comment))
@@ -1,22 +1,80 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import DatabaseError, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .fields import CompressedTextField
+from .querycache import CachedManager
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
-    text = models.TextField()
+    text = CompressedTextField()
+    excerpt = models.CharField(max_length=255, blank=True, editable=False)
     date = models.DateField(default=datetime.today)
+    views = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = models.Manager()
+    # Число комментариев в списках тоже кэшируется.
+    cached = CachedManager(depends_on=('news.Comment',))
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-views',), name='news_views_idx'),
+            # Порядок списков и курсора API: (date, id) по убыванию.
+            models.Index(fields=('-date', '-id'), name='news_date_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """
+        Сохраняем анонс, чтобы главная не читала полный текст.
+
+        Просмотры меняет только news.counters, поэтому при правке
+        загруженной из базы новости они не перезаписываются устаревшим
+        значением. Если строку новости тем временем удалили, новость
+        сохраняется заново целиком, как при обычном save().
+        """
+        self.excerpt = make_excerpt(self.text)
+        if (
+            update_fields is None and not force_insert
+            and not self._state.adding and self._state.db is not None
+        ):
+            using = using or self._state.db
+            try:
+                with transaction.atomic(using=using):
+                    super().save(
+                        force_update=force_update, using=using,
+                        update_fields=[
+                            field.name
+                            for field in self._meta.concrete_fields
+                            if not field.primary_key
+                            and field.name != 'views'
+                        ],
+                    )
+                return
+            except DatabaseError:
+                if type(self)._base_manager.using(using).filter(
+                    pk=self.pk
+                ).exists():
+                    raise
+        super().save(force_insert, force_update, using, update_fields)
+
+
+def make_excerpt(text):
+    """Анонс новости: первые NEWS_EXCERPT_WORDS слов текста."""
+    excerpt = Truncator(text).words(settings.NEWS_EXCERPT_WORDS)
+    return excerpt[:News._meta.get_field('excerpt').max_length]
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
@@ -32,6 +90,92 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            # Комментарии всегда читаются по новости в порядке создания.
+            models.Index(
+                fields=('news', 'created'), name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+
+def comment_count():
+    """
+    Число комментариев новости для annotate().
+
+    Считается подзапросом по индексу (news, created): с GROUP BY база
+    группировала бы новости по всем столбцам, включая текст.
+    """
+    return Coalesce(models.Subquery(
+        Comment.objects.filter(news=models.OuterRef('pk')).order_by().values(
+            'news'
+        ).annotate(count=models.Count('id')).values('count')
+    ), 0)
+
+
+class CommentFingerprint(models.Model):
+    """Ключ полосы MinHash-подписи комментария (см. news.minhash)."""
+    news = models.ForeignKey(News, on_delete=models.CASCADE)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('news', 'key'),
+                name='comment_fingerprint_idx',
+            ),
+        )
+
+
+class RelatedNews(models.Model):
+    """Похожая новость (см. news.similarity)."""
+    news = models.ForeignKey(
+        News,
+        on_delete=models.CASCADE,
+        related_name='related_links',
+    )
+    related = models.ForeignKey(
+        News,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ('-score',)
+        indexes = (
+            models.Index(
+                fields=('news', '-score'), name='related_news_score_idx'
+            ),
+        )
+
+
+class HotNews(models.Model):
+    """Оценка обсуждаемости новости (см. news.hot)."""
+    news = models.OneToOneField(
+        News,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='hot',
+    )
+    score = models.FloatField(default=0)
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('-score',)
+        indexes = (
+            models.Index(fields=('-score',), name='hot_news_score_idx'),
+        )
+
+
+class DailyStats(models.Model):
+    """Число новостей и комментариев за день (см. news.rollups)."""
+    day = models.DateField(primary_key=True)
+    news_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('day',)
@@ -0,0 +1,181 @@
+"""
+Pre-fork сервер WSGI без сторонних зависимостей.
+
+Главный процесс загружает и прогревает приложение, открывает сокет
+и только после этого запускает воркеры через fork(): загруженное
+приложение достаётся им общими страницами памяти. Воркеры принимают
+соединения с общего сокета, и каждый после max_requests запросов
+завершается, а главный процесс запускает вместо него новый. Число
+обработанных запросов воркер перед выходом сообщает главному процессу
+через канал. Упавший воркер перезапускается не сразу: пауза растёт
+с каждым падением подряд, чтобы ошибка при запуске не заняла главный
+процесс одними fork().
+"""
+import os
+import select
+import signal
+import socket
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.db import DatabaseError, connections
+
+from . import counters, similarity
+
+# Как часто воркер проверяет, не пора ли завершиться.
+POLL_TIMEOUT = 1
+# Наибольшая пауза перед перезапуском упавшего воркера, в секундах.
+MAX_BACKOFF = 30
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Worker(WSGIServer):
+    """Воркер: обслуживает запросы с общего сокета главного процесса."""
+
+    def __init__(self, listener, application):
+        super().__init__(
+            listener.getsockname()[:2], QuietHandler, bind_and_activate=False
+        )
+        self.socket.close()
+        self.socket = listener
+        # То же, что server_bind(), но без bind(): сокет уже открыт.
+        self.server_name, self.server_port = self.server_address
+        self.setup_environ()
+        self.set_app(application)
+        self.timeout = POLL_TIMEOUT
+        self.count = 0
+        self.stopping = False
+
+    def process_request(self, request, client_address):
+        self.count += 1
+        super().process_request(request, client_address)
+
+    def run(self, max_requests):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        while not self.stopping and self.count < max_requests:
+            self.handle_request()
+        return self.count
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+
+class Arbiter:
+    """Главный процесс: запускает воркеры и заменяет завершившиеся."""
+
+    def __init__(self, application, address, workers, max_requests, log):
+        self.application = application
+        self.workers = workers
+        self.max_requests = max_requests
+        self.log = log
+        self.listener = socket.create_server(address, backlog=1024)
+        # Соединение будит все ждущие воркеры, а принимает его один:
+        # остальные не должны застревать в accept().
+        self.listener.setblocking(False)
+        self.pids = set()
+        self.counts = {}
+        self.stopping = False
+        self.reports, self.report_pipe = os.pipe()
+        self.backoff = 0
+        # Когда перезапустить упавшие воркеры (time.monotonic()).
+        self.respawns = []
+
+    @property
+    def address(self):
+        return self.listener.getsockname()[:2]
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            return
+        code = 0
+        try:
+            os.close(self.reports)
+            count = Worker(self.listener, self.application).run(
+                self.max_requests
+            )
+            os.write(self.report_pipe, f'{os.getpid()} {count}\n'.encode())
+        except BaseException:
+            code = 1
+        finally:
+            # os._exit не ждёт фоновых потоков и не вызывает atexit:
+            # досчитываем похожие и записываем накопленные просмотры.
+            similarity.wait()
+            try:
+                counters.flush()
+            except DatabaseError:
+                # База недоступна: просмотры воркера пропадут.
+                pass
+            os._exit(code)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # Соединения с базой не должны достаться воркерам общими.
+        connections.close_all()
+        for _ in range(self.workers):
+            self.spawn()
+        buffer = b''
+        while self.pids or self.respawns:
+            if self.stopping:
+                self.respawns.clear()
+                for pid in self.pids:
+                    os.kill(pid, signal.SIGTERM)
+            try:
+                ready, _, _ = select.select(
+                    [self.reports], [], [], POLL_TIMEOUT
+                )
+            except InterruptedError:
+                ready = []
+            if ready:
+                buffer += os.read(self.reports, 4096)
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    pid, count = map(int, line.split())
+                    self.counts[pid] = count
+                    self.log(f'Воркер {pid}: запросов — {count}')
+            self.reap()
+            self.respawn()
+        self.listener.close()
+        return self.counts
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            self.pids.discard(pid)
+            if self.stopping:
+                continue
+            if status == 0:
+                # Воркер отработал max_requests и вышел сам.
+                self.backoff = 0
+                self.spawn()
+                continue
+            self.backoff = min(
+                max(self.backoff * 2, POLL_TIMEOUT), MAX_BACKOFF
+            )
+            self.log(
+                f'Перезапуск упавшего воркера {pid} через {self.backoff} с'
+            )
+            self.respawns.append(time.monotonic() + self.backoff)
+
+    def respawn(self):
+        """Перезапускает упавшие воркеры, чья пауза истекла."""
+        now = time.monotonic()
+        due = [at for at in self.respawns if at <= now]
+        self.respawns = [at for at in self.respawns if at > now]
+        for _ in due:
+            self.spawn()
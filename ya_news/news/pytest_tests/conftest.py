@@ -1,16 +1,73 @@
+import os
 from datetime import datetime, timedelta
 from typing import Any
 
 import pytest
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
 from django.utils import timezone
 
+from news import counters, similarity
 from news.models import News, Comment
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_similarity_index() -> None:
+    """
+    Фикстура, сбрасывающая индекс похожих новостей процесса.
+
+    База откатывается после каждого теста, а индекс в памяти — нет.
+    """
+    similarity.clear()
+
+
+@pytest.fixture(autouse=True)
+def run_similarity_inline(monkeypatch) -> None:
+    """
+    Фикстура, пересчитывающая похожие новости сразу, без фонового потока.
+    """
+    monkeypatch.setattr(similarity, 'submit', lambda func, *args: func(*args))
+
+
+@pytest.fixture(autouse=True)
+def reset_view_counters() -> None:
+    """Фикстура, сбрасывающая несохранённые просмотры процесса."""
+    counters.reset()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def cache_env(tmp_path_factory) -> Any:
+    """
+    Фикстура, переносящая кэш во временный каталог.
+
+    Тесты очищают кэш, а кэш по умолчанию общий с серверами, запущенными
+    из этого каталога. Возвращает окружение для процессов, которые
+    тесты запускают сами: у них тот же кэш.
+    """
+    env = {
+        **os.environ,
+        'NEWS_CACHE_BACKEND':
+            'django.core.cache.backends.filebased.FileBasedCache',
+        'NEWS_CACHE_LOCATION': str(tmp_path_factory.mktemp('cache')),
+    }
+    with override_settings(CACHES={'default': {
+        'BACKEND': env['NEWS_CACHE_BACKEND'],
+        'LOCATION': env['NEWS_CACHE_LOCATION'],
+        'OPTIONS': settings.CACHES['default'].get('OPTIONS', {}),
+    }}):
+        yield env
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    """Фикстура, очищающая кэш: база откатывается, а кэш — нет."""
+    cache.clear()
+
+
 @pytest.fixture
 def author(django_user_model) -> Any:
     """
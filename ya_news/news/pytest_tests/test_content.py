@@ -1,8 +1,15 @@
 from typing import Any
 
 import pytest
-from django.urls import reverse
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.http import Http404
+from django.urls import reverse
+
+from news import cache, feeds
+from news.api import encode_cursor
+from news.models import Comment, News
 
 
 @pytest.mark.django_db
@@ -61,3 +68,266 @@ def test_anonym_auth_user_contains_form(
     url = reverse("news:detail", args=(news.pk,))
     response = parametrize_client.get(url)
     assert ("form" in response.context) is form_in_context
+
+
+@pytest.mark.django_db
+def test_news_list_does_not_load_text(client: Any) -> None:
+    """
+    Тест проверяет, что главная страница не загружает полный текст
+    новостей: выводится сохранённый анонс, а большой текст
+    не попадает ни в запросы, ни в ответ.
+    """
+    big_text = "слово " * (settings.NEWS_EXCERPT_WORDS + 1_000_000)
+    News.objects.create(title="Большая новость", text=big_text)
+    url: str = reverse("news:home")
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    news = response.context["object_list"][0]
+    assert "text" in news.get_deferred_fields()
+    assert news.excerpt.count("слово") == settings.NEWS_EXCERPT_WORDS
+    assert all('"news_news"."text"' not in query["sql"]
+               for query in queries.captured_queries)
+    assert len(response.content) < len(big_text)
+
+
+@pytest.mark.django_db
+def test_comment_stream_only_under_asgi(
+    client: Any, news: Any, settings: Any
+) -> None:
+    """
+    Тест проверяет, что страница новости подключается к потоку
+    комментариев, только когда его обслуживает ASGI-сервер.
+    """
+    url: str = reverse("news:detail", args=(news.pk,))
+    stream_url: str = reverse("news:comments_stream", args=(news.pk,))
+    assert stream_url not in client.get(url).content.decode()
+    settings.NEWS_ASYNC_VIEWS = True
+    assert stream_url in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_related_news_on_detail_page(
+    client: Any, django_capture_on_commit_callbacks: Any
+) -> None:
+    """
+    Тест проверяет, что на странице новости выводятся похожие новости
+    из заранее посчитанного списка, и для этого хватает одного запроса.
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        first = News.objects.create(
+            title="Футбол",
+            text="Сборная выиграла матч чемпионата по футболу",
+        )
+        second = News.objects.create(
+            title="Снова футбол", text="Сборная проиграла матч чемпионата"
+        )
+        other = News.objects.create(
+            title="Погода", text="Завтра ожидается дождь и сильный ветер"
+        )
+    url: str = reverse("news:detail", args=(first.pk,))
+    response = client.get(url)
+    assert response.context["related_news"] == [second]
+    assert other not in response.context["related_news"]
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    assert sum(
+        '"news_relatednews"' in query["sql"]
+        for query in queries.captured_queries
+    ) == 1
+
+
+@pytest.mark.django_db
+def test_most_read_order(client: Any, create_news: Any) -> None:
+    """
+    Тест проверяет, что блок самых читаемых новостей отсортирован
+    по числу просмотров.
+    """
+    for views, news in enumerate(create_news):
+        News.objects.filter(pk=news.pk).update(views=views)
+    response = client.get(reverse("news:home"))
+    most_read = [news.views for news in response.context["most_read"]]
+    assert most_read == sorted(most_read, reverse=True)
+    assert len(most_read) == settings.NEWS_MOST_READ_COUNT
+
+
+@pytest.mark.django_db
+def test_archive_pages_read_rollup(
+    client: Any, news: Any, comment: Any
+) -> None:
+    """
+    Тест проверяет, что страницы архива показывают число новостей
+    и комментариев из сводки и не группируют полные таблицы.
+    """
+    day = news.date
+    url: str = reverse("news:archive_day", args=(day.year, day.month, day.day))
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert list(response.context["object_list"]) == [news]
+    stats = response.context["stats"]
+    assert (stats.news_count, stats.comment_count) == (1, 1)
+    assert all("GROUP BY" not in query["sql"]
+               for query in queries.captured_queries)
+    url = reverse("news:archive_month", args=(day.year, day.month))
+    response = client.get(url)
+    assert (response.context["news_count"],
+            response.context["comment_count"]) == (1, 1)
+    huge = 10 ** 20
+    for url in (
+        reverse("news:archive_day", args=(day.year, 2, 30)),
+        reverse("news:archive_day", args=(day.year, 1, huge)),
+        reverse("news:archive_month", args=(day.year, huge)),
+    ):
+        assert client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", ("news:comments_rss", "news:comments_atom"))
+def test_comments_feed_is_cached_and_conditional(
+    client: Any, name: str, news: Any, comment: Any
+) -> None:
+    """
+    Тест проверяет, что лента комментариев отдаётся из кэша без
+    обращения к базе, на условный запрос отвечает 304 и обновляется
+    после нового комментария.
+    """
+    url: str = reverse(name, args=(news.pk,))
+    response = client.get(url)
+    assert response.status_code == 200
+    assert comment.text in response.content.decode()
+    etag = response["ETag"]
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        assert response.status_code == 304
+    assert not queries.captured_queries
+    Comment.objects.create(news=news, author=comment.author, text="Новый")
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "Новый" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_comments_feed_keeps_no_keys_for_missing_news(
+    client: Any, news: Any, comment: Any
+) -> None:
+    """
+    Тест проверяет, что поколение ленты комментариев заводится только
+    для существующей новости и удаляется вместе с ней.
+    """
+    scope = feeds.comments_scope(news.pk)
+    missing = feeds.comments_scope(news.pk + 1000)
+    response = client.get(
+        reverse("news:comments_rss", args=(news.pk + 1000,))
+    )
+    assert response.status_code == 404
+    assert cache.get_generation(missing, create=False) is None
+    response = client.get(reverse("news:comments_rss", args=(news.pk,)))
+    assert response.status_code == 200
+    assert cache.get_generation(scope, create=False) is not None
+    news.delete()
+    assert cache.get_generation(scope, create=False) is None
+
+
+@pytest.mark.django_db
+def test_news_feed_follows_news(client: Any, news: Any) -> None:
+    """
+    Тест проверяет, что лента новостей строится заново после
+    добавления новости.
+    """
+    url: str = reverse("news:feed_rss")
+    assert news.title in client.get(url).content.decode()
+    News.objects.create(title="Свежая новость", text="Текст")
+    assert "Свежая новость" in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_api_news_pages(client: Any, create_news: Any, settings: Any) -> None:
+    """
+    Тест проверяет, что API отдаёт все новости от новых к старым
+    страницами по курсору, а fields= ограничивает поля и столбцы
+    запроса.
+    """
+    settings.NEWS_API_PAGE_SIZE = 4
+    url: str = reverse("news:api_news")
+    ids, cursor = [], None
+    with CaptureQueriesContext(connection) as queries:
+        while True:
+            params = {"fields": "id,title"}
+            if cursor:
+                params["cursor"] = cursor
+            payload = client.get(url, params).json()
+            assert all(set(item) == {"id", "title"}
+                       for item in payload["results"])
+            ids.extend(item["id"] for item in payload["results"])
+            cursor = payload["next"]
+            if not cursor:
+                break
+    expected = list(News.objects.order_by("-date", "-id").values_list(
+        "id", flat=True
+    ))
+    assert ids == expected
+    assert all('"news_news"."text"' not in query["sql"]
+               for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_api_news_detail_and_comments(
+    client: Any, news: Any, create_comments: Any
+) -> None:
+    """
+    Тест проверяет новость и её комментарии в API, ETag и ответы
+    на некорректные запросы.
+    """
+    response = client.get(reverse("news:api_news_detail", args=(news.pk,)))
+    assert response.json()["text"] == news.text
+    assert response.json()["comment_count"] == settings.NUM_COM
+    assert "max-age" in response["Cache-Control"]
+    response = client.get(
+        reverse("news:api_news_detail", args=(news.pk,)),
+        HTTP_IF_NONE_MATCH=response["ETag"],
+    )
+    assert response.status_code == 304
+    url: str = reverse("news:api_comments", args=(news.pk,))
+    comments = client.get(url).json()["results"]
+    assert [item["text"] for item in comments] == list(
+        news.comment_set.values_list("text", flat=True)
+    )
+    assert comments[0]["author"] == "Комментатор"
+    for params in (
+        {"fields": "id,secret"},
+        {"cursor": "не-курсор"},
+        {"cursor": encode_cursor(["2022-01-01T00:00:00+00:00", 10 ** 30])},
+    ):
+        assert client.get(url, params).status_code == 400
+    missing = reverse("news:api_news_detail", args=(news.pk + 1,))
+    assert client.get(missing).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views_match_sync(
+    rf: Any, author: Any, news: Any, create_comments: Any
+) -> None:
+    """
+    Тест проверяет, что асинхронные страницы чтения показывают то же,
+    что синхронные, и не обращаются к базе из цикла событий.
+    """
+    from asgiref.sync import async_to_sync
+
+    from news import async_views
+
+    request = rf.get("/")
+    request.user = author
+    response = async_to_sync(async_views.news_list)(request)
+    assert response.status_code == 200
+    assert news.title in response.content.decode()
+    request = rf.get(f"/news/{news.pk}/")
+    request.user = author
+    response = async_to_sync(async_views.news_detail)(request, pk=news.pk)
+    content = response.content.decode()
+    assert all(comment.text in content for comment in news.comment_set.all())
+    assert "Оставить комментарий" in content
+    with pytest.raises(Http404):
+        async_to_sync(async_views.news_detail)(request, pk=news.pk + 1)
@@ -1,11 +1,29 @@
+import asyncio
+import copy
+import io
+import signal
+import subprocess
+import sys
+import urllib.request
+from datetime import timedelta
 from http import HTTPStatus
 
 import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Count, QuerySet
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from pytest_django.asserts import assertRedirects, assertFormError
 
-from news.forms import WARNING, BAD_WORDS
-from news.models import Comment
+from news import (auth, counters, hot, minhash, prefork, querycache,
+                  rollups, similarity, stream)
+from news.forms import DUPLICATE_WARNING, WARNING, BAD_WORDS
+from news.models import (Comment, CommentFingerprint, DailyStats, HotNews,
+                         News, RelatedNews)
 
 
 @pytest.mark.django_db
@@ -101,3 +119,700 @@ def test_other_user_cant_delete_comment(admin_client, slug_for_args):
     response = admin_client.post(url)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert Comment.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_large_news_text_is_compressed():
+    """
+    Тест проверяет, что большой текст новости хранится сжатым
+    и читается без изменений.
+    """
+    text = 'Очень длинный текст новости. ' * 1000
+    news = News.objects.create(title='Большая новость', text=text)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT length(text) FROM news_news WHERE id = %s', [news.id]
+        )
+        stored_size, = cursor.fetchone()
+    assert stored_size < len(text.encode()) / 5
+    assert News.objects.get(pk=news.pk).text == text
+
+
+def test_near_duplicate_comment_is_rejected(author_client, comment, news):
+    """
+    Тест проверяет, что почти такой же комментарий к той же новости
+    не будет опубликован, а форма вернёт ошибку.
+    """
+    url = reverse('news:detail', args=(news.pk,))
+    response = author_client.post(url, data={'text': 'Текст комментария!!'})
+    assertFormError(
+        response, form='form', field='text', errors=DUPLICATE_WARNING
+    )
+    assert Comment.objects.count() == 1
+    author_client.post(url, data={'text': 'Совсем другое мнение'})
+    assert Comment.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_same_comment_by_other_author_is_allowed(
+    client, django_user_model, comment, news
+):
+    """
+    Тест проверяет, что дубликаты ищутся только среди комментариев
+    того же автора: короткий ответ другого читателя публикуется.
+    """
+    reader = django_user_model.objects.create(username='Читатель')
+    client.force_login(reader)
+    url = reverse('news:detail', args=(news.pk,))
+    client.post(url, data={'text': comment.text})
+    assert Comment.objects.filter(news=news, author=reader).count() == 1
+
+
+@pytest.mark.django_db
+def test_same_comment_to_other_news_is_allowed(author_client, comment):
+    """
+    Тест проверяет, что дубликаты ищутся только среди комментариев
+    той же новости.
+    """
+    other_news = News.objects.create(title='Другая', text='Текст')
+    url = reverse('news:detail', args=(other_news.pk,))
+    author_client.post(url, data={'text': comment.text})
+    assert Comment.objects.filter(news=other_news).count() == 1
+
+
+@pytest.mark.django_db
+def test_backfill_comment_fingerprints(comment, news):
+    """
+    Тест проверяет, что команда заполняет индекс для комментариев,
+    сохранённых в обход сигналов.
+    """
+    CommentFingerprint.objects.all().delete()
+    assert minhash.find_duplicate(news.pk, comment.text) is None
+    call_command('backfill_comment_fingerprints', stdout=io.StringIO())
+    assert minhash.find_duplicate(news.pk, comment.text) == comment
+
+
+def related_titles(news):
+    return [item.title for item in similarity.related_news(news)]
+
+
+@pytest.mark.django_db
+def test_related_news_follow_changes(django_capture_on_commit_callbacks):
+    """
+    Тест проверяет, что списки похожих новостей обновляются при
+    добавлении, правке и удалении новостей.
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        first = News.objects.create(
+            title='Футбол', text='Сборная выиграла матч'
+        )
+    assert related_titles(first) == []
+    with django_capture_on_commit_callbacks(execute=True):
+        second = News.objects.create(
+            title='Хоккей', text='Сборная проиграла матч'
+        )
+    assert related_titles(first) == ['Хоккей']
+    assert related_titles(second) == ['Футбол']
+    second.title = 'Погода'
+    second.text = 'Завтра дождь'
+    with django_capture_on_commit_callbacks(execute=True):
+        second.save()
+    assert related_titles(first) == []
+    with django_capture_on_commit_callbacks(execute=True):
+        third = News.objects.create(title='Матч', text='Сборная выиграла')
+    assert related_titles(first) == ['Матч']
+    with django_capture_on_commit_callbacks(execute=True):
+        third.delete()
+    assert related_titles(first) == []
+
+
+@pytest.mark.django_db
+def test_related_news_wait_for_commit(django_capture_on_commit_callbacks):
+    """
+    Тест проверяет, что сохранение новости не строит индекс похожих
+    внутри запроса: пересчёт откладывается до фиксации транзакции.
+    """
+    News.objects.create(title='Футбол', text='Сборная выиграла матч')
+    with django_capture_on_commit_callbacks() as callbacks:
+        second = News.objects.create(
+            title='Хоккей', text='Сборная проиграла матч'
+        )
+    assert similarity._index is None
+    assert related_titles(second) == []
+    assert len(callbacks) == 1
+    callbacks[0]()
+    assert related_titles(second) == ['Футбол']
+
+
+@pytest.mark.django_db
+def test_rebuild_related_news():
+    """
+    Тест проверяет, что команда заново считает списки похожих новостей,
+    в том числе для новостей, созданных в обход сигналов.
+    """
+    News.objects.bulk_create([
+        News(title='Футбол', text='Сборная выиграла матч'),
+        News(title='Хоккей', text='Сборная проиграла матч'),
+    ])
+    assert not RelatedNews.objects.exists()
+    call_command('rebuild_related_news', stdout=io.StringIO())
+    first = News.objects.get(title='Футбол')
+    assert related_titles(first) == ['Хоккей']
+
+
+@pytest.mark.django_db
+def test_views_are_flushed_in_batches(client, news, settings):
+    """
+    Тест проверяет, что просмотры копятся в памяти и записываются
+    в базу одним запросом на каждый различный прирост.
+    """
+    settings.NEWS_VIEWS_FLUSH_INTERVAL = 3600
+    other = News.objects.create(title='Другая', text='Текст')
+    url = reverse('news:detail', args=(news.pk,))
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(3):
+            response = client.get(url)
+    assert not any(
+        query['sql'].startswith('UPDATE') for query in queries
+    )
+    assert response.context['news'].views == 3
+    counters.hit(other.pk)
+    with CaptureQueriesContext(connection) as queries:
+        assert counters.flush() == 4
+    assert len(queries) == 2
+    news.refresh_from_db()
+    other.refresh_from_db()
+    assert (news.views, other.views) == (3, 1)
+
+
+@pytest.mark.django_db
+def test_edit_does_not_overwrite_views(news):
+    """
+    Тест проверяет, что правка новости не затирает просмотры,
+    записанные после её загрузки.
+    """
+    counters.hit(news.pk)
+    counters.flush()
+    news.title = 'Новый заголовок'
+    news.save()
+    news.refresh_from_db()
+    assert (news.title, news.views) == ('Новый заголовок', 1)
+
+
+@pytest.mark.django_db
+def test_save_after_delete_inserts_news(news):
+    """
+    Тест проверяет, что новость, строку которой удалили после загрузки,
+    сохраняется заново, а не падает на обновлении без строк.
+    """
+    News.objects.filter(pk=news.pk).delete()
+    news.title = 'Новый заголовок'
+    news.save()
+    assert News.objects.get(pk=news.pk).title == 'Новый заголовок'
+
+
+@pytest.mark.django_db
+def test_views_survive_failed_flush(client, news, settings, monkeypatch):
+    """
+    Тест проверяет, что ошибка базы при сбросе просмотров не ломает
+    страницу новости, а просмотры записываются при следующем сбросе.
+    """
+    settings.NEWS_VIEWS_FLUSH_INTERVAL = 0
+
+    def locked(*args, **kwargs):
+        raise OperationalError('database is locked')
+
+    url = reverse('news:detail', args=(news.pk,))
+    with monkeypatch.context() as patch:
+        patch.setattr(QuerySet, 'update', locked)
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert counters.pending(news.pk) == 1
+    client.get(url)
+    news.refresh_from_db()
+    assert news.views == 2
+
+
+@pytest.mark.django_db
+def test_hot_news_follow_comments(author, settings):
+    """
+    Тест проверяет, что комментарии поднимают новость в рейтинге
+    обсуждаемых, а пересчёт уменьшает оценки со временем.
+    """
+    quiet = News.objects.create(title='Тихая', text='Текст')
+    loud = News.objects.create(title='Громкая', text='Текст')
+    old = News.objects.create(
+        title='Старая', text='Текст',
+        date=timezone.localdate() - timedelta(
+            days=settings.HOT_NEWS_MAX_AGE_DAYS + 1
+        ),
+    )
+    for index in range(3):
+        Comment.objects.create(news=loud, author=author, text=f'Да {index}')
+    comment = Comment.objects.create(news=quiet, author=author, text='Нет')
+    Comment.objects.create(news=old, author=author, text='Поздно')
+    assert [item.news for item in hot.popular()] == [loud, quiet]
+    assert HotNews.objects.get(news=loud).score == 3
+    comment.delete()
+    assert HotNews.objects.get(news=quiet).score == 0
+    # Отсчёт от времени оценки, а не от now(): тест не зависит от того,
+    # сколько длились запросы выше.
+    hot.decay(HotNews.objects.get(news=loud).updated + timedelta(
+        seconds=settings.HOT_NEWS_HALF_LIFE
+    ))
+    assert HotNews.objects.get(news=loud).score == pytest.approx(1.5)
+    assert not HotNews.objects.filter(news=quiet).exists()
+
+
+@pytest.mark.django_db
+def test_hot_news_rebuild_and_json(client, comment, news):
+    """
+    Тест проверяет пересчёт рейтинга по всем комментариям и его выдачу
+    в JSON.
+    """
+    HotNews.objects.all().delete()
+    call_command('decay_hot_news', '--rebuild', stdout=io.StringIO())
+    response = client.get(reverse('news:hot'))
+    assert response.status_code == HTTPStatus.OK
+    [item] = response.json()['news']
+    assert item['id'] == news.pk
+    assert item['score'] == pytest.approx(1, abs=0.01)
+
+
+def daily_stats():
+    return {
+        stats.day: (stats.news_count, stats.comment_count)
+        for stats in DailyStats.objects.exclude(news_count=0, comment_count=0)
+    }
+
+
+@pytest.mark.django_db
+def test_daily_stats_follow_writes(author):
+    """
+    Тест проверяет, что сводка по дням обновляется при записи новостей
+    и комментариев и совпадает с пересчётом по полным таблицам.
+    """
+    today = timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    news = News.objects.create(title='Сегодня', text='Текст')
+    other = News.objects.create(title='Вчера', text='Текст', date=yesterday)
+    comment = Comment.objects.create(news=news, author=author, text='Раз')
+    Comment.objects.create(news=other, author=author, text='Два')
+    assert daily_stats() == {today: (1, 2), yesterday: (1, 0)}
+    news.date = yesterday
+    news.save()
+    comment.delete()
+    assert daily_stats() == {today: (0, 1), yesterday: (2, 0)}
+    other.delete()
+    incremental = daily_stats()
+    assert incremental == {yesterday: (1, 0)}
+    rollups.backfill()
+    assert daily_stats() == incremental
+
+
+def stream_scope(news_id, headers=()):
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': reverse('news:comments_stream', args=(news_id,)),
+        'headers': list(headers),
+    }
+
+
+@pytest.mark.django_db
+def test_comment_stream(
+    news, author, settings, django_capture_on_commit_callbacks
+):
+    """
+    Тест проверяет, что поток комментариев через ASGI получает
+    комментарии, сохранённые этим процессом, и находит опросом
+    сохранённые в обход сигналов, как это было бы в другом процессе.
+    """
+    from yanews.asgi import application
+
+    settings.COMMENT_STREAM_POLL_INTERVAL = 0.05
+
+    def write_comments():
+        with django_capture_on_commit_callbacks(execute=True):
+            Comment.objects.create(news=news, author=author, text='Живой')
+        Comment.objects.bulk_create([
+            Comment(news=news, author=author, text='Из другого процесса')
+        ])
+
+    async def scenario():
+        communicator = ApplicationCommunicator(
+            application, stream_scope(news.pk)
+        )
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(1)
+        assert start['status'] == HTTPStatus.OK
+        await sync_to_async(write_comments)()
+        body = b''
+        while 'Из другого процесса'.encode() not in body:
+            body += (await communicator.receive_output(1))['body']
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+        return body.decode()
+
+    body = async_to_sync(scenario)()
+    assert body.count('event: comment') == 2
+    assert body.index('Живой') < body.index('Из другого процесса')
+
+    async def missing():
+        communicator = ApplicationCommunicator(
+            application, stream_scope(news.pk + 1)
+        )
+        await communicator.send_input({'type': 'http.request'})
+        return (await communicator.receive_output(1))['status']
+
+    assert async_to_sync(missing)() == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_comment_stream_catches_up_in_pages(news, author, monkeypatch):
+    """
+    Тест проверяет, что переподключившийся клиент получает все
+    пропущенные комментарии, а не только первую страницу.
+    """
+    from yanews.asgi import application
+
+    monkeypatch.setattr(stream, 'BATCH_SIZE', 2)
+    comments = Comment.objects.bulk_create([
+        Comment(news=news, author=author, text=f'Комментарий {index}')
+        for index in range(6)
+    ])
+    seen = Comment.objects.filter(news=news).order_by('id').first().id
+
+    async def scenario():
+        communicator = ApplicationCommunicator(
+            application,
+            stream_scope(news.pk, [(b'last-event-id', str(seen).encode())]),
+        )
+        await communicator.send_input({'type': 'http.request'})
+        await communicator.receive_output(1)
+        body = b''
+        while body.count(b'event: comment') < len(comments) - 1:
+            body += (await communicator.receive_output(1))['body']
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+        return body.decode()
+
+    body = async_to_sync(scenario)()
+    assert 'Комментарий 0' not in body
+    assert body.index('Комментарий 1') < body.index('Комментарий 5')
+
+
+@pytest.mark.django_db
+def test_comment_stream_survives_db_errors(
+    news, author, settings, monkeypatch
+):
+    """
+    Тест проверяет, что ошибка базы при опросе не останавливает канал:
+    следующий опрос находит новые комментарии.
+    """
+    from yanews.asgi import application
+
+    settings.COMMENT_STREAM_POLL_INTERVAL = 0.05
+    fetch = stream.fetch
+    failures = []
+
+    async def flaky_fetch(news_id, after_id):
+        if not failures:
+            failures.append(after_id)
+            raise OperationalError('database is locked')
+        return await fetch(news_id, after_id)
+
+    monkeypatch.setattr(stream, 'fetch', flaky_fetch)
+
+    async def scenario():
+        communicator = ApplicationCommunicator(
+            application, stream_scope(news.pk)
+        )
+        await communicator.send_input({'type': 'http.request'})
+        await communicator.receive_output(1)
+        while not failures:
+            await asyncio.sleep(0.01)
+        await sync_to_async(Comment.objects.create)(
+            news=news, author=author, text='После ошибки'
+        )
+        body = b''
+        while 'После ошибки'.encode() not in body:
+            body += (await communicator.receive_output(1))['body']
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+
+    async_to_sync(scenario)()
+
+
+def test_serve_recycles_workers(settings, cache_env):
+    """
+    Тест проверяет, что manage.py serve обслуживает запросы воркерами,
+    заменяет воркер после --max-requests и при остановке сообщает,
+    сколько запросов обработал каждый.
+    """
+    server = subprocess.Popen(
+        [sys.executable, 'manage.py', 'serve', '--bind', '127.0.0.1:0',
+         '--workers', '2', '--max-requests', '2'],
+        cwd=settings.BASE_DIR, env=cache_env, stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        address = server.stdout.readline().split()[1].rstrip(',')
+        for _ in range(5):
+            with urllib.request.urlopen(f'{address}auth/login/') as response:
+                assert response.status == HTTPStatus.OK
+    finally:
+        server.send_signal(signal.SIGTERM)
+        output = server.communicate(timeout=10)[0]
+    counts = [
+        int(line.split()[-1]) for line in output.splitlines()
+        if line.startswith('Воркер')
+    ]
+    assert sum(counts) == 5
+    assert len(counts) >= 3
+    assert max(counts) == 2
+
+
+@pytest.mark.parametrize('arguments', [
+    ['--max-requests', '0'],
+    ['--workers', '0'],
+    ['--bind', '127.0.0.1:²'],
+    ['--bind', '127.0.0.1:70000'],
+])
+def test_serve_rejects_bad_arguments(arguments):
+    """
+    Тест проверяет, что manage.py serve не запускается с воркерами,
+    которые завершались бы сразу, и с неверным портом.
+    """
+    with pytest.raises(CommandError):
+        call_command('serve', *arguments)
+
+
+def test_arbiter_backs_off_crashed_workers(monkeypatch):
+    """
+    Тест проверяет, что упавший воркер перезапускается после паузы,
+    которая растёт с каждым падением подряд.
+    """
+    arbiter = prefork.Arbiter(
+        None, ('127.0.0.1', 0), 1, 1, lambda message: None
+    )
+    spawned = []
+    monkeypatch.setattr(arbiter, 'spawn', lambda: spawned.append(1))
+    try:
+        for backoff in (1, 2, 4):
+            exits = [(100, 1 << 8)]
+
+            def waitpid(pid, options):
+                if not exits:
+                    raise ChildProcessError
+                return exits.pop()
+
+            monkeypatch.setattr(prefork.os, 'waitpid', waitpid)
+            arbiter.pids.add(100)
+            arbiter.reap()
+            assert (spawned, arbiter.backoff) == ([], backoff)
+            arbiter.respawn()
+            assert spawned == []
+            arbiter.respawns = [0]
+            arbiter.respawn()
+            assert spawned == [1]
+            spawned.clear()
+    finally:
+        arbiter.listener.close()
+
+
+@pytest.mark.django_db
+def test_warmup_reports_stages():
+    """
+    Тест проверяет, что прогрев проходит все шаги и отчитывается
+    о каждом, а без database пропускает соединение с базой.
+    """
+    from yanews import warmup
+
+    stream = io.StringIO()
+    stages = [name for name, _, _ in warmup.run(stream=stream)]
+    assert stages == ['маршруты', 'перевод', 'шаблоны', 'база данных']
+    assert 'итого' in stream.getvalue()
+    stages = warmup.run(database=False, stream=io.StringIO())
+    assert 'база данных' not in [name for name, _, _ in stages]
+
+
+def test_cached_templates_are_reused(settings):
+    """
+    Тест проверяет, что с кэширующим загрузчиком шаблон разбирается
+    один раз, а без него — на каждый запрос.
+    """
+    from django.template import engines
+
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    for cached in (False, True):
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['OPTIONS']['loaders'] = (
+            [('django.template.loaders.cached.Loader', loaders)]
+            if cached else loaders
+        )
+        settings.TEMPLATES = templates
+        engine = engines['django']
+        first, second = (
+            engine.get_template('news/detail.html').template
+            for _ in range(2)
+        )
+        assert (first is second) == cached
+
+
+@pytest.mark.django_db
+def test_session_and_user_come_from_cache(
+    author_client, author, django_assert_num_queries
+):
+    """
+    Тест проверяет, что повторный запрос не обращается к базе за сессией
+    и пользователем, а сохранение пользователя и выход сбрасывают кэш.
+    """
+    url = reverse('users:login')
+    author_client.get(url)
+    with django_assert_num_queries(0):
+        response = author_client.get(url)
+    assert response.context['user'] == author
+    author.save()
+    with django_assert_num_queries(1):
+        author_client.get(url)
+    author.set_password('new-password')
+    author.save()
+    # Сессия со старым паролем больше не действует.
+    assert not author_client.get(url).context['user'].is_authenticated
+    author_client.force_login(author)
+    author_client.get(url)
+    author_client.post(reverse('users:logout'))
+    response = author_client.get(url)
+    assert not response.context['user'].is_authenticated
+
+
+@pytest.mark.django_db
+def test_logout_reaches_other_processes(
+    author_client, author, settings, cache_env
+):
+    """
+    Тест проверяет, что кэш пользователей общий для процессов: выход
+    из аккаунта сразу виден, например, другому воркеру manage.py serve.
+    """
+    key = auth.USER_KEY.format(user_id=author.pk)
+    script = (
+        'import django; django.setup(); '
+        'from django.core.cache import cache; '
+        f'print(cache.get({key!r}) is not None)'
+    )
+
+    def cached_in_other_process():
+        return subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR,
+            env=cache_env, capture_output=True, text=True, check=True,
+        ).stdout.strip() == 'True'
+
+    author_client.get(reverse('users:login'))
+    assert cached_in_other_process()
+    author_client.post(reverse('users:logout'))
+    assert not cached_in_other_process()
+
+
+@pytest.mark.django_db
+def test_sessions_of_model_backend_stay_valid(client, author):
+    """
+    Тест проверяет, что сессии, открытые через ModelBackend до кэша
+    пользователей, после обновления не разлогиниваются.
+    """
+    client.force_login(
+        author, backend='django.contrib.auth.backends.ModelBackend'
+    )
+    response = client.get(reverse('users:login'))
+    assert response.context['user'] == author
+
+
+@pytest.mark.parametrize(
+    'name, data, expected_queries',
+    (
+        # Новость; отпечатки: поиск, удаление, вставка; комментарий;
+        # оценка обсуждаемости: проверка даты и запись; сводка за день.
+        ('news:detail', {'text': 'Совсем другой текст'}, 8),
+        # Комментарий; отпечатки: поиск, удаление, вставка; комментарий.
+        ('news:edit', {'text': 'Правка'}, 5),
+        # Комментарий; отпечатки; комментарий; оценка: чтение и запись;
+        # сводка за день.
+        ('news:delete', {}, 6),
+    ),
+)
+def test_mutating_views_load_rows_once(
+    name, data, expected_queries, author_client, comment, news
+):
+    """
+    Тест проверяет, что изменяющие представления загружают каждую
+    строку не больше одного раза за запрос.
+    """
+    pk = news.pk if name == 'news:detail' else comment.pk
+    url = reverse(name, args=(pk,))
+    # Первый запрос кладёт пользователя в кэш.
+    author_client.get(reverse('users:login'))
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.post(url, data=data)
+    assert response.status_code == HTTPStatus.FOUND
+    assert len(queries) == expected_queries
+    selects = [
+        query['sql'] for query in queries.captured_queries
+        if query['sql'].startswith('SELECT')
+    ]
+    assert len(selects) == len(set(selects))
+
+
+@pytest.mark.django_db
+def test_query_cache(news, author, django_assert_num_queries):
+    """
+    Тест проверяет, что News.cached отдаёт строки и число записей
+    из кэша, а изменение новостей или комментариев сбрасывает кэш.
+    """
+    titles = News.cached.values_list('title', flat=True)
+    assert list(titles) == [news.title]
+    assert News.cached.count() == 1
+    with django_assert_num_queries(0):
+        assert list(titles.all()) == [news.title]
+        assert News.cached.count() == 1
+    # Тот же SQL, но другой вид строк.
+    assert list(News.cached.values('title')) == [{'title': news.title}]
+    News.objects.create(title='Вторая', text='Текст')
+    assert News.cached.count() == 2
+    comments = News.cached.annotate(comments=Count('comment')).filter(
+        pk=news.pk
+    )
+    assert comments.get().comments == 0
+    Comment.objects.create(news=news, author=author, text='Текст')
+    assert comments.get().comments == 1
+
+
+@pytest.mark.django_db
+def test_query_cache_serves_stale_rows(news, settings, monkeypatch):
+    """
+    Тест проверяет, что устаревшая запись отдаётся сразу, а обновляет
+    её в фоне один запрос; пока после изменения данных запрос выполняет
+    другой процесс, отдаётся прежний результат.
+    """
+    refreshes = []
+    monkeypatch.setattr(
+        querycache, 'submit', lambda *args: refreshes.append(args)
+    )
+    settings.NEWS_QUERY_CACHE_TIMEOUT = 0
+    titles = News.cached.values_list('title', flat=True)
+    assert list(titles.all()) == [news.title]
+    # Обновление в обход сигналов: кэш об этом не знает.
+    News.objects.update(title='Новый заголовок')
+    assert list(titles.all()) == [news.title]
+    assert list(titles.all()) == [news.title]
+    assert len(refreshes) == 1
+    func, *args = refreshes[0]
+    func(*args)
+    assert list(titles.all()) == ['Новый заголовок']
+    news.title = 'Из другого процесса'
+    news.save()
+    # Блокировку держит процесс, который уже выполняет запрос.
+    monkeypatch.setattr(querycache.cache, 'add', lambda *args: False)
+    assert list(titles.all()) == ['Новый заголовок']
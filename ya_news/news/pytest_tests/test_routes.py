@@ -3,6 +3,8 @@ from http import HTTPStatus
 
 import pytest
 from pytest_django.asserts import assertRedirects
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 
@@ -90,3 +92,62 @@ def test_redirects(client: Any, name: str, args: Any) -> None:
     expected_url = f"{login_url}?next={url}"
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+def assert_indexed(queries: list[dict]) -> None:
+    """
+    Проверяет по EXPLAIN QUERY PLAN, что запросы не читают таблицы
+    целиком и не сортируют строки во временном B-дереве.
+    """
+    for query in queries:
+        if not query["sql"].startswith("SELECT"):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+            plan = [row[-1] for row in cursor.fetchall()]
+        for step in plan:
+            assert not (
+                step.startswith("SCAN") and "INDEX" not in step
+            ), f"Полный просмотр таблицы: {step}\n{query['sql']}"
+            assert "TEMP B-TREE" not in step, (
+                f"Сортировка без индекса: {step}\n{query['sql']}"
+            )
+
+
+@pytest.mark.parametrize(
+    "name, get_args",
+    (
+        ("news:home", lambda news, comment: None),
+        ("news:detail", lambda news, comment: (news.pk,)),
+        ("news:hot", lambda news, comment: None),
+        ("news:api_news", lambda news, comment: None),
+        ("news:api_news_detail", lambda news, comment: (news.pk,)),
+        ("news:api_comments", lambda news, comment: (news.pk,)),
+        ("news:feed_rss", lambda news, comment: None),
+        ("news:comments_rss", lambda news, comment: (news.pk,)),
+        (
+            "news:archive_day",
+            lambda news, comment: (
+                news.date.year, news.date.month, news.date.day
+            ),
+        ),
+        (
+            "news:archive_month",
+            lambda news, comment: (news.date.year, news.date.month),
+        ),
+        ("news:edit", lambda news, comment: (comment.pk,)),
+        ("news:delete", lambda news, comment: (comment.pk,)),
+    ),
+)
+def test_page_queries_use_indexes(
+    author_client: Any, news: Any, comment: Any, name: str, get_args: Any
+) -> None:
+    """
+    Тест проверяет, что все запросы страниц идут по индексам: без
+    полного просмотра таблиц и без сортировки во временном B-дереве.
+    """
+    url = reverse(name, args=get_args(news, comment))
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert_indexed(queries.captured_queries)
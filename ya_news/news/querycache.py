@@ -0,0 +1,164 @@
+"""
+Кэш результатов запросов к базе.
+
+Менеджер CachedManager (News.cached) отдаёт наборы записей, строки
+которых берутся из кэша. Ключ строится по SQL запроса и поколениям
+моделей, от которых зависит результат: модели менеджера и моделей
+из depends_on. Сохранение или удаление такой модели увеличивает её
+поколение, и прежние ключи перестают читаться.
+
+Чтобы запрос не выполняли все процессы разом:
+- запись старше NEWS_QUERY_CACHE_TIMEOUT отдаётся как есть, а обновляет
+  её в фоне один процесс — тот, кто первым взял блокировку;
+- после изменения данных запрос выполняет тоже один процесс,
+  остальные до его окончания получают прежний результат.
+"""
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import close_old_connections, models
+from django.db.models.signals import post_delete, post_save
+
+from . import cache as generations
+
+ROWS_KEY = 'news:query:{digest}:{generations}'
+LATEST_KEY = 'news:query:{digest}:latest'
+LOCK_KEY = 'news:query:{digest}:lock'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='news-query')
+
+
+def model_scope(model):
+    return f'model:{model._meta.label}'
+
+
+def model_changed(sender, **kwargs):
+    """Сбрасывает кэш запросов, зависящих от модели sender."""
+    generations.bump_generation(model_scope(sender))
+
+
+def _refresh(compute, keys, lock_key):
+    close_old_connections()
+    try:
+        _store(compute(), keys)
+    finally:
+        cache.delete(lock_key)
+        close_old_connections()
+
+
+def submit(func, *args):
+    """Запускает обновление записи в фоне."""
+    _executor.submit(func, *args)
+
+
+def _store(value, keys):
+    entry = (time.time() + settings.NEWS_QUERY_CACHE_TIMEOUT, value)
+    for key in keys:
+        cache.set(key, entry, settings.NEWS_QUERY_CACHE_STALE_TIMEOUT)
+    return value
+
+
+def fetch(queryset, kind, compute):
+    """Результат compute() для queryset из кэша."""
+    try:
+        sql, params = queryset.query.get_compiler(
+            using=queryset.db
+        ).as_sql()
+    except EmptyResultSet:
+        return compute()
+    digest = hashlib.md5(
+        repr((kind, queryset.db, sql, params)).encode()
+    ).hexdigest()
+    keys = (
+        ROWS_KEY.format(digest=digest, generations='-'.join(
+            str(generations.get_generation(model_scope(model)))
+            for model in queryset.cache_models()
+        )),
+        LATEST_KEY.format(digest=digest),
+    )
+    lock_key = LOCK_KEY.format(digest=digest)
+    entry = cache.get(keys[0])
+    if entry is not None:
+        fresh_until, value = entry
+        if fresh_until < time.time() and cache.add(
+            lock_key, 1, settings.NEWS_QUERY_CACHE_LOCK_TIMEOUT
+        ):
+            submit(_refresh, compute, keys, lock_key)
+        return value
+    if not cache.add(lock_key, 1, settings.NEWS_QUERY_CACHE_LOCK_TIMEOUT):
+        # Запрос уже выполняет другой процесс: пока отдаём прежний
+        # результат, если он есть.
+        latest = cache.get(keys[1])
+        if latest is not None:
+            return latest[1]
+        return compute()
+    try:
+        return _store(compute(), keys)
+    finally:
+        cache.delete(lock_key)
+
+
+class CachedQuerySet(models.QuerySet):
+    """Набор записей, строки и число которых берутся из кэша."""
+
+    depends_on = ()
+
+    def cache_models(self):
+        return (self.model, *self.depends_on)
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.depends_on = self.depends_on
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            clone = self._chain()
+            # Одинаковый SQL у values() и values_list() даёт разные строки.
+            self._result_cache = fetch(
+                self, self._iterable_class.__name__,
+                lambda: list(clone._iterable_class(clone)),
+            )
+        if self._prefetch_related_lookups and not self._prefetch_done:
+            self._prefetch_related_objects()
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        clone = self._chain()
+        return fetch(self, 'count', lambda: clone.query.get_count(clone.db))
+
+
+class CachedManager(models.Manager.from_queryset(CachedQuerySet)):
+    """
+    Менеджер кэшированных запросов.
+
+    depends_on — другие модели, от которых зависит результат (через
+    JOIN или подзапросы); при их изменении кэш тоже сбрасывается.
+    """
+
+    def __init__(self, depends_on=()):
+        super().__init__()
+        self.depends_on = tuple(depends_on)
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        for sender in (cls, *self.depends_on):
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    model_changed, sender=sender, weak=False,
+                    dispatch_uid=f'querycache:{sender}',
+                )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        queryset.depends_on = tuple(
+            apps.get_model(model) if isinstance(model, str) else model
+            for model in self.depends_on
+        )
+        return queryset
@@ -0,0 +1,80 @@
+"""
+Сводка по дням для архива новостей.
+
+DailyStats хранит число новостей и комментариев за каждый день.
+Сводка обновляется при записи новостей и комментариев, поэтому страницам
+архива не нужно группировать полные таблицы. Для данных, записанных
+в обход сигналов, есть команда backfill_daily_stats.
+"""
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import Comment, DailyStats, News
+
+
+def news_day(value):
+    # До чтения из базы поле даты новости может хранить datetime.
+    return value.date() if isinstance(value, datetime) else value
+
+
+def comment_day(created):
+    return timezone.localdate(created)
+
+
+def _change(day, **deltas):
+    values = {
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    }
+    if DailyStats.objects.filter(day=day).update(**values):
+        return
+    positive = {name: max(delta, 0) for name, delta in deltas.items()}
+    try:
+        with transaction.atomic():
+            DailyStats.objects.create(day=day, **positive)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос.
+        DailyStats.objects.filter(day=day).update(**values)
+
+
+def news_added(news):
+    _change(news_day(news.date), news_count=1)
+
+
+def news_moved(previous_day, news):
+    day = news_day(news.date)
+    if previous_day != day:
+        _change(previous_day, news_count=-1)
+        _change(day, news_count=1)
+
+
+def news_deleted(news):
+    _change(news_day(news.date), news_count=-1)
+
+
+def comment_added(comment):
+    _change(comment_day(comment.created), comment_count=1)
+
+
+def comment_deleted(comment):
+    _change(comment_day(comment.created), comment_count=-1)
+
+
+def backfill():
+    """Пересчитывает сводку по полным таблицам."""
+    stats = {}
+    for day, count in News.objects.values_list('date').annotate(
+        Count('id')
+    ).order_by():
+        stats[day] = DailyStats(day=day, news_count=count)
+    for day, count in Comment.objects.annotate(
+        day=TruncDate('created')
+    ).values_list('day').annotate(Count('id')).order_by():
+        stats.setdefault(day, DailyStats(day=day)).comment_count = count
+    with transaction.atomic():
+        DailyStats.objects.all().delete()
+        DailyStats.objects.bulk_create(stats.values())
+    return len(stats)
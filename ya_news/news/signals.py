@@ -0,0 +1,128 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.db import transaction
+from django.dispatch import receiver
+
+from . import auth, cache, feeds, hot, minhash, rollups, similarity, stream
+from .models import Comment, News
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw, **kwargs):
+    """Обновляет ключи для поиска почти одинаковых комментариев."""
+    if not raw:
+        minhash.index_comment(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    """Новый комментарий поднимает новость в рейтинге обсуждаемых."""
+    if created and not raw:
+        hot.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    hot.comment_deleted(instance)
+
+
+@receiver(post_save, sender=News)
+def news_saved(sender, instance, created, raw, **kwargs):
+    """Пересчитывает похожие новости в фоне после фиксации транзакции."""
+    cache.bump_generation(similarity.SCOPE)
+    if not raw:
+        transaction.on_commit(partial(
+            similarity.submit, similarity.news_saved, instance.pk, created
+        ))
+
+
+@receiver(pre_delete, sender=News)
+def remember_linked_news(sender, instance, **kwargs):
+    # После удаления ссылки на новость из чужих списков уже не найти.
+    instance._linked_news_ids = similarity.linked_news(instance.id)
+
+
+@receiver(post_delete, sender=News)
+def news_deleted(sender, instance, **kwargs):
+    cache.bump_generation(similarity.SCOPE)
+    transaction.on_commit(partial(
+        similarity.submit, similarity.news_deleted,
+        instance.id, getattr(instance, '_linked_news_ids', ()),
+    ))
+
+
+@receiver(pre_save, sender=News)
+def remember_news_day(sender, instance, raw, **kwargs):
+    # День новости мог измениться: сводку нужно поправить за оба дня.
+    if not raw and not instance._state.adding:
+        instance._previous_day = News.objects.filter(
+            pk=instance.pk
+        ).values_list('date', flat=True).first()
+
+
+@receiver(post_save, sender=News)
+def count_news(sender, instance, created, raw, **kwargs):
+    """Обновляет сводку по дням для архива."""
+    if raw:
+        return
+    if created:
+        rollups.news_added(instance)
+    elif getattr(instance, '_previous_day', None) is not None:
+        rollups.news_moved(instance._previous_day, instance)
+
+
+@receiver(post_delete, sender=News)
+def uncount_news(sender, instance, **kwargs):
+    rollups.news_deleted(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        rollups.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    rollups.comment_deleted(instance)
+
+
+@receiver(post_save, sender=News)
+def news_feed_changed(sender, instance, **kwargs):
+    """Лента комментариев показывает заголовок новости."""
+    cache.bump_generation(feeds.comments_scope(instance.pk))
+
+
+@receiver(post_delete, sender=News)
+def news_feed_deleted(sender, instance, **kwargs):
+    cache.forget_generation(feeds.comments_scope(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comments_feed_changed(sender, instance, **kwargs):
+    cache.bump_generation(feeds.comments_scope(instance.news_id))
+
+
+@receiver(post_save, sender=Comment)
+def stream_comment(sender, instance, created, raw, **kwargs):
+    """Отправляет новый комментарий в поток после фиксации транзакции."""
+    if created and not raw:
+        transaction.on_commit(lambda: stream.publish(instance))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """Пользователь из кэша не должен пережить смену пароля или удаление."""
+    auth.forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        auth.forget_user(user.pk)
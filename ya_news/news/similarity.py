@@ -0,0 +1,274 @@
+"""
+Похожие новости.
+
+Для каждой новости заранее считаются RELATED_NEWS_COUNT самых похожих
+по TF-IDF заголовка и текста, и они хранятся в RelatedNews: странице
+новости остаётся прочитать готовый список одним запросом.
+
+Для пересчёта в памяти процесса держится обратный индекс всех новостей.
+Сохранённая новость получает свой список и попадает в списки тех
+новостей, для которых она похожа сильнее худшей из их похожих.
+Пересчёт идёт в фоновом потоке после фиксации транзакции, поэтому
+запрос, сохранивший новость, его не ждёт. Индекс строится лениво,
+при первом пересчёте, и помнит поколение новостей (см. news.cache):
+если новости изменил другой процесс, индекс строится заново. Веса IDF
+в уже посчитанных списках при добавлении новостей не обновляются,
+поэтому время от времени списки стоит пересчитать командой
+rebuild_related_news.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+
+from . import cache
+from .models import News, RelatedNews
+
+SCOPE = 'news'
+WORD_RE = re.compile(r'\w{3,}')
+# Сколько самых весомых слов новости участвует в поиске похожих.
+MAX_QUERY_TERMS = 20
+# Слова, которые есть больше чем в такой доле новостей, не учитываются:
+# они почти не влияют на сходство, а перебирать их новости долго.
+# Короткие списки новостей дёшевы, поэтому их не отбрасываем.
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_SKIPPED_POSTINGS = 100
+
+_index = None
+_lock = threading.Lock()
+# Один поток: пересчёты выполняются по очереди, в порядке сохранений.
+_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='news-related'
+)
+
+
+def tokenize(title, text):
+    """Частоты слов новости; слова заголовка весят вдвое больше."""
+    terms = Counter(WORD_RE.findall(text.lower()))
+    for term in WORD_RE.findall(title.lower()):
+        terms[term] += 2
+    return terms
+
+
+class NewsIndex:
+    """Обратный индекс всех новостей."""
+
+    def __init__(self, generation=None):
+        self.generation = generation
+        self.vectors = {}
+        self.postings = defaultdict(dict)
+        self.norms = {}
+        # Размер сохранённого списка похожих и оценка худшей из них.
+        self.floors = {}
+
+    def add(self, news_id, title, text):
+        self.remove(news_id)
+        weights = {
+            term: 1 + math.log(count)
+            for term, count in tokenize(title, text).items()
+        }
+        for term, weight in weights.items():
+            self.postings[term][news_id] = weight
+        self.vectors[news_id] = weights
+        self.norms[news_id] = math.sqrt(
+            sum(weight * weight for weight in weights.values())
+        ) or 1.0
+
+    def remove(self, news_id):
+        if news_id not in self.vectors:
+            return
+        for term in self.vectors.pop(news_id):
+            del self.postings[term][news_id]
+            if not self.postings[term]:
+                del self.postings[term]
+        del self.norms[news_id]
+        self.floors.pop(news_id, None)
+
+    def idf(self, term):
+        return math.log(
+            (1 + len(self.vectors)) / (1 + len(self.postings[term]))
+        )
+
+    def scores(self, news_id):
+        """Сходство новости со всеми, у кого есть общие значимые слова."""
+        if news_id not in self.vectors:
+            return {}
+        max_frequency = max(
+            MAX_DOCUMENT_FREQUENCY * len(self.vectors), MIN_SKIPPED_POSTINGS
+        )
+        query = heapq.nlargest(MAX_QUERY_TERMS, (
+            (weight * self.idf(term), term)
+            for term, weight in self.vectors[news_id].items()
+            if len(self.postings[term]) <= max_frequency
+        ))
+        scores = defaultdict(float)
+        for query_weight, term in query:
+            idf = self.idf(term)
+            for other_id, weight in self.postings[term].items():
+                scores[other_id] += query_weight * weight * idf
+        scores.pop(news_id, None)
+        norm = self.norms[news_id]
+        return {
+            other_id: score / (norm * self.norms[other_id])
+            for other_id, score in scores.items()
+        }
+
+    def top(self, news_id, scores=None):
+        """Самые похожие новости: список пар (id, оценка)."""
+        if scores is None:
+            scores = self.scores(news_id)
+        return heapq.nlargest(
+            settings.RELATED_NEWS_COUNT, scores.items(),
+            key=lambda item: item[1],
+        )
+
+
+def clear():
+    """Удаляет индекс процесса."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def _build(generation):
+    index = NewsIndex(generation)
+    for news in News.objects.values_list('id', 'title', 'text').iterator():
+        index.add(*news)
+    index.floors = {
+        news_id: (size, floor)
+        for news_id, size, floor in RelatedNews.objects.values_list(
+            'news_id'
+        ).annotate(Count('id'), Min('score')).order_by()
+    }
+    return index
+
+
+def _apply(change):
+    """
+    Применяет изменение к индексу, если после его построения поколение
+    сменилось не больше одного раза, то есть только этим изменением:
+    изменение читается из базы, и повторить его можно. Иначе индекс
+    строится заново и изменение в нём уже учтено.
+    """
+    global _index
+    generation = cache.get_generation(SCOPE)
+    if _index is not None and _index.generation in (
+        generation - 1, generation
+    ):
+        change(_index)
+        _index.generation = generation
+    else:
+        _index = _build(generation)
+    return _index
+
+
+def _run(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    finally:
+        close_old_connections()
+
+
+def submit(func, *args):
+    """Ставит пересчёт в очередь фонового потока."""
+    _executor.submit(_run, func, *args)
+
+
+def wait():
+    """Дожидается пересчётов, поставленных в очередь до вызова."""
+    _executor.submit(lambda: None).result()
+
+
+def _store(index, updates):
+    """Заменяет сохранённые списки похожих новостей."""
+    with transaction.atomic():
+        RelatedNews.objects.filter(news_id__in=updates).delete()
+        RelatedNews.objects.bulk_create(
+            RelatedNews(news_id=news_id, related_id=other_id, score=score)
+            for news_id, related in updates.items()
+            for other_id, score in related
+        )
+    for news_id, related in updates.items():
+        index.floors[news_id] = (
+            len(related), min((score for _, score in related), default=0.0)
+        )
+
+
+def news_saved(news_id, created):
+    """Пересчитывает похожие после сохранения новости."""
+    news = News.objects.filter(pk=news_id).values_list(
+        'title', 'text'
+    ).first()
+    if news is None:
+        # Новость уже удалили: пересчёт сделает news_deleted.
+        return
+    with _lock:
+        index = _apply(lambda index: index.add(news_id, *news))
+        scores = index.scores(news_id)
+        updates = {news_id: index.top(news_id, scores)}
+        if not created:
+            # Сходство с новостью изменилось: списки, где она была,
+            # считаем заново.
+            for other_id in linked_news(news_id):
+                updates[other_id] = index.top(other_id)
+        for other_id, score in scores.items():
+            if other_id in updates:
+                continue
+            size, floor = index.floors.get(other_id, (0, 0.0))
+            if size < settings.RELATED_NEWS_COUNT or score > floor:
+                updates[other_id] = index.top(other_id)
+        _store(index, updates)
+
+
+def linked_news(news_id):
+    """Новости, в списках похожих у которых есть эта новость."""
+    return list(RelatedNews.objects.filter(
+        related_id=news_id
+    ).values_list('news_id', flat=True))
+
+
+def news_deleted(news_id, linked_ids):
+    """
+    Убирает удалённую новость из индекса и пересчитывает списки
+    новостей linked_ids, где она была.
+    """
+    with _lock:
+        index = _apply(lambda index: index.remove(news_id))
+        _store(index, {
+            other_id: index.top(other_id)
+            for other_id in linked_ids if other_id in index.vectors
+        })
+
+
+def rebuild(batch_size=500):
+    """Пересчитывает списки похожих для всех новостей."""
+    global _index
+    with _lock:
+        _index = index = _build(cache.get_generation(SCOPE))
+        RelatedNews.objects.all().delete()
+        updates = {}
+        for news_id in list(index.vectors):
+            updates[news_id] = index.top(news_id)
+            if len(updates) == batch_size:
+                _store(index, updates)
+                updates = {}
+        _store(index, updates)
+        return len(index.vectors)
+
+
+def related_news(news):
+    """Похожие новости из сохранённого списка: один запрос."""
+    return [
+        link.related for link in RelatedNews.objects.filter(
+            news=news
+        ).select_related('related').only(
+            'related__id', 'related__title', 'related__date'
+        )
+    ]
@@ -0,0 +1,250 @@
+"""
+Поток новых комментариев к новости (Server-Sent Events).
+
+Приложение ASGI без представлений Django: соединение — это корутина
+и очередь asyncio, поэтому тысячи ждущих клиентов не занимают потоков.
+Подключается в yanews/asgi.py.
+
+Комментарии к новости рассылает её канал. В канал попадают комментарии,
+сохранённые этим процессом (publish() после фиксации транзакции),
+и комментарии других процессов: пока у канала есть подписчики,
+он раз в COMMENT_STREAM_POLL_INTERVAL секунд спрашивает базу
+о комментариях новее последнего разосланного. Запрос делается один
+на канал, а не на клиента. Ошибка базы при опросе не останавливает
+канал: она записывается в лог, и опрос повторяется в следующий раз.
+"""
+import asyncio
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+
+from .models import Comment, News
+
+# Тот же адрес, что у news:comments_stream.
+PATH_RE = re.compile(r'^/news/(?P<pk>[0-9]+)/comments/stream/$')
+# Сколько комментариев отдаём за один запрос к базе.
+BATCH_SIZE = 100
+
+_channels = {}
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch(news_id, after_id):
+    close_old_connections()
+    return [
+        {**row, 'created': row['created'].isoformat()}
+        for row in Comment.objects.filter(
+            news_id=news_id, id__gt=after_id
+        ).order_by('id').values(
+            'id', 'text', 'created', author_name=F('author__username')
+        )[:BATCH_SIZE]
+    ]
+
+
+def _last_id(news_id):
+    close_old_connections()
+    if not News.objects.filter(pk=news_id).exists():
+        return None
+    return Comment.objects.filter(news_id=news_id).order_by(
+        '-id'
+    ).values_list('id', flat=True).first() or 0
+
+
+fetch = sync_to_async(_fetch)
+last_id = sync_to_async(_last_id)
+
+
+async def fetch_pages(news_id, after_id):
+    """Комментарии новее after_id, страницами по BATCH_SIZE."""
+    while True:
+        events = await fetch(news_id, after_id)
+        if events:
+            yield events
+        if len(events) < BATCH_SIZE:
+            return
+        after_id = events[-1]['id']
+
+
+class Channel:
+    """Подписчики одной новости и последний разосланный комментарий."""
+
+    def __init__(self, news_id, last_id):
+        self.news_id = news_id
+        self.last_id = last_id
+        self.loop = asyncio.get_running_loop()
+        self.queues = set()
+        self.poller = self.loop.create_task(self.poll())
+
+    def deliver(self, events):
+        events = [event for event in events if event['id'] > self.last_id]
+        if not events:
+            return
+        self.last_id = events[-1]['id']
+        for queue in self.queues:
+            queue.put_nowait(events)
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(settings.COMMENT_STREAM_POLL_INTERVAL)
+            try:
+                async for events in fetch_pages(self.news_id, self.last_id):
+                    self.deliver(events)
+            except Exception:
+                logger.exception(
+                    'Не удалось получить комментарии новости %s',
+                    self.news_id,
+                )
+
+
+def publish(comment):
+    """
+    Рассылает комментарий подписчикам этого процесса.
+
+    Вызывается из любого потока после фиксации транзакции.
+    """
+    channel = _channels.get(comment.news_id)
+    if channel is None:
+        return
+    event = {
+        'id': comment.id,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author_name': comment.author.username,
+    }
+    channel.loop.call_soon_threadsafe(channel.deliver, [event])
+
+
+def _format(event):
+    return (
+        f'id: {event["id"]}\nevent: comment\n'
+        f'data: {json.dumps(event, ensure_ascii=False)}\n\n'
+    ).encode()
+
+
+async def _respond(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': body.encode()})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _get_channel(news_id):
+    """Канал новости; None, если новости нет."""
+    channel = _channels.get(news_id)
+    if channel is None:
+        current = await last_id(news_id)
+        if current is None:
+            return None
+        # Пока шёл запрос, канал мог создать другой клиент.
+        channel = _channels.get(news_id)
+        if channel is None:
+            channel = _channels[news_id] = Channel(news_id, current)
+    return channel
+
+
+async def _catch_up(send, news_id, sent_id):
+    """Досылает переподключившемуся клиенту пропущенные комментарии."""
+    async for events in fetch_pages(news_id, sent_id):
+        sent_id = events[-1]['id']
+        await send({
+            'type': 'http.response.body',
+            'body': b''.join(map(_format, events)),
+            'more_body': True,
+        })
+    return sent_id
+
+
+async def _pump(send, queue, disconnect, sent_id):
+    """Пересылает события из очереди клиенту, пока он подключён."""
+    while not disconnect.done():
+        get = asyncio.ensure_future(queue.get())
+        await asyncio.wait(
+            {get, disconnect},
+            timeout=settings.COMMENT_STREAM_KEEPALIVE,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if get.done():
+            events = [
+                event for event in get.result() if event['id'] > sent_id
+            ]
+            if not events:
+                continue
+            sent_id = events[-1]['id']
+            body = b''.join(map(_format, events))
+        else:
+            get.cancel()
+            if disconnect.done():
+                break
+            # Комментарий в потоке не даёт прокси закрыть соединение.
+            body = b': ping\n\n'
+        await send({
+            'type': 'http.response.body', 'body': body, 'more_body': True,
+        })
+
+
+async def comments_stream(scope, receive, send, news_id):
+    """Отдаёт клиенту новые комментарии к новости, пока он подключён."""
+    if scope['method'] != 'GET':
+        await _respond(send, 405, 'Метод не поддерживается.')
+        return
+    channel = await _get_channel(news_id)
+    if channel is None:
+        await _respond(send, 404, 'Новость не найдена.')
+        return
+    queue = asyncio.Queue()
+    channel.queues.add(queue)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        sent_id = channel.last_id
+        last_event_id = dict(scope['headers']).get(
+            b'last-event-id', b''
+        ).decode()
+        if last_event_id.isascii() and last_event_id.isdecimal():
+            # Клиент переподключился: досылаем пропущенное. Новые
+            # комментарии тем временем копятся в очереди, _pump
+            # пропустит из неё уже отправленные.
+            sent_id = await _catch_up(send, news_id, int(last_event_id))
+        await _pump(send, queue, disconnect, sent_id)
+    finally:
+        disconnect.cancel()
+        channel.queues.discard(queue)
+        if not channel.queues and _channels.get(news_id) is channel:
+            channel.poller.cancel()
+            del _channels[news_id]
+
+
+async def route(scope, receive, send):
+    """
+    Обрабатывает запрос, если это поток комментариев.
+
+    Возвращает False для остальных запросов: их обслуживает Django.
+    """
+    if scope['type'] != 'http':
+        return False
+    match = PATH_RE.match(scope['path'])
+    if match is None:
+        return False
+    await comments_stream(scope, receive, send, int(match['pk']))
+    return True
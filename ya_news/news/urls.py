@@ -1,16 +1,72 @@
+from django.conf import settings
 from django.urls import path
 
-from news import views
+from news import api, async_views, feeds, views
 
 app_name = 'news'
 
-urlpatterns = [
-    path('', views.NewsList.as_view(), name='home'),
-    path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
-    path(
-        'delete_comment/<int:pk>/',
-        views.CommentDelete.as_view(),
-        name='delete'
-    ),
-    path('edit_comment/<int:pk>/', views.CommentUpdate.as_view(), name='edit'),
-]
+
+def news_patterns(async_pages):
+    """Маршруты приложения с синхронными или асинхронными страницами чтения."""
+    if async_pages:
+        home_view = async_views.news_list
+        detail_view = async_views.news_detail
+    else:
+        home_view = views.NewsList.as_view()
+        detail_view = views.NewsDetailView.as_view()
+    return [
+        path('', home_view, name='home'),
+        path('news/<int:pk>/', detail_view, name='detail'),
+        path('hot/', views.HotNewsList.as_view(), name='hot'),
+        path('api/news/', api.NewsListApi.as_view(), name='api_news'),
+        path(
+            'api/news/<int:pk>/',
+            api.NewsDetailApi.as_view(),
+            name='api_news_detail'
+        ),
+        path(
+            'api/news/<int:pk>/comments/',
+            api.CommentListApi.as_view(),
+            name='api_comments'
+        ),
+        path('feeds/news/rss/', feeds.LatestNewsFeed(), name='feed_rss'),
+        path('feeds/news/atom/', feeds.LatestNewsAtomFeed(), name='feed_atom'),
+        path(
+            'news/<int:pk>/comments/rss/',
+            feeds.CommentsFeed(),
+            name='comments_rss'
+        ),
+        path(
+            'news/<int:pk>/comments/atom/',
+            feeds.CommentsAtomFeed(),
+            name='comments_atom'
+        ),
+        path(
+            'news/<int:pk>/comments/stream/',
+            views.CommentStream.as_view(),
+            name='comments_stream'
+        ),
+        path(
+            'archive/<int:year>/<int:month>/',
+            views.ArchiveMonth.as_view(),
+            name='archive_month'
+        ),
+        path(
+            'archive/<int:year>/<int:month>/<int:day>/',
+            views.ArchiveDay.as_view(),
+            name='archive_day'
+        ),
+        path(
+            'delete_comment/<int:pk>/',
+            views.CommentDelete.as_view(),
+            name='delete'
+        ),
+        path(
+            'edit_comment/<int:pk>/',
+            views.CommentUpdate.as_view(),
+            name='edit'
+        ),
+    ]
+
+
+urlpatterns = news_patterns(settings.NEWS_ASYNC_VIEWS)
@@ -1,11 +1,17 @@
+import calendar
+from datetime import date
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.views import generic
 
+from . import counters, hot, similarity
 from .forms import CommentForm
-from .models import Comment, News
+from .identity import IdentityMapMixin
+from .models import Comment, DailyStats, News, comment_count
 
 
 class NewsList(generic.ListView):
@@ -17,12 +23,105 @@ class NewsList(generic.ListView):
         """
         Выводим только несколько последних новостей.
 
-        Их количество определяется в настройках проекта.
+        Их количество определяется в настройках проекта. Полный текст
+        и комментарии не загружаются: для главной достаточно анонса
+        и числа комментариев. Строки берутся из кэша запросов.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
+        return self.model.cached.defer('text').annotate(
+            comment_count=comment_count()
         )[:settings.NEWS_COUNT_ON_HOME_PAGE]
 
+    def get_context_data(self, **kwargs):
+        """Самые читаемые новости по записанным счётчикам просмотров."""
+        context = super().get_context_data(**kwargs)
+        context['most_read'] = self.model.objects.only(
+            'id', 'title', 'views'
+        ).order_by('-views')[:settings.NEWS_MOST_READ_COUNT]
+        context['popular_now'] = hot.popular()
+        return context
+
+
+class HotNewsList(generic.View):
+    """Самые обсуждаемые сейчас новости в JSON."""
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'news': [
+            {
+                'id': item.news.pk,
+                'title': item.news.title,
+                'date': item.news.date,
+                'score': round(item.score, 3),
+                'url': reverse('news:detail', kwargs={'pk': item.news.pk}),
+            }
+            for item in hot.popular()
+        ]})
+
+
+class ArchiveDay(generic.ListView):
+    """
+    Новости за день.
+
+    Число новостей и комментариев берётся из сводки DailyStats,
+    из таблицы новостей читаются только новости этого дня.
+    """
+    template_name = 'news/archive_day.html'
+
+    def get_day(self):
+        try:
+            return date(
+                self.kwargs['year'], self.kwargs['month'], self.kwargs['day']
+            )
+        except (ValueError, OverflowError):
+            raise Http404('Такого дня нет.')
+
+    def get_queryset(self):
+        self.day = self.get_day()
+        return News.objects.filter(date=self.day).defer('text')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        active = DailyStats.objects.filter(news_count__gt=0)
+        context.update(
+            day=self.day,
+            stats=(
+                DailyStats.objects.filter(day=self.day).first()
+                or DailyStats(day=self.day)
+            ),
+            previous_day=active.filter(
+                day__lt=self.day
+            ).order_by('-day').values_list('day', flat=True).first(),
+            next_day=active.filter(
+                day__gt=self.day
+            ).order_by('day').values_list('day', flat=True).first(),
+        )
+        return context
+
+
+class ArchiveMonth(generic.ListView):
+    """Число новостей и комментариев по дням месяца из сводки."""
+    template_name = 'news/archive_month.html'
+
+    def get_queryset(self):
+        year, month = self.kwargs['year'], self.kwargs['month']
+        try:
+            self.month = date(year, month, 1)
+        except (ValueError, OverflowError):
+            raise Http404('Такого месяца нет.')
+        last_day = calendar.monthrange(year, month)[1]
+        return DailyStats.objects.filter(
+            day__range=(self.month, self.month.replace(day=last_day))
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        days = context['object_list']
+        context.update(
+            month=self.month,
+            news_count=sum(stats.news_count for stats in days),
+            comment_count=sum(stats.comment_count for stats in days),
+        )
+        return context
+
 
 class NewsDetail(generic.DetailView):
     model = News
@@ -35,8 +134,19 @@ class NewsDetail(generic.DetailView):
         )
         return obj
 
+    def get(self, request, *args, **kwargs):
+        """Учитываем просмотр; в базу он попадёт при сбросе счётчиков."""
+        self.object = self.get_object()
+        self.object.views += counters.pending(self.object.pk) + 1
+        counters.hit(self.object.pk)
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['related_news'] = similarity.related_news(self.object)
+        # Поток комментариев есть только под ASGI (yanews/asgi.py).
+        context['comment_stream'] = settings.NEWS_ASYNC_VIEWS
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
         return context
@@ -44,6 +154,7 @@ class NewsDetail(generic.DetailView):
 
 class NewsComment(
         LoginRequiredMixin,
+        IdentityMapMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -55,6 +166,14 @@ class NewsComment(
         self.object = self.get_object()
         return super().post(request, *args, **kwargs)
 
+    def get_form_kwargs(self):
+        """Форме нужны новость и автор, чтобы искать повторы автора."""
+        kwargs = super().get_form_kwargs()
+        kwargs['instance'] = Comment(
+            news=self.object, author=self.request.user
+        )
+        return kwargs
+
     def form_valid(self, form):
         comment = form.save(commit=False)
         comment.news = self.object
@@ -78,14 +197,27 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
-class CommentBase(LoginRequiredMixin):
+class CommentStream(generic.View):
+    """
+    Адрес потока комментариев к новости.
+
+    Поток отдаёт news.stream раньше Django, если сайт запущен под ASGI.
+    Под WSGI потока нет.
+    """
+
+    def get(self, request, pk):
+        raise Http404('Поток комментариев обслуживает ASGI-сервер.')
+
+
+class CommentBase(LoginRequiredMixin, IdentityMapMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
 
     def get_success_url(self):
+        # Для адреса достаточно news_id, саму новость загружать не нужно.
         comment = self.get_object()
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': comment.news_id}
         ) + '#comments'
 
     def get_queryset(self):
@@ -8,9 +8,28 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
-from django.core.asgi import get_asgi_application
+# Время запуска отсчитывается до импорта Django и прогрева.
+started = time.perf_counter()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+from yanews import warmup  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+os.environ.setdefault('NEWS_ASYNC_VIEWS', '1')
+
+django_application = get_asgi_application()
+
+if os.environ.get('NEWS_WARMUP') == '1':
+    warmup.run(started)
+
+# Приложение Django уже настроено, модели можно импортировать.
+from news import stream  # noqa: E402
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    """Поток комментариев обслуживается без Django, остальное — Django."""
+    if not await stream.route(scope, receive, send):
+        await django_application(scope, receive, send)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -32,12 +33,26 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yanews.urls'
 
+# Боевой режим шаблонов: кэширующий загрузчик читает и разбирает
+# каждый шаблон один раз на процесс, правки видны после перезапуска.
+NEWS_CACHED_TEMPLATES = os.environ.get(
+    'NEWS_CACHED_TEMPLATES', '0' if DEBUG else '1'
+) == '1'
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if NEWS_CACHED_TEMPLATES:
+    template_loaders = [
+        ('django.template.loaders.cached.Loader', template_loaders),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': template_loaders,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -59,8 +74,40 @@ DATABASES = {
 }
 
 
+# Кэш сессий, пользователей, лент и запросов. Его читают все процессы
+# manage.py serve, поэтому по умолчанию он файловый: в памяти процесса
+# выход из аккаунта или новый комментарий увидел бы только один воркер.
+# Записи кэша — pickle с сессиями и пользователями, поэтому каталог
+# лежит в проекте, а не в общем /tmp, куда может писать кто угодно.
+# Бэкенд и каталог можно сменить через NEWS_CACHE_BACKEND
+# и NEWS_CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'NEWS_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv(
+            'NEWS_CACHE_LOCATION',
+            str(BASE_DIR / '.cache'),
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10_000},
+    },
+}
+
+
 AUTH_PASSWORD_VALIDATORS = []
 
+# ModelBackend остаётся в списке: сессии, открытые до кэша
+# пользователей, ссылаются на него и не должны разлогиниться.
+AUTHENTICATION_BACKENDS = [
+    'news.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Сессии читаются из общего кэша, а пишутся и в кэш, и в базу.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 LANGUAGE_CODE = 'ru'
 
@@ -80,4 +127,34 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+NEWS_EXCERPT_WORDS = 15
+COMMENT_DUPLICATE_THRESHOLD = 0.8
+RELATED_NEWS_COUNT = 5
+NEWS_MOST_READ_COUNT = 5
+NEWS_VIEWS_FLUSH_INTERVAL = 10
+HOT_NEWS_COUNT = 5
+HOT_NEWS_HALF_LIFE = 6 * 60 * 60
+HOT_NEWS_MAX_AGE_DAYS = 7
+HOT_NEWS_MIN_SCORE = 0.05
+NEWS_FEED_ITEMS = 20
+# Ленту сбрасывает смена поколения в общем кэше (см. CACHES), срок
+# хранения лишь освобождает место от неиспользуемых лент.
+NEWS_FEED_CACHE_TIMEOUT = 24 * 60 * 60
+NEWS_FEED_MAX_AGE = 60
+NEWS_API_PAGE_SIZE = 20
+NEWS_API_MAX_AGE = 30
+COMMENT_STREAM_POLL_INTERVAL = 5
+COMMENT_STREAM_KEEPALIVE = 15
+# Асинхронные страницы чтения (news.async_views). Включаются
+# в yanews/asgi.py: под WSGI синхронные представления быстрее.
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+NEWS_ASYNC_DB_WORKERS = 8
+NEWS_USER_CACHE_TIMEOUT = 60
+# Кэш запросов (news.querycache): сколько секунд запись свежая, сколько
+# ещё её можно отдавать, пока она обновляется, и сколько ждать
+# обновления, начатого другим процессом.
+NEWS_QUERY_CACHE_TIMEOUT = 30
+NEWS_QUERY_CACHE_STALE_TIMEOUT = 10 * 60
+NEWS_QUERY_CACHE_LOCK_TIMEOUT = 30
+
 NUM_COM = 2
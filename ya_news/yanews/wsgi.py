@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
-from django.core.wsgi import get_wsgi_application
+# Время запуска отсчитывается до импорта Django и прогрева.
+started = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+from yanews import warmup  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
 
 application = get_wsgi_application()
+
+if os.environ.get('NEWS_WARMUP') == '1':
+    warmup.run(started)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        # Сброс кэша пользователей при их изменении и выходе.
+        from notes import auth  # noqa: F401
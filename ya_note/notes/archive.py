@@ -0,0 +1,145 @@
+"""
+Выгрузка и загрузка заметок архивом ZIP с файлами Markdown.
+
+Каждая заметка — отдельный файл <slug>.md, заголовок и адрес
+записаны в шапке файла:
+
+    ---
+    title: Заголовок
+    slug: adres
+    ---
+
+    Текст заметки
+"""
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from pytils.translit import slugify
+
+from . import minhash, revisions
+from .models import Note, NoteFingerprint, NoteRevision
+from .zipstream import ZipStreamWriter
+
+FRONT_MATTER = '---\n'
+
+
+def note_to_markdown(note):
+    return (
+        f'{FRONT_MATTER}title: {note.title}\nslug: {note.slug}\n'
+        f'{FRONT_MATTER}\n{note.text}'
+    )
+
+
+def markdown_to_fields(name, content):
+    """Заголовок, адрес и текст заметки из файла Markdown."""
+    fields = {'title': PurePosixPath(name).stem, 'slug': ''}
+    if content.startswith(FRONT_MATTER):
+        header, separator, text = content[len(FRONT_MATTER):].partition(
+            '\n' + FRONT_MATTER
+        )
+        if separator:
+            for line in header.splitlines():
+                key, _, value = line.partition(':')
+                if key.strip() in fields:
+                    fields[key.strip()] = value.strip()
+            content = text[1:] if text.startswith('\n') else text
+    fields['text'] = content
+    return fields
+
+
+def export_notes(notes):
+    """
+    Генератор архива с заметками.
+
+    Заметки читаются из базы порциями, а архив отдаётся по мере
+    записи файлов, поэтому целиком в памяти не хранится.
+    """
+    writer = ZipStreamWriter()
+    for note in notes.only('title', 'slug', 'text').iterator(
+        chunk_size=settings.NOTES_EXPORT_CHUNK_SIZE
+    ):
+        yield writer.write(f'{note.slug}.md', note_to_markdown(note).encode())
+    yield from writer.close()
+
+
+def import_notes(archive, author):
+    """
+    Загружает заметки из архива и возвращает их количество.
+
+    Файлы читаются по одному, заметки сохраняются пачками
+    по NOTES_IMPORT_BATCH_SIZE. Занятые адреса получают суффикс -2, -3...
+    Как и при обычном сохранении, у заметок появляется первая версия
+    в истории и отпечатки для поиска дубликатов.
+    """
+    title_length = Note._meta.get_field('title').max_length
+    batch = []
+    count = 0
+    for name, content in archive:
+        if not name.endswith('.md'):
+            continue
+        fields = markdown_to_fields(name, content.decode(errors='replace'))
+        fields['title'] = fields['title'][:title_length]
+        batch.append(Note(author=author, **fields))
+        if len(batch) == settings.NOTES_IMPORT_BATCH_SIZE:
+            count += _save_batch(batch)
+            batch = []
+    return count + _save_batch(batch)
+
+
+def _save_batch(notes):
+    slug_length = Note._meta.get_field('slug').max_length
+    pending = [
+        (note, (slugify(note.slug or note.title) or 'note')[:slug_length])
+        for note in notes
+    ]
+    taken = set()
+    suffix = 1
+    # На каждом шаге одним запросом проверяем адреса с очередным
+    # суффиксом для всех заметок, которым адрес ещё не достался.
+    while pending:
+        candidates = [
+            _with_suffix(slug, suffix, slug_length) for _, slug in pending
+        ]
+        taken.update(Note.objects.filter(
+            slug__in=candidates
+        ).values_list('slug', flat=True))
+        retry = []
+        for (note, slug), candidate in zip(pending, candidates):
+            if candidate in taken:
+                retry.append((note, slug))
+            else:
+                note.slug = candidate
+                taken.add(candidate)
+        pending = retry
+        suffix += 1
+    for note in notes:
+        note.revision = 1
+    Note.objects.bulk_create(notes)
+    if any(note.pk is None for note in notes):
+        # SQLite не возвращает id из bulk_create, находим их по адресам.
+        ids = dict(Note.objects.filter(
+            slug__in=[note.slug for note in notes]
+        ).values_list('slug', 'id'))
+        for note in notes:
+            note.pk = ids[note.slug]
+    # Как Note.save: первая версия в истории и отпечатки для поиска
+    # дубликатов, но по одному запросу на пачку.
+    NoteRevision.objects.bulk_create(
+        NoteRevision(
+            note=note, number=1, is_snapshot=True,
+            data=revisions.pack(note.text),
+        )
+        for note in notes
+    )
+    NoteFingerprint.objects.bulk_create(
+        fingerprint for note in notes
+        for fingerprint in minhash.fingerprints(note)
+    )
+    return len(notes)
+
+
+def _with_suffix(slug, suffix, slug_length):
+    if suffix == 1:
+        return slug
+    tail = f'-{suffix}'
+    return slug[:slug_length - len(tail)] + tail
@@ -0,0 +1,53 @@
+"""
+Пользователь запроса из кэша.
+
+AuthenticationMiddleware на каждый запрос загружает пользователя
+из сессии, это запрос к auth_user. CachedModelBackend хранит
+загруженного пользователя в кэше заметок NOTES_USER_CACHE_TIMEOUT
+секунд. Запись удаляется, когда пользователь сохранён (в том числе
+при смене пароля), удалён или вышел. Кэш пользователей работает,
+только если кэш заметок общий для процессов (NOTES_SHARED_CACHE):
+в кэше одного процесса удаление записи не увидели бы остальные.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from notes.cache import get_cache
+
+USER_KEY = 'notes:user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша."""
+
+    def get_user(self, user_id):
+        if not settings.NOTES_SHARED_CACHE:
+            return super().get_user(user_id)
+        cache = get_cache()
+        key = USER_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.NOTES_USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(user_id):
+    """Удаляет пользователя из кэша."""
+    get_cache().delete(USER_KEY.format(user_id=user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
@@ -0,0 +1,109 @@
+"""
+Кэш списков заметок по авторам.
+
+Каждому автору соответствует номер версии. Страницы списка хранятся
+под ключом с текущей версией, поэтому для сброса кэша достаточно
+увеличить версию: старые записи просто перестают читаться и
+вытесняются по таймауту.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'notes:version:{author_id}'
+MODEL_VERSION_KEY = 'notes:model-version:{label}'
+LIST_KEY = 'notes:list:{author_id}:{version}:{per_page}:{cursor}'
+METRICS_KEY = 'notes:metrics:{name}'
+METRICS = ('hit', 'miss')
+
+
+def get_cache():
+    """Бэкенд кэша задаётся алиасом NOTES_CACHE_ALIAS."""
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def _initial_version():
+    # Версия, созданная заново после вытеснения ключа, не должна
+    # совпасть с одной из прежних, поэтому начинаем от текущего времени.
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def get_version(author_id):
+    """Текущая версия кэша заметок автора."""
+    return _get_version(VERSION_KEY.format(author_id=author_id))
+
+
+def bump_version(*author_ids):
+    """Сбрасывает кэш заметок перечисленных авторов."""
+    for author_id in set(author_ids):
+        _bump_version(VERSION_KEY.format(author_id=author_id))
+
+
+def get_model_version(model):
+    """Текущая версия кэша запросов к модели (notes.querycache)."""
+    return _get_version(MODEL_VERSION_KEY.format(label=model._meta.label))
+
+
+def bump_model_version(model):
+    """Сбрасывает кэш запросов к модели."""
+    _bump_version(MODEL_VERSION_KEY.format(label=model._meta.label))
+
+
+def get_list(author_id, cursor, build):
+    """
+    Возвращает страницу списка заметок автора из кэша.
+
+    При промахе страница строится функцией build и кладётся в кэш.
+    """
+    cache = get_cache()
+    key = LIST_KEY.format(
+        author_id=author_id,
+        version=get_version(author_id),
+        per_page=settings.NOTES_PER_PAGE,
+        cursor=cursor or '',
+    )
+    payload = cache.get(key)
+    if payload is None:
+        _record('miss')
+        payload = build()
+        cache.set(key, payload, settings.NOTES_CACHE_TIMEOUT)
+    else:
+        _record('hit')
+    return payload
+
+
+def _record(name):
+    cache = get_cache()
+    key = METRICS_KEY.format(name=name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_metrics():
+    """Число попаданий и промахов кэша списков заметок."""
+    cache = get_cache()
+    return {
+        name: cache.get(METRICS_KEY.format(name=name), 0)
+        for name in METRICS
+    }
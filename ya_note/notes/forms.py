@@ -1,9 +1,13 @@
+from zipfile import BadZipFile
+
 from pytils.translit import slugify
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from .models import Note
+from .zipstream import ZipStreamReader
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
@@ -27,3 +31,56 @@ class NoteForm(forms.ModelForm):
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+
+class NoteBulkForm(forms.Form):
+    """Форма массового удаления или переименования заметок."""
+    ACTIONS = (
+        ('delete', 'Удалить'),
+        ('retitle', 'Переименовать'),
+    )
+
+    action = forms.ChoiceField(label='Действие', choices=ACTIONS)
+    notes = forms.ModelMultipleChoiceField(
+        label='Заметки',
+        queryset=Note.objects.none(),
+        widget=forms.CheckboxSelectMultiple,
+    )
+    title = forms.CharField(
+        label='Новый заголовок',
+        max_length=Note._meta.get_field('title').max_length,
+        required=False,
+    )
+
+    def __init__(self, *args, author, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Выбрать можно только свои заметки; для проверки хватает id.
+        self.fields['notes'].queryset = Note.objects.filter(
+            author=author
+        ).only('id')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == 'retitle' and not cleaned_data.get(
+            'title'
+        ):
+            self.add_error('title', 'Укажите новый заголовок.')
+        return cleaned_data
+
+
+class NoteImportForm(forms.Form):
+    """Форма загрузки архива заметок."""
+    archive = forms.FileField(
+        label='Архив',
+        help_text='ZIP-архив с файлами Markdown (.md)',
+    )
+
+    def clean_archive(self):
+        """Проверяем, что загружен ZIP-архив, и открываем его."""
+        try:
+            return ZipStreamReader(
+                self.cleaned_data['archive'],
+                max_member_size=settings.NOTES_IMPORT_MAX_MEMBER_SIZE,
+            )
+        except BadZipFile:
+            raise ValidationError('Загрузите архив в формате ZIP.')
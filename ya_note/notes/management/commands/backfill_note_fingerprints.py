@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notes import minhash
+from notes.models import Note, NoteFingerprint
+
+
+class Command(BaseCommand):
+    """Пересчитывает ключи поиска дубликатов для всех заметок."""
+    help = 'Заполняет индекс почти одинаковых заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        count = 0
+        for note in Note.objects.only(
+            'id', 'author_id', 'text'
+        ).iterator(chunk_size=batch_size):
+            batch.append(note)
+            if len(batch) == batch_size:
+                count += self.save_batch(batch)
+                batch = []
+        count += self.save_batch(batch)
+        self.stdout.write(f'Обработано заметок: {count}')
+
+    @staticmethod
+    def save_batch(notes):
+        with transaction.atomic():
+            NoteFingerprint.objects.filter(note__in=notes).delete()
+            NoteFingerprint.objects.bulk_create(
+                fingerprint for note in notes
+                for fingerprint in minhash.fingerprints(note)
+            )
+        return len(notes)
@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Сравнение удаления заметок по одной через NoteDelete
+    и одним запросом к списку заметок.
+
+    Все данные создаются в транзакции и откатываются в конце.
+    """
+    help = 'Замер массового удаления заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            author = User.objects.create(username='bench_bulk')
+            self.client = Client()
+            self.client.force_login(author)
+            for label, delete in (
+                ('По одной', self.delete_one_by_one),
+                ('Одним запросом', self.delete_in_bulk),
+            ):
+                self.measure(label, author, options['notes'], delete)
+            transaction.set_rollback(True)
+
+    def delete_one_by_one(self, notes):
+        for note in notes:
+            self.client.post(reverse('notes:delete', args=(note.slug,)))
+
+    def delete_in_bulk(self, notes):
+        self.client.post(reverse('notes:list'), {
+            'action': 'delete',
+            'notes': [note.id for note in notes],
+        })
+
+    def measure(self, label, author, count, delete):
+        notes = [
+            Note.objects.create(
+                title=f'Заметка {index}', text='Текст',
+                slug=f'bench-bulk-{index}', author=author,
+            )
+            for index in range(count)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            delete(notes)
+            elapsed = time.perf_counter() - started
+        assert not Note.objects.filter(author=author).exists()
+        self.stdout.write(
+            f'{label}: {elapsed * 1000:.1f} мс, '
+            f'запросов к базе: {len(queries)}'
+        )
@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from notes.models import Note
+
+User = get_user_model()
+
+WORDS = (
+    'заметка', 'текст', 'план', 'идея', 'встреча', 'задача', 'список',
+    'покупки', 'проект', 'отчёт', 'срок', 'важно',
+)
+
+
+class Command(BaseCommand):
+    """
+    Замер сжатия текста заметок: размер в базе и время записи
+    и чтения со сжатием и без него.
+
+    Все данные создаются в транзакции и откатываются в конце.
+    """
+    help = 'Замер размера и скорости сжатого текстового поля.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        text = ''
+        while len(text.encode()) < options['size']:
+            text += ' '.join(random.choices(WORDS, k=12)) + '.\n'
+        field = Note._meta.get_field('text')
+        threshold = field.threshold
+        with transaction.atomic():
+            author = User.objects.create(username='bench_compression')
+            try:
+                # Порог поля меняется на время замера без сжатия.
+                field.threshold = float('inf')
+                self.measure('без сжатия', author, text, options['repeat'])
+            finally:
+                field.threshold = threshold
+            self.measure(field.algorithm, author, text, options['repeat'])
+            transaction.set_rollback(True)
+
+    def measure(self, label, author, text, repeat):
+        started = time.perf_counter()
+        for index in range(repeat):
+            note = Note(
+                title='Замер', text=text, slug=f'bench-{index}', author=author
+            )
+            # Замеряем только поле, без истории правок и кэша списков.
+            Note.objects.bulk_create([note])
+        write_time = (time.perf_counter() - started) / repeat
+        note = Note.objects.filter(author=author).last()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT length(CAST(text AS BLOB)) FROM notes_note '
+                'WHERE id = %s',
+                [note.id],
+            )
+            stored_size, = cursor.fetchone()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            Note.objects.get(pk=note.pk).text
+        read_time = (time.perf_counter() - started) / repeat
+        Note.objects.filter(author=author).delete()
+        self.stdout.write(
+            f'{label}: {len(text.encode())} -> {stored_size} байт, '
+            f'запись {write_time * 1000:.3f} мс, '
+            f'чтение {read_time * 1000:.3f} мс'
+        )
@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notes import revisions
+from notes.models import Note, NoteRevision
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Замер истории правок: сколько места занимает одна правка
+    и сколько времени восстанавливается версия.
+
+    Все данные создаются в транзакции и откатываются в конце.
+    """
+    help = 'Замер объёма и скорости восстановления истории правок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000)
+        parser.add_argument('--edits', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['lines'], options['edits'])
+            transaction.set_rollback(True)
+
+    def run(self, line_count, edit_count):
+        random.seed(0)
+        lines = [
+            f'Строка {index}: ' + ' '.join(
+                random.choice(('заметка', 'текст', 'план', 'идея'))
+                for _ in range(8)
+            ) + '\n'
+            for index in range(line_count)
+        ]
+        author = User.objects.create(username='bench_revisions')
+        note = Note.objects.create(
+            title='Замер', text=''.join(lines), author=author
+        )
+        for _ in range(edit_count):
+            index = random.randrange(line_count)
+            lines[index] = f'Правка {random.random()}\n'
+            note.text = ''.join(lines)
+            note.save()
+        stored = NoteRevision.objects.filter(note=note)
+        full_size = len(note.text.encode())
+        delta_sizes = [
+            len(revision.data) for revision in stored.filter(
+                is_snapshot=False
+            )
+        ]
+        snapshot_sizes = [
+            len(revision.data) for revision in stored.filter(
+                is_snapshot=True
+            )
+        ]
+        started = time.perf_counter()
+        for number in range(1, note.revision + 1):
+            revisions.reconstruct(note, number)
+        elapsed = (time.perf_counter() - started) / note.revision
+        self.stdout.write(
+            f'Размер текста: {full_size} байт\n'
+            f'Версий: {note.revision}, из них полных копий: '
+            f'{len(snapshot_sizes)}\n'
+            f'Средняя правка: '
+            f'{sum(delta_sizes) / max(len(delta_sizes), 1):.0f} байт\n'
+            f'Средняя полная копия: '
+            f'{sum(snapshot_sizes) / max(len(snapshot_sizes), 1):.0f} байт\n'
+            f'Всего на версию: '
+            f'{(sum(delta_sizes) + sum(snapshot_sizes)) / note.revision:.0f}'
+            f' байт\n'
+            f'Восстановление версии: {elapsed * 1000:.2f} мс'
+        )
@@ -0,0 +1,66 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from notes.similarity import AuthorIndex
+
+
+class Command(BaseCommand):
+    """
+    Замер индекса похожих заметок на синтетических заметках:
+    время построения и время поиска похожих.
+
+    База данных не используется, индекс заполняется напрямую.
+    """
+    help = 'Замер построения индекса похожих заметок и поиска по нему.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=50_000)
+        parser.add_argument('--words', type=int, default=100)
+        parser.add_argument('--queries', type=int, default=200)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        vocabulary = [f'слово{index}' for index in range(20_000)]
+        # Частоты слов убывают примерно по закону Ципфа.
+        weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(vocabulary))
+        ))
+        notes = [
+            (
+                note_id,
+                f'note-{note_id}',
+                ' '.join(random.choices(vocabulary, cum_weights=weights, k=5)),
+                ' '.join(random.choices(
+                    vocabulary, cum_weights=weights, k=options['words']
+                )),
+            )
+            for note_id in range(options['notes'])
+        ]
+        index = AuthorIndex()
+        started = time.perf_counter()
+        for note in notes:
+            index.add(*note)
+        build_time = time.perf_counter() - started
+        note_ids = random.sample(range(options['notes']), options['queries'])
+        timings = []
+        for note_id in note_ids:
+            started = time.perf_counter()
+            index.similar(note_id, 5)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        started = time.perf_counter()
+        index.add(*notes[0])
+        update_time = time.perf_counter() - started
+        self.stdout.write(
+            f'Заметок: {options["notes"]}, слов в заметке: '
+            f'{options["words"]}\n'
+            f'Построение индекса: {build_time:.2f} с\n'
+            f'Обновление одной заметки: {update_time * 1000:.2f} мс\n'
+            f'Поиск похожих: медиана '
+            f'{timings[len(timings) // 2] * 1000:.2f} мс, '
+            f'95-й перцентиль '
+            f'{timings[int(len(timings) * 0.95)] * 1000:.2f} мс'
+        )
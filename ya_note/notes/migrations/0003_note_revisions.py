@@ -0,0 +1,56 @@
+# Generated by Django 3.2.15 on 2026-10-19 09:51
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def snapshot_existing_notes(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    NoteRevision = apps.get_model('notes', 'NoteRevision')
+    for note in Note.objects.only('id', 'text').iterator():
+        data = zlib.compress(
+            json.dumps(note.text, ensure_ascii=False).encode()
+        )
+        NoteRevision.objects.create(
+            note=note, number=1, is_snapshot=True, data=data
+        )
+    Note.objects.update(revision=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Номер версии текста'),
+        ),
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер версии')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='Полная копия')),
+                ('data', models.BinaryField(verbose_name='Сжатые данные')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='notes.note')),
+            ],
+            options={
+                'ordering': ('number',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='noterevision',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='unique_note_revision'),
+        ),
+        migrations.RunPython(
+            snapshot_existing_notes, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.15 on 2026-10-19 09:52
+
+from django.db import migrations
+import notes.fields
+
+
+def compress_existing_rows(apps, schema_editor):
+    """Перезаписывает большие тексты, чтобы они сохранились сжатыми."""
+    Note = apps.get_model('notes', 'Note')
+    threshold = Note._meta.get_field('text').threshold
+    for obj in Note.objects.only('id', 'text').iterator():
+        if len(obj.text.encode()) >= threshold:
+            Note.objects.filter(pk=obj.pk).update(text=obj.text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_revisions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+        ),
+        migrations.RunPython(
+            compress_existing_rows, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0004_compress_note_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='notes.note')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notefingerprint',
+            index=models.Index(fields=['author', 'key'], name='note_fingerprint_idx'),
+        ),
+    ]
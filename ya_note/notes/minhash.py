@@ -0,0 +1,106 @@
+"""
+Поиск почти одинаковых заметок автора.
+
+Для текста заметки считается MinHash-подпись по шинглам из трёх слов.
+Подпись делится на полосы, и ключ каждой полосы сохраняется
+в NoteFingerprint. Заметки, у которых совпала хотя бы одна полоса, —
+кандидаты в дубликаты; для них сходство Жаккара считается точно.
+Поиск кандидатов — один запрос по индексу (author, key).
+"""
+import heapq
+import random
+import re
+import struct
+import zlib
+from hashlib import blake2b
+
+from django.conf import settings
+
+SHINGLE_SIZE = 3
+BANDS = 16
+ROWS = 4
+# 64 перестановки по 1000 шинглам — около 15 мс.
+MAX_SHINGLES = 1000
+PRIME = (1 << 61) - 1
+_random = random.Random(35)
+PERMUTATIONS = [
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(BANDS * ROWS)
+]
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text):
+    """Шинглы из трёх слов подряд без учёта регистра и пунктуации."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {
+        ' '.join(words[index:index + SHINGLE_SIZE])
+        for index in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def band_keys(text_shingles):
+    """Ключи полос MinHash-подписи."""
+    if not text_shingles:
+        return []
+    # Подпись считается по MAX_SHINGLES шинглам с наименьшими хешами:
+    # у похожих текстов выборка почти одна и та же, а время не растёт
+    # с размером текста.
+    hashes = heapq.nsmallest(MAX_SHINGLES, {
+        zlib.crc32(shingle.encode()) for shingle in text_shingles
+    })
+    signature = [
+        min([(a * value + b) % PRIME for value in hashes])
+        for a, b in PERMUTATIONS
+    ]
+    return [
+        int.from_bytes(blake2b(
+            struct.pack(f'<B{ROWS}Q', band,
+                        *signature[band * ROWS:(band + 1) * ROWS]),
+            digest_size=8,
+        ).digest(), 'little', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def find_duplicate(author_id, text, exclude_id=None):
+    """Заметка автора, почти совпадающая с текстом, или None."""
+    from .models import Note, NoteFingerprint
+
+    text_shingles = shingles(text)
+    candidates = NoteFingerprint.objects.filter(
+        author_id=author_id, key__in=band_keys(text_shingles)
+    ).exclude(note_id=exclude_id).values_list('note_id', flat=True)
+    for note in Note.objects.filter(
+        id__in=set(candidates)
+    ).only('id', 'slug', 'title', 'text'):
+        if jaccard(text_shingles, shingles(note.text)) >= (
+            settings.NOTE_DUPLICATE_THRESHOLD
+        ):
+            return note
+    return None
+
+
+def fingerprints(note):
+    from .models import NoteFingerprint
+
+    return [
+        NoteFingerprint(author_id=note.author_id, note=note, key=key)
+        for key in set(band_keys(shingles(note.text)))
+    ]
+
+
+def index_note(note):
+    """Пересчитывает ключи полос заметки."""
+    from .models import NoteFingerprint
+
+    NoteFingerprint.objects.filter(note=note).delete()
+    NoteFingerprint.objects.bulk_create(fingerprints(note))
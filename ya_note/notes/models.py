@@ -1,8 +1,54 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 from pytils.translit import slugify
 
+from . import cache, minhash, revisions, similarity
+from .fields import CompressedTextField
+from .querycache import CachedManager
+
+
+# Поля, изменения которых отслеживаются при сохранении заметки.
+TRACKED_FIELDS = ('author_id', 'text')
+
+
+class NoteQuerySet(models.QuerySet):
+    """
+    Массовые операции над заметками.
+
+    Они обходят Note.save и Note.delete, поэтому сами сбрасывают
+    кэш заметок затронутых авторов и кэш запросов к заметкам.
+    """
+
+    def _author_ids(self):
+        return set(self.values_list('author_id', flat=True).distinct())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        cache.bump_version(*(note.author_id for note in objs))
+        cache.bump_model_version(self.model)
+        return objs
+
+    def update(self, **kwargs):
+        author_ids = self._author_ids()
+        if 'author' in kwargs:
+            author_ids.add(getattr(kwargs['author'], 'pk', kwargs['author']))
+        rows = super().update(**kwargs)
+        cache.bump_version(*author_ids)
+        cache.bump_model_version(self.model)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        author_ids = self._author_ids()
+        result = super().delete()
+        cache.bump_version(*author_ids)
+        cache.bump_model_version(self.model)
+        return result
+
+    delete.alters_data = True
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -11,7 +57,7 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -27,12 +73,142 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    revision = models.PositiveIntegerField(
+        'Номер версии текста',
+        default=0,
+        editable=False,
+    )
+
+    objects = NoteQuerySet.as_manager()
+    cached = CachedManager()
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('author', 'id'),
+                name='note_author_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_loaded_values()
+
+    def _remember_loaded_values(self):
+        """Запоминаем сохранённые значения, чтобы отследить изменения."""
+        loaded_values = getattr(self, '_loaded_values', {})
+        loaded_values.update(
+            (name, self.__dict__[name]) for name in TRACKED_FIELDS
+            if name in self.__dict__
+        )
+        self._loaded_values = loaded_values
+
+    def _text_changed(self):
+        if self._state.adding:
+            return True
+        if 'text' not in self.__dict__:
+            # Текст не загружался, значит, и не менялся.
+            return False
+        return getattr(self, '_loaded_values', {}).get('text') != self.text
+
     def save(self, *args, **kwargs):
         if not self.slug:
             max_slug_length = self._meta.get_field('slug').max_length
             self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        loaded_values = getattr(self, '_loaded_values', {})
+        previous_author_id = loaded_values.get('author_id', self.author_id)
+        text_changed = self._text_changed()
+        previous_text = loaded_values.get('text')
+        # Текст, номер версии и запись истории сохраняются вместе.
+        with transaction.atomic():
+            if text_changed:
+                base_revision = self.revision
+                self.revision = self._next_revision()
+                if self.revision != base_revision + 1:
+                    # Текст успел сохранить другой запрос: разница
+                    # с загруженным текстом не подходит к его версии.
+                    previous_text = None
+            super().save(*args, **kwargs)
+            if text_changed:
+                revisions.record(self, previous_text)
+            if text_changed or previous_author_id != self.author_id:
+                minhash.index_note(self)
+        cache.bump_version(self.author_id, previous_author_id)
+        similarity.note_saved(self, previous_author_id)
+        self._remember_loaded_values()
+
+    def _next_revision(self):
+        """
+        Номер новой версии текста.
+
+        Номер увеличивается в базе до чтения, и строка заметки остаётся
+        заблокированной до конца транзакции: одновременные сохранения
+        получают разные номера.
+        """
+        if self._state.adding:
+            return self.revision + 1
+        # Базовый менеджер: массовые операции NoteQuerySet сбросили бы кэш.
+        rows = type(self)._base_manager.filter(pk=self.pk)
+        if not rows.update(revision=models.F('revision') + 1):
+            return self.revision + 1
+        return rows.values_list('revision', flat=True).get()
+
+    def delete(self, *args, **kwargs):
+        note_id = self.id
+        result = super().delete(*args, **kwargs)
+        cache.bump_version(self.author_id)
+        similarity.note_deleted(self.author_id, note_id)
+        return result
+
+
+class NoteRevision(models.Model):
+    """Версия текста заметки: полная копия или разница с предыдущей."""
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+    )
+    number = models.PositiveIntegerField('Номер версии')
+    is_snapshot = models.BooleanField('Полная копия', default=False)
+    data = models.BinaryField('Сжатые данные')
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        ordering = ('number',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'),
+                name='unique_note_revision',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id}: {self.number}'
+
+
+class NoteFingerprint(models.Model):
+    """Ключ полосы MinHash-подписи заметки (см. notes.minhash)."""
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'key'),
+                name='note_fingerprint_idx',
+            ),
+        )
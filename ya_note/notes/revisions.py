@@ -0,0 +1,198 @@
+"""
+История правок текста заметок.
+
+Каждая правка хранится как сжатая построчная разница с предыдущей
+версией. Через каждые NOTE_REVISION_SNAPSHOT_EVERY правок сохраняется
+полная копия текста, поэтому для восстановления любой версии нужно
+прочитать не больше этого числа записей.
+"""
+import json
+import zlib
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+
+from . import minhash, similarity
+
+
+def split_lines(text):
+    """
+    Строки текста вместе с переводами строк, как в сохранённых версиях.
+
+    Сохранённые разницы считаются по str.splitlines(): формат версий
+    не должен меняться, иначе старые разницы применятся к другим строкам.
+    """
+    return text.splitlines(keepends=True)
+
+
+def split_browser_lines(text):
+    """
+    Строки текста так, как их делит браузер: только по '\n'.
+
+    По ним считает разницу автосохранение в форме заметки.
+    """
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def make_delta(old_text, new_text):
+    """
+    Разница между версиями текста.
+
+    Список операций [начало, конец, новые строки]: строки старого текста
+    с начала по конец заменяются новыми строками.
+    """
+    old_lines = split_lines(old_text)
+    new_lines = split_lines(new_text)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        [old_start, old_end, new_lines[new_start:new_end]]
+        for tag, old_start, old_end, new_start, new_end
+        in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def apply_delta(text, delta, split=split_lines):
+    """
+    Применяет разницу к тексту.
+
+    split — как делить текст на строки: по умолчанию как make_delta,
+    для разницы от браузера — split_browser_lines.
+    """
+    lines = split(text)
+    result = []
+    position = 0
+    for start, end, new_lines in delta:
+        result.extend(lines[position:start])
+        result.extend(new_lines)
+        position = end
+    result.extend(lines[position:])
+    return ''.join(result)
+
+
+def validate_delta(delta, line_count):
+    """
+    Проверяет разницу, пришедшую от клиента.
+
+    Операции должны идти по порядку и не выходить за пределы текста.
+    """
+    if not isinstance(delta, list):
+        raise ValueError('Разница должна быть списком операций.')
+    position = 0
+    for operation in delta:
+        if not isinstance(operation, list) or len(operation) != 3:
+            raise ValueError('Операция должна быть списком из трёх частей.')
+        start, end, lines = operation
+        if not all(type(value) is int for value in (start, end)) or not (
+            position <= start <= end <= line_count
+        ):
+            raise ValueError('Неверные границы операции.')
+        if not isinstance(lines, list) or not all(
+            isinstance(line, str) for line in lines
+        ):
+            raise ValueError('Новые строки должны быть списком строк.')
+        position = end
+
+
+def pack(value):
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode())
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data).decode())
+
+
+def is_snapshot_due(number, previous_text):
+    """Полная копия нужна для первой версии и через каждые N правок."""
+    return (
+        previous_text is None
+        or (number - 1) % settings.NOTE_REVISION_SNAPSHOT_EVERY == 0
+    )
+
+
+def record(note, previous_text):
+    """Сохраняет текущую версию текста заметки."""
+    from .models import NoteRevision
+
+    number = note.revision
+    if is_snapshot_due(number, previous_text):
+        return NoteRevision.objects.create(
+            note=note, number=number, is_snapshot=True, data=pack(note.text)
+        )
+    return NoteRevision.objects.create(
+        note=note,
+        number=number,
+        is_snapshot=False,
+        data=pack(make_delta(previous_text, note.text)),
+    )
+
+
+def autosave(note, base_revision, delta):
+    """
+    Применяет к тексту заметки разницу с версией base_revision.
+
+    Текст обновляется, только если в базе всё ещё эта версия, иначе
+    возвращается False: клиент правил устаревший текст. Заголовок и
+    адрес не меняются, поэтому форма и проверка адреса не нужны.
+    """
+    previous_text = note.text
+    validate_delta(delta, len(split_browser_lines(previous_text)))
+    # В историю разница записывается заново, в формате make_delta.
+    text = apply_delta(previous_text, delta, split=split_browser_lines)
+    with transaction.atomic():
+        updated = type(note).objects.filter(
+            pk=note.pk, revision=base_revision
+        ).update(text=text, revision=base_revision + 1)
+        if not updated:
+            return False
+        note.text = text
+        note.revision = base_revision + 1
+        record(note, previous_text)
+        minhash.index_note(note)
+    note._remember_loaded_values()
+    similarity.note_saved(note)
+    return True
+
+
+def reconstruct(note, number):
+    """
+    Текст заметки в версии number.
+
+    Достаточно одного запроса: последняя полная копия находится
+    среди NOTE_REVISION_SNAPSHOT_EVERY предыдущих версий.
+    """
+    revisions = list(note.revisions.filter(
+        number__lte=number,
+        number__gt=number - settings.NOTE_REVISION_SNAPSHOT_EVERY,
+    ).order_by('number'))
+    if not revisions or revisions[-1].number != number:
+        return None
+    snapshot_index = max(
+        (
+            index for index, revision in enumerate(revisions)
+            if revision.is_snapshot
+        ),
+        default=None,
+    )
+    if snapshot_index is None:
+        # Версии записаны при большем NOTE_REVISION_SNAPSHOT_EVERY:
+        # читаем всё от последней полной копии, в худшем случае
+        # от первой версии.
+        snapshot = note.revisions.filter(
+            number__lte=number, is_snapshot=True
+        ).order_by('-number').values_list('number', flat=True).first()
+        if snapshot is None:
+            return None
+        revisions = list(note.revisions.filter(
+            number__gte=snapshot, number__lte=number,
+        ).order_by('number'))
+        snapshot_index = 0
+    text = unpack(revisions[snapshot_index].data)
+    for revision in revisions[snapshot_index + 1:]:
+        text = apply_delta(text, unpack(revision.data))
+    return text
@@ -0,0 +1,178 @@
+"""
+Похожие заметки автора.
+
+Для каждого автора в памяти процесса строится обратный индекс
+TF-IDF по заголовкам и текстам заметок. Индекс строится один раз при
+первом запросе, а затем обновляется при сохранении и удалении заметок.
+Индекс помнит версию кэша заметок автора (см. notes.cache): если
+заметки изменил другой процесс или массовая операция, версия
+расходится и индекс строится заново.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+
+from . import cache
+
+WORD_RE = re.compile(r'\w{3,}')
+# Сколько самых весомых слов заметки участвует в поиске похожих.
+MAX_QUERY_TERMS = 20
+# Слова, которые есть больше чем в такой доле заметок, не учитываются:
+# они почти не влияют на сходство, а перебирать их заметки долго.
+# Короткие списки заметок дёшевы, поэтому их не отбрасываем.
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_SKIPPED_POSTINGS = 100
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def tokenize(title, text):
+    """Частоты слов заметки; слова заголовка весят вдвое больше."""
+    terms = Counter(WORD_RE.findall(text.lower()))
+    for term in WORD_RE.findall(title.lower()):
+        terms[term] += 2
+    return terms
+
+
+class AuthorIndex:
+    """Обратный индекс заметок одного автора."""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.notes = {}
+        self.postings = defaultdict(dict)
+        self.norms = {}
+
+    def add(self, note_id, slug, title, text):
+        self.remove(note_id)
+        weights = {
+            term: 1 + math.log(count)
+            for term, count in tokenize(title, text).items()
+        }
+        for term, weight in weights.items():
+            self.postings[term][note_id] = weight
+        self.notes[note_id] = (slug, title, weights)
+        self.norms[note_id] = math.sqrt(
+            sum(weight * weight for weight in weights.values())
+        ) or 1.0
+
+    def remove(self, note_id):
+        if note_id not in self.notes:
+            return
+        for term in self.notes.pop(note_id)[2]:
+            del self.postings[term][note_id]
+            if not self.postings[term]:
+                del self.postings[term]
+        del self.norms[note_id]
+
+    def idf(self, term):
+        return math.log((1 + len(self.notes)) / (1 + len(self.postings[term])))
+
+    def similar(self, note_id, count):
+        """До count самых похожих заметок: список пар (slug, title)."""
+        if note_id not in self.notes:
+            return []
+        max_frequency = max(
+            MAX_DOCUMENT_FREQUENCY * len(self.notes), MIN_SKIPPED_POSTINGS
+        )
+        query = heapq.nlargest(MAX_QUERY_TERMS, (
+            (weight * self.idf(term), term)
+            for term, weight in self.notes[note_id][2].items()
+            if len(self.postings[term]) <= max_frequency
+        ))
+        scores = defaultdict(float)
+        for query_weight, term in query:
+            idf = self.idf(term)
+            for other_id, weight in self.postings[term].items():
+                scores[other_id] += query_weight * weight * idf
+        scores.pop(note_id, None)
+        best = heapq.nlargest(
+            count, scores, key=lambda other_id: (
+                scores[other_id] / self.norms[other_id]
+            )
+        )
+        return [self.notes[other_id][:2] for other_id in best]
+
+
+def clear():
+    """Удаляет все индексы процесса."""
+    with _lock:
+        _indexes.clear()
+
+
+def _build(author_id, version):
+    from .models import Note
+
+    index = AuthorIndex(version)
+    for note in Note.objects.filter(author_id=author_id).values_list(
+        'id', 'slug', 'title', 'text'
+    ).iterator():
+        index.add(*note)
+    return index
+
+
+def _remember(author_id, index):
+    _indexes[author_id] = index
+    _indexes.move_to_end(author_id)
+    while len(_indexes) > settings.SIMILAR_NOTES_MAX_INDEXES:
+        _indexes.popitem(last=False)
+
+
+def similar_notes(note):
+    """Похожие заметки того же автора: список пар (slug, title)."""
+    version = cache.get_version(note.author_id)
+    with _lock:
+        index = _indexes.get(note.author_id)
+        if index is not None and index.version == version:
+            _remember(note.author_id, index)
+            return index.similar(note.id, settings.SIMILAR_NOTES_COUNT)
+    # Индекс большого автора строится секунды: блокировка на это время
+    # остановила бы страницы и сохранения заметок всех авторов.
+    built = _build(note.author_id, version)
+    with _lock:
+        index = _indexes.get(note.author_id)
+        if index is None or index.version < version:
+            index = built
+        _remember(note.author_id, index)
+        return index.similar(note.id, settings.SIMILAR_NOTES_COUNT)
+
+
+def _apply(author_id, change):
+    """
+    Применяет изменение к индексу автора, если после построения индекса
+    версия сменилась ровно один раз, то есть только этим изменением.
+    Иначе индекс устарел и удаляется.
+    """
+    version = cache.get_version(author_id)
+    with _lock:
+        index = _indexes.get(author_id)
+        if index is None:
+            return
+        if index.version == version - 1:
+            change(index)
+            index.version = version
+        else:
+            del _indexes[author_id]
+
+
+def note_saved(note, previous_author_id=None):
+    """Обновляет индекс после сохранения заметки."""
+    if previous_author_id not in (None, note.author_id):
+        note_deleted(previous_author_id, note.id)
+    if 'text' not in note.__dict__:
+        with _lock:
+            _indexes.pop(note.author_id, None)
+        return
+    _apply(note.author_id, lambda index: index.add(
+        note.id, note.slug, note.title, note.text
+    ))
+
+
+def note_deleted(author_id, note_id):
+    """Убирает удалённую заметку из индекса."""
+    _apply(author_id, lambda index: index.remove(note_id))
@@ -1,10 +1,16 @@
+import threading
+from http import HTTPStatus
 from typing import List, Tuple
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.conf import settings
 
+from notes import similarity
 from notes.models import Note
 
 
@@ -130,3 +136,191 @@ class TestFormNotes(TestCase):
                 url = reverse(name, args=args)
                 response = self.client.get(url)
                 self.assertIn("form", response.context)
+
+
+@override_settings(NOTES_PER_PAGE=2)
+class TestNotesListPagination(TestCase):
+    """
+    Класс для тестирования постраничного вывода списка заметок
+    по курсору.
+    """
+
+    # Константа адреса списка заметок
+    LIST_URL = reverse("notes:list")
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """
+        Создание тестовых данных, нужных для всех тестов этого класса.
+        """
+        cls.author: User = User.objects.create(username="Автор")
+        cls.notes: List[Note] = [
+            Note.objects.create(
+                title=f"Заголовок {index}",
+                text="Текст",
+                slug=f"note-{index}",
+                author=cls.author,
+            )
+            for index in range(3)
+        ]
+
+    def test_pages_follow_cursor(self) -> None:
+        """
+        Первая страница содержит NOTES_PER_PAGE заметок и курсор,
+        следующая страница — оставшиеся заметки без курсора.
+        """
+        self.client.force_login(self.author)
+        response = self.client.get(self.LIST_URL)
+        self.assertEqual(
+            list(response.context["object_list"]), self.notes[:2]
+        )
+        self.assertEqual(response.context["next_cursor"], self.notes[1].id)
+        response = self.client.get(
+            self.LIST_URL, {"cursor": response.context["next_cursor"]}
+        )
+        self.assertEqual(list(response.context["object_list"]), self.notes[2:])
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_invalid_cursor(self) -> None:
+        """
+        Некорректный курсор приводит к ошибке 404.
+        """
+        self.client.force_login(self.author)
+        for cursor in (
+            "abc", "²", "١", str(2 ** 63), "9" * 30, "9" * 5000,
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.LIST_URL, {"cursor": cursor})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TestNotesListProjection(TestCase):
+    """
+    Класс для тестирования того, что список заметок
+    не загружает текст заметок.
+    """
+
+    # Константа адреса списка заметок
+    LIST_URL = reverse("notes:list")
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """
+        Создание тестовых данных, нужных для всех тестов этого класса.
+        """
+        cls.author: User = User.objects.create(username="Автор")
+        cls.big_text: str = "Текст " * 1_000_000
+        Note.objects.create(
+            title="Большая заметка", text=cls.big_text, author=cls.author
+        )
+
+    def test_text_is_deferred(self) -> None:
+        """
+        Текст заметки не выбирается из базы и не попадает в ответ.
+        """
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.LIST_URL)
+        note = response.context["object_list"][0]
+        self.assertIn("text", note.get_deferred_fields())
+        for query in queries.captured_queries:
+            self.assertNotIn('"notes_note"."text"', query["sql"])
+        self.assertLess(len(response.content), len(self.big_text))
+
+
+class TestSimilarNotes(TestCase):
+    """
+    Класс для тестирования блока похожих заметок на странице заметки.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """
+        Создание тестовых данных, нужных для всех тестов этого класса.
+        """
+        cls.author: User = User.objects.create(username="Автор")
+        cls.reader: User = User.objects.create(username="Читатель")
+        cls.borsch: Note = Note.objects.create(
+            title="Рецепт борща", text="Свёкла, капуста, картофель и мясо.",
+            slug="borsch", author=cls.author,
+        )
+        cls.soup: Note = Note.objects.create(
+            title="Суп из свёклы", text="Свёкла и картофель, без мяса.",
+            slug="soup", author=cls.author,
+        )
+        cls.report: Note = Note.objects.create(
+            title="Отчёт", text="Итоги квартала по проекту.",
+            slug="report", author=cls.author,
+        )
+        Note.objects.create(
+            title="Борщ читателя", text="Свёкла, капуста, картофель.",
+            slug="reader-borsch", author=cls.reader,
+        )
+
+    def setUp(self) -> None:
+        similarity.clear()
+        self.client.force_login(self.author)
+
+    def similar(self) -> list:
+        response = self.client.get(
+            reverse("notes:detail", args=(self.borsch.slug,))
+        )
+        return [slug for slug, _ in response.context["similar_notes"]]
+
+    def test_similar_notes_of_same_author(self) -> None:
+        """
+        Похожей считается заметка автора с общими словами,
+        заметки без общих слов и чужие заметки не выводятся.
+        """
+        self.assertEqual(self.similar(), ["soup"])
+
+    def test_index_is_updated_incrementally(self) -> None:
+        """
+        Сохранение и удаление заметок обновляют индекс
+        без его перестроения.
+        """
+        with patch.object(
+            similarity, "_build", wraps=similarity._build
+        ) as build:
+            self.similar()
+            Note.objects.create(
+                title="Борщ", text="Капуста, свёкла и мясо.",
+                slug="borsch-2", author=self.author,
+            )
+            self.assertEqual(self.similar(), ["borsch-2", "soup"])
+            self.soup.delete()
+            self.assertEqual(self.similar(), ["borsch-2"])
+        self.assertEqual(build.call_count, 1)
+
+    def test_build_does_not_block_other_authors(self) -> None:
+        """
+        Пока строится индекс одного автора, похожие заметки
+        другого автора выдаются без ожидания.
+        """
+        self.similar()
+        started, release, built = (
+            threading.Event(), threading.Event(), threading.Event()
+        )
+
+        def slow_build(author_id, version):
+            started.set()
+            release.wait(5)
+            built.set()
+            return similarity.AuthorIndex(version)
+
+        reader_note = Note.objects.get(slug="reader-borsch")
+        with patch.object(similarity, "_build", slow_build):
+            builder = threading.Thread(
+                target=similarity.similar_notes, args=(reader_note,)
+            )
+            builder.start()
+            try:
+                self.assertTrue(started.wait(5))
+                self.assertEqual(
+                    similarity.similar_notes(self.borsch),
+                    [("soup", "Суп из свёклы")],
+                )
+                self.assertFalse(built.is_set())
+            finally:
+                release.set()
+                builder.join()
@@ -1,16 +1,35 @@
+import io
+import json
+import signal
+import subprocess
+import sys
+import urllib.request
+import zipfile
 from http import HTTPStatus
 from functools import wraps
+from unittest.mock import patch
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.test import Client, TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from notes.models import Note
+from notes import archive, cache, minhash, revisions, zipstream
+from notes.models import Note, NoteFingerprint, NoteRevision
 from pytils.translit import slugify
 
 User = get_user_model()
 
+# Общий кэш заметок: сессии и пользователи берутся из кэша.
+shared_cache = override_settings(
+    NOTES_SHARED_CACHE=True,
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+)
+
 
 class TestNoteCreationAndNoteDuplicateSlug(TestCase):
     """
@@ -184,3 +203,815 @@ class TestNoteEditDeleteAndNoteNoneSlug(TestCase):
             ).status_code,
             HTTPStatus.NOT_FOUND,
         )
+
+
+class TestNotesListCache(TestCase):
+    """
+    Класс для тестирования кэша списка заметок: повторный запрос
+    обслуживается из кэша, а любое изменение заметок автора
+    сбрасывает его.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.notes: Note = Note.objects.create(
+            title="Заголовок", text="Текст", author=cls.author
+        )
+        cls.list_url: str = reverse("notes:list")
+
+    def setUp(self) -> None:
+        cache.get_cache().clear()
+        self.client.force_login(self.author)
+
+    def test_second_request_is_cache_hit(self) -> None:
+        self.client.get(self.list_url)
+        self.assertEqual(cache.get_metrics(), {"hit": 0, "miss": 1})
+        response = self.client.get(self.list_url)
+        self.assertEqual(cache.get_metrics(), {"hit": 1, "miss": 1})
+        self.assertIn(self.notes, response.context["object_list"])
+
+    def test_changes_invalidate_cache(self) -> None:
+        self.client.get(self.list_url)
+        changes = (
+            lambda: Note.objects.create(
+                title="Новая", text="Текст", author=self.author
+            ),
+            lambda: Note.objects.filter(
+                author=self.author
+            ).update(title="Обновлённая"),
+            lambda: self.client.post(
+                reverse("notes:delete", args=(self.notes.slug,))
+            ),
+        )
+        for change in changes:
+            with self.subTest(change=change):
+                change()
+                response = self.client.get(self.list_url)
+                self.assertEqual(
+                    list(response.context["object_list"]),
+                    list(Note.objects.filter(author=self.author)),
+                )
+                self.assertEqual(
+                    [note.title for note in response.context["object_list"]],
+                    list(Note.objects.filter(
+                        author=self.author
+                    ).values_list("title", flat=True)),
+                )
+
+
+class TestQueryCache(TestCase):
+    """
+    Класс для тестирования кэша запросов Note.cached: число заметок
+    берётся из кэша, изменения заметок сбрасывают кэш, а устаревшая
+    запись отдаётся, пока её обновляет один фоновый запрос.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        Note.objects.create(title="Первая", text="Текст", author=cls.author)
+        cls.list_url: str = reverse("notes:list")
+
+    def setUp(self) -> None:
+        cache.get_cache().clear()
+        self.client.force_login(self.author)
+
+    def count(self) -> int:
+        return Note.cached.filter(author=self.author).count()
+
+    @shared_cache
+    def test_list_page_served_without_queries(self) -> None:
+        self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.context["note_count"], 1)
+
+    def test_changes_invalidate_cache(self) -> None:
+        self.assertEqual(self.count(), 1)
+        changes = (
+            (lambda: Note.objects.create(
+                title="Вторая", text="Текст", author=self.author
+            ), 2),
+            (lambda: Note.objects.bulk_create([Note(
+                title="Третья", text="Текст", slug="third", author=self.author
+            )]), 3),
+            (lambda: Note.objects.filter(slug="third").delete(), 2),
+            (lambda: Note.objects.get(title="Вторая").delete(), 1),
+        )
+        for change, expected in changes:
+            with self.subTest(expected=expected):
+                change()
+                self.assertEqual(self.count(), expected)
+
+    @override_settings(NOTES_QUERY_CACHE_TIMEOUT=0)
+    def test_stale_rows_refreshed_once(self) -> None:
+        titles = Note.cached.values_list("title", flat=True)
+        self.assertEqual(list(titles.all()), ["Первая"])
+        # Обновление в обход кэша: запрос его не сбрасывает.
+        with patch("notes.cache.bump_model_version"):
+            Note.objects.update(title="Новая")
+        with patch("notes.querycache.submit") as submit:
+            self.assertEqual(list(titles.all()), ["Первая"])
+            self.assertEqual(list(titles.all()), ["Первая"])
+        self.assertEqual(submit.call_count, 1)
+        func, *args = submit.call_args.args
+        func(*args)
+        self.assertEqual(list(titles.all()), ["Новая"])
+
+
+@override_settings(NOTE_REVISION_SNAPSHOT_EVERY=3)
+class TestNoteRevisions(TestCase):
+    """
+    Класс для тестирования истории правок: правки хранятся разницами
+    с периодическими полными копиями, и любая версия восстанавливается.
+    """
+
+    # Количество правок заметки в тесте
+    EDITS: int = 7
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.lines: list = [f"Строка {index}" for index in range(50)]
+        cls.notes: Note = Note.objects.create(
+            title="Заголовок", text="\n".join(cls.lines), author=cls.author
+        )
+        cls.texts: list = [cls.notes.text]
+        for index in range(cls.EDITS):
+            cls.lines[index] = f"Правка {index}"
+            cls.texts.append("\n".join(cls.lines))
+            cls.author_client.post(
+                reverse("notes:edit", args=(cls.notes.slug,)),
+                data={
+                    "title": cls.notes.title,
+                    "text": cls.texts[-1],
+                    "slug": cls.notes.slug,
+                },
+            )
+        cls.notes.refresh_from_db()
+
+    def test_every_revision_is_reconstructed(self) -> None:
+        self.assertEqual(self.notes.revision, len(self.texts))
+        for number, text in enumerate(self.texts, start=1):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    revisions.reconstruct(self.notes, number), text
+                )
+
+    def test_edits_are_stored_as_deltas(self) -> None:
+        stored = NoteRevision.objects.filter(note=self.notes)
+        self.assertEqual(
+            list(stored.filter(is_snapshot=True).values_list(
+                "number", flat=True
+            )),
+            [1, 4, 7],
+        )
+        snapshot_size = len(stored.get(number=1).data)
+        for revision in stored.filter(is_snapshot=False):
+            self.assertLess(len(revision.data), snapshot_size)
+
+    def test_title_change_keeps_revision(self) -> None:
+        self.notes.title = "Новый заголовок"
+        self.notes.save()
+        self.assertEqual(self.notes.revision, len(self.texts))
+
+    def test_history_pages(self) -> None:
+        response = self.author_client.get(
+            reverse("notes:history", args=(self.notes.slug,))
+        )
+        self.assertEqual(
+            len(response.context["revisions"]), len(self.texts)
+        )
+        response = self.author_client.get(
+            reverse("notes:revision", args=(self.notes.slug, 2))
+        )
+        self.assertEqual(response.context["text"], self.texts[1])
+        response = self.author_client.get(
+            reverse("notes:revision", args=(self.notes.slug, 100))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_concurrent_saves_get_distinct_revisions(self) -> None:
+        first = Note.objects.get(pk=self.notes.pk)
+        second = Note.objects.get(pk=self.notes.pk)
+        first.text = "Первая правка"
+        first.save()
+        second.text = "Вторая правка"
+        second.save()
+        self.assertEqual(second.revision, first.revision + 1)
+        self.assertEqual(
+            revisions.reconstruct(second, second.revision), second.text
+        )
+        self.assertEqual(
+            revisions.reconstruct(first, first.revision), first.text
+        )
+
+    def test_failed_revision_rolls_back_text(self) -> None:
+        self.notes.text = "Несохранённый текст"
+        with patch.object(revisions, "record", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.notes.save()
+        self.notes.refresh_from_db()
+        self.assertEqual(self.notes.text, self.texts[-1])
+        self.assertEqual(self.notes.revision, len(self.texts))
+
+    @override_settings(NOTE_REVISION_SNAPSHOT_EVERY=2)
+    def test_snapshot_interval_changed(self) -> None:
+        for number, text in enumerate(self.texts, start=1):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    revisions.reconstruct(self.notes, number), text
+                )
+
+
+class TestCompressedText(TestCase):
+    """
+    Класс для тестирования сжатия текста заметок: большие тексты
+    хранятся сжатыми, короткие и старые несжатые — строкой.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+
+    def stored_type(self, note: Note) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT typeof(text) FROM notes_note WHERE id = %s",
+                [note.id],
+            )
+            return cursor.fetchone()[0]
+
+    def test_large_text_is_compressed(self) -> None:
+        text = "Большой текст заметки. " * 1000
+        note = Note.objects.create(title="Большая", text=text,
+                                   author=self.author)
+        self.assertEqual(self.stored_type(note), "blob")
+        self.assertEqual(Note.objects.get(pk=note.pk).text, text)
+
+    def test_small_and_legacy_text_is_read_as_is(self) -> None:
+        note = Note.objects.create(title="Маленькая", text="Текст",
+                                   author=self.author)
+        self.assertEqual(self.stored_type(note), "text")
+        legacy_text = "Старый текст. " * 1000
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE notes_note SET text = %s WHERE id = %s",
+                [legacy_text, note.id],
+            )
+        self.assertEqual(Note.objects.get(pk=note.pk).text, legacy_text)
+
+
+class TestNotesBulkOperations(TestCase):
+    """
+    Класс для тестирования массового удаления и переименования
+    заметок со страницы списка.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.reader: User = User.objects.create(username="Читатель")
+        cls.author_notes: list = [
+            Note.objects.create(
+                title=f"Заметка {index}", text="Текст",
+                slug=f"author-{index}", author=cls.author,
+            )
+            for index in range(3)
+        ]
+        cls.reader_note: Note = Note.objects.create(
+            title="Чужая", text="Текст", slug="reader", author=cls.reader
+        )
+        cls.list_url: str = reverse("notes:list")
+
+    def setUp(self) -> None:
+        self.client.force_login(self.author)
+        self.selected: list = [
+            self.author_notes[0].id, self.author_notes[1].id,
+        ]
+
+    def test_bulk_delete(self) -> None:
+        response = self.client.post(
+            self.list_url, {"action": "delete", "notes": self.selected}
+        )
+        self.assertRedirects(response, self.list_url)
+        self.assertEqual(
+            list(Note.objects.all()),
+            [self.author_notes[2], self.reader_note],
+        )
+
+    def test_bulk_retitle(self) -> None:
+        self.client.post(
+            self.list_url,
+            {"action": "retitle", "notes": self.selected, "title": "Новое"},
+        )
+        self.assertEqual(
+            list(Note.objects.filter(title="Новое")),
+            self.author_notes[:2],
+        )
+        response = self.client.get(self.list_url)
+        self.assertContains(response, "Новое", count=2)
+
+    def test_bulk_is_single_update(self) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                self.list_url,
+                {"action": "retitle", "notes": self.selected, "title": "Н"},
+            )
+        updates = [query for query in queries.captured_queries
+                   if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+
+    def test_invalid_form(self) -> None:
+        for data in (
+            {"action": "retitle", "notes": self.selected},
+            {"action": "delete", "notes": ["abc"]},
+            {"action": "delete", "notes": ["²"]},
+            {"action": "delete", "notes": [self.reader_note.id]},
+            {"action": "archive", "notes": self.selected},
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(self.list_url, data)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(response.context["form"].errors)
+        self.assertEqual(Note.objects.count(), 4)
+
+
+@override_settings(NOTES_EXPORT_CHUNK_SIZE=2, NOTES_IMPORT_BATCH_SIZE=2)
+class TestNotesArchive(TestCase):
+    """
+    Класс для тестирования выгрузки заметок в архив ZIP
+    и загрузки их обратно.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.reader: User = User.objects.create(username="Читатель")
+        cls.author_notes: list = [
+            Note.objects.create(
+                title=f"Заметка {index}", text=f"Текст\n\n{index}",
+                slug=f"note-{index}", author=cls.author,
+            )
+            for index in range(3)
+        ]
+        Note.objects.create(
+            title="Чужая", text="Текст", slug="other", author=cls.reader
+        )
+
+    def export(self, user: User) -> zipfile.ZipFile:
+        self.client.force_login(user)
+        response = self.client.get(reverse("notes:export"))
+        self.assertTrue(response.streaming)
+        return zipfile.ZipFile(io.BytesIO(b"".join(response)))
+
+    def test_export_contains_only_own_notes(self) -> None:
+        exported = self.export(self.author)
+        self.assertEqual(
+            exported.namelist(),
+            [f"{note.slug}.md" for note in self.author_notes],
+        )
+        self.assertEqual(
+            archive.markdown_to_fields(
+                "note-0.md", exported.read("note-0.md").decode()
+            ),
+            {"title": "Заметка 0", "slug": "note-0", "text": "Текст\n\n0"},
+        )
+
+    def test_import_resolves_slug_collisions(self) -> None:
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as upload:
+            for name in self.export(self.author).namelist():
+                upload.writestr(name, self.export(self.author).read(name))
+            upload.writestr("Без шапки.md", "Просто текст")
+        data.seek(0)
+        data.name = "notes.zip"
+        self.client.force_login(self.reader)
+        response = self.client.post(
+            reverse("notes:import"), {"archive": data}
+        )
+        self.assertRedirects(response, reverse("notes:success"))
+        imported = Note.objects.filter(author=self.reader).exclude(
+            slug="other"
+        )
+        self.assertEqual(
+            [(note.title, note.slug) for note in imported],
+            [("Заметка 0", "note-0-2"), ("Заметка 1", "note-1-2"),
+             ("Заметка 2", "note-2-2"), ("Без шапки", "bez-shapki")],
+        )
+        self.assertEqual(imported[0].text, "Текст\n\n0")
+        for note in imported:
+            with self.subTest(slug=note.slug):
+                self.assertEqual(note.revision, 1)
+                self.assertEqual(revisions.reconstruct(note, 1), note.text)
+                self.assertEqual(
+                    minhash.find_duplicate(self.reader.id, note.text), note
+                )
+
+    def test_import_rejects_non_zip(self) -> None:
+        self.client.force_login(self.reader)
+        data = io.BytesIO(b"not a zip")
+        data.name = "notes.zip"
+        response = self.client.post(
+            reverse("notes:import"), {"archive": data}
+        )
+        self.assertTrue(response.context["form"].errors)
+
+    def test_import_rejects_corrupted_archives(self) -> None:
+        upload = io.BytesIO()
+        with zipfile.ZipFile(upload, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("note.md", "Текст заметки. " * 100)
+        data = upload.getvalue()
+        header = zipfile.sizeFileHeader + len("note.md")
+        # Испорченный поток deflate.
+        deflate = bytearray(data)
+        deflate[header:header + 8] = b"\xff" * 8
+        # Имя не в UTF-8, хотя флаг UTF-8 выставлен.
+        directory = data.rindex(b"PK\x01\x02")
+        name = bytearray(data)
+        name[directory + 8:directory + 10] = (0x800).to_bytes(2, "little")
+        name[directory + zipfile.sizeCentralDir] = 0xFF
+        # Обрезанное поле ZIP64 в центральном каталоге.
+        extra = bytearray(data)
+        extra[directory + 20:directory + 24] = b"\xff" * 4
+        extra[directory + 30:directory + 32] = (4).to_bytes(2, "little")
+        extra[directory + zipfile.sizeCentralDir + len("note.md"):
+              directory + zipfile.sizeCentralDir + len("note.md")] = (
+            b"\x01\x00\x08\x00"
+        )
+        self.client.force_login(self.reader)
+        for label, upload in (
+            ("deflate", deflate), ("name", name), ("zip64", extra),
+        ):
+            with self.subTest(label=label):
+                file = io.BytesIO(bytes(upload))
+                file.name = "notes.zip"
+                response = self.client.post(
+                    reverse("notes:import"), {"archive": file}
+                )
+                self.assertEqual(
+                    response.context["form"].errors["archive"],
+                    ["Архив повреждён."],
+                )
+
+    @override_settings(NOTES_IMPORT_MAX_MEMBER_SIZE=1024)
+    def test_import_rejects_zip_bomb(self) -> None:
+        bomb = io.BytesIO()
+        with zipfile.ZipFile(bomb, "w", zipfile.ZIP_DEFLATED) as upload:
+            upload.writestr("bomb.md", b"0" * 10 * 1024 * 1024)
+        data = bomb.getvalue()
+        # Бомба с честным размером и бомба, которая занижает размер
+        # в центральном каталоге.
+        directory = data.rindex(b"PK\x01\x02")
+        lying = bytearray(data)
+        lying[directory + 24:directory + 28] = (100).to_bytes(4, "little")
+        self.client.force_login(self.reader)
+        for upload in (data, bytes(lying)):
+            with self.subTest(declared=len(upload)):
+                file = io.BytesIO(upload)
+                file.name = "notes.zip"
+                response = self.client.post(
+                    reverse("notes:import"), {"archive": file}
+                )
+                self.assertIn("archive", response.context["form"].errors)
+        with self.assertRaises(zipstream.MemberTooLarge):
+            list(zipstream.ZipStreamReader(
+                io.BytesIO(bytes(lying)), max_member_size=10 ** 9
+            ))
+        self.assertFalse(Note.objects.filter(author=self.reader).exclude(
+            slug="other"
+        ).exists())
+
+    def test_zip64_archive_roundtrip(self) -> None:
+        with patch.object(zipstream, "ZIP64_COUNT_LIMIT", 1):
+            exported = b"".join(
+                archive.export_notes(Note.objects.filter(author=self.author))
+            )
+        self.assertEqual(
+            len(zipfile.ZipFile(io.BytesIO(exported)).namelist()), 3
+        )
+        self.assertEqual(
+            [name for name, _ in zipstream.ZipStreamReader(
+                io.BytesIO(exported)
+            )],
+            [f"{note.slug}.md" for note in self.author_notes],
+        )
+
+
+class TestNoteAutosave(TestCase):
+    """
+    Класс для тестирования автосохранения текста заметки разницей
+    с известной версией.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.reader: User = User.objects.create(username="Читатель")
+        cls.notes: Note = Note.objects.create(
+            title="Заголовок", text="Первая\nВторая\nТретья",
+            slug="autosave", author=cls.author,
+        )
+        cls.url: str = reverse("notes:autosave", args=(cls.notes.slug,))
+
+    def autosave(self, payload, user=None):
+        self.client.force_login(user or self.author)
+        return self.client.post(
+            self.url, json.dumps(payload), content_type="application/json"
+        )
+
+    def test_delta_is_applied(self) -> None:
+        response = self.autosave(
+            {"revision": 1, "delta": [[1, 2, ["Новая вторая\n"]]]}
+        )
+        self.assertEqual(response.json(), {"revision": 2})
+        self.notes.refresh_from_db()
+        self.assertEqual(self.notes.text, "Первая\nНовая вторая\nТретья")
+        self.assertEqual(self.notes.title, "Заголовок")
+        self.assertEqual(revisions.reconstruct(self.notes, 2),
+                         self.notes.text)
+
+    def test_other_line_breaks(self) -> None:
+        # Браузер делит строки только по \n, история — по str.splitlines().
+        self.notes.text = "Первая\rещё\u2028Вторая\nТретья"
+        self.notes.save()
+        response = self.autosave(
+            {"revision": 2, "delta": [[1, 2, ["Новая третья"]]]}
+        )
+        self.assertEqual(response.json(), {"revision": 3})
+        self.notes.refresh_from_db()
+        self.assertEqual(
+            self.notes.text, "Первая\rещё\u2028Вторая\nНовая третья"
+        )
+        for number, text in (
+            (2, "Первая\rещё\u2028Вторая\nТретья"), (3, self.notes.text)
+        ):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    revisions.reconstruct(self.notes, number), text
+                )
+        # Формат сохранённых разниц не меняется.
+        self.assertEqual(
+            revisions.make_delta("а\rб", "а\rв"), [[1, 2, ["в"]]]
+        )
+
+    def test_autosave_loads_note_once(self) -> None:
+        self.autosave({"revision": 1, "delta": []})
+        # Страница заметки строит индекс похожих заметок автора.
+        self.client.get(reverse("notes:detail", args=(self.notes.slug,)))
+        with CaptureQueriesContext(connection) as queries:
+            self.autosave({"revision": 2, "delta": [[0, 1, ["Новая\n"]]]})
+        selects = [query["sql"] for query in queries.captured_queries
+                   if query["sql"].startswith('SELECT "notes_note"')]
+        self.assertEqual(len(selects), 1, selects)
+
+    def test_stale_revision_is_rejected(self) -> None:
+        self.notes.text = "Изменено в другой вкладке"
+        self.notes.save()
+        response = self.autosave({"revision": 1, "delta": []})
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertEqual(response.json(), {"revision": 2})
+
+    def test_invalid_payload(self) -> None:
+        for payload in (
+            {"delta": []},
+            {"revision": 1, "delta": [[2, 1, []]]},
+            {"revision": 1, "delta": [[0, 10, []]]},
+            {"revision": 1, "delta": [[0, 1, "строка"]]},
+        ):
+            with self.subTest(payload=payload):
+                response = self.autosave(payload)
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.notes.refresh_from_db()
+        self.assertEqual(self.notes.revision, 1)
+
+    def test_other_user_cant_autosave(self) -> None:
+        response = self.autosave(
+            {"revision": 1, "delta": []}, user=self.reader
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TestNoteDuplicates(TestCase):
+    """Поиск почти одинаковых заметок автора."""
+
+    TEXT: str = (
+        "Купить молоко, хлеб и сыр в магазине у дома, "
+        "потом забрать посылку на почте до семи вечера"
+    )
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.reader: User = User.objects.create(username="Читатель")
+        cls.notes: Note = Note.objects.create(
+            title="Дела", text=cls.TEXT, author=cls.author
+        )
+        cls.url: str = reverse("notes:add")
+
+    def test_near_duplicate_is_found(self) -> None:
+        self.assertEqual(
+            minhash.find_duplicate(self.author.id, self.TEXT + "!"),
+            self.notes,
+        )
+        self.assertIsNone(
+            minhash.find_duplicate(self.author.id, "Совсем другая заметка")
+        )
+        self.assertIsNone(minhash.find_duplicate(self.reader.id, self.TEXT))
+        self.assertIsNone(minhash.find_duplicate(
+            self.author.id, self.TEXT, exclude_id=self.notes.id
+        ))
+
+    def test_large_near_duplicate_is_found(self) -> None:
+        text = " ".join(f"слово{index % 3000}" for index in range(20000))
+        self.assertGreater(len(minhash.shingles(text)), minhash.MAX_SHINGLES)
+        note = Note.objects.create(title="Большая", text=text,
+                                   author=self.author)
+        self.assertEqual(
+            minhash.find_duplicate(self.author.id, text + " и ещё"), note
+        )
+
+    def test_duplicate_note_is_flagged(self) -> None:
+        self.client.force_login(self.author)
+        response = self.client.post(
+            self.url, {"title": "Снова дела", "text": self.TEXT}, follow=True
+        )
+        self.assertContains(response, "почти такая же уже есть: «Дела»")
+        response = self.client.post(
+            self.url, {"title": "Другое", "text": "Позвонить маме"},
+            follow=True,
+        )
+        self.assertNotContains(response, "почти такая же")
+
+    def test_backfill_restores_fingerprints(self) -> None:
+        NoteFingerprint.objects.all().delete()
+        self.assertIsNone(minhash.find_duplicate(self.author.id, self.TEXT))
+        call_command("backfill_note_fingerprints", stdout=io.StringIO())
+        self.assertEqual(
+            minhash.find_duplicate(self.author.id, self.TEXT), self.notes
+        )
+
+
+class TestServe(TestCase):
+    """Проверяет pre-fork сервер manage.py serve."""
+
+    def test_serve_recycles_workers(self) -> None:
+        server = subprocess.Popen(
+            [sys.executable, "manage.py", "serve", "--bind", "127.0.0.1:0",
+             "--workers", "2", "--max-requests", "2"],
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            address = server.stdout.readline().split()[1].rstrip(",")
+            url = address.rstrip("/") + reverse("users:login")
+            for _ in range(5):
+                with urllib.request.urlopen(url) as response:
+                    self.assertEqual(response.status, HTTPStatus.OK)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            output, errors = server.communicate(timeout=10)
+        counts = [
+            int(line.split()[-1]) for line in output.splitlines()
+            if line.startswith("Воркер")
+        ]
+        self.assertEqual(sum(counts), 5)
+        self.assertGreaterEqual(len(counts), 3)
+        self.assertEqual(max(counts), 2)
+        # По умолчанию кэш заметок в памяти процесса.
+        self.assertIn("Кэш заметок в памяти процесса", errors)
+
+    def test_serve_rejects_bad_arguments(self) -> None:
+        for arguments in (
+            ["--max-requests", "0"],
+            ["--workers", "0"],
+            ["--bind", "127.0.0.1:²"],
+        ):
+            with self.subTest(arguments=arguments):
+                with self.assertRaises(CommandError):
+                    call_command("serve", *arguments)
+
+
+class TestWarmup(TestCase):
+    """Проверяет прогрев процесса перед первым запросом."""
+
+    def test_warmup_reports_stages(self) -> None:
+        from yanote import warmup
+
+        stream = io.StringIO()
+        stages = [name for name, _, _ in warmup.run(stream=stream)]
+        self.assertEqual(
+            stages, ["маршруты", "перевод", "шаблоны", "база данных"]
+        )
+        self.assertIn("итого", stream.getvalue())
+
+
+class TestTemplateCache(TestCase):
+    """Проверяет боевой режим шаблонов."""
+
+    def test_compiled_template_is_reused(self) -> None:
+        from django.template import engines
+
+        engine = engines["django"]
+        self.assertTrue(settings.NOTES_CACHED_TEMPLATES)
+        self.assertIs(
+            engine.get_template("notes/detail.html").template,
+            engine.get_template("notes/detail.html").template,
+        )
+
+
+@shared_cache
+class TestCachedSessionAndUser(TestCase):
+    """
+    Проверяет, что сессия и пользователь берутся из кэша,
+    а сохранение пользователя и выход сбрасывают кэш.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create(username="Кэшированный")
+
+    def setUp(self) -> None:
+        self.client.force_login(self.author)
+
+    def test_cached_pages_make_no_queries(self) -> None:
+        for name in ("notes:home", "notes:success"):
+            with self.subTest(name=name):
+                url = reverse(name)
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.context["user"], self.author)
+
+    def test_user_save_resets_cache(self) -> None:
+        url = reverse("notes:home")
+        self.client.get(url)
+        self.author.save()
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        self.author.set_password("new-password")
+        self.author.save()
+        response = self.client.get(url)
+        self.assertFalse(response.context["user"].is_authenticated)
+
+    def test_logout_resets_cache(self) -> None:
+        url = reverse("notes:home")
+        self.client.get(url)
+        self.client.post(reverse("users:logout"))
+        response = self.client.get(url)
+        self.assertFalse(response.context["user"].is_authenticated)
+
+
+class TestUserWithoutSharedCache(TestCase):
+    """
+    Проверяет, что без общего кэша пользователь каждый раз читается
+    из базы: изменения, сделанные другим процессом, видны сразу.
+    """
+
+    def test_user_is_not_cached(self) -> None:
+        author = User.objects.create(username="Автор")
+        self.client.force_login(author)
+        url = reverse("notes:home")
+        self.client.get(url)
+        User.objects.filter(pk=author.pk).update(username="Другое имя")
+        response = self.client.get(url)
+        self.assertEqual(response.context["user"].username, "Другое имя")
+
+
+@shared_cache
+class TestMutatingViewsQueries(TestCase):
+    """Проверяет, что изменяющие представления загружают заметку один раз."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create(username="Автор")
+        cls.note = Note.objects.create(
+            title="Заголовок", text="Текст", slug="note", author=cls.author
+        )
+
+    def setUp(self) -> None:
+        self.client.force_login(self.author)
+        # Первый запрос кладёт пользователя в кэш.
+        self.client.get(reverse("notes:home"))
+
+    def test_edit(self) -> None:
+        # Заметка; проверка slug формой и моделью; точка сохранения;
+        # номер версии: увеличение и чтение; заметка; версия;
+        # отпечатки: удаление и вставка; конец точки сохранения.
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                reverse("notes:edit", args=(self.note.slug,)),
+                {"title": "Заголовок", "text": "Новый текст", "slug": "note"},
+            )
+        self.assertRedirects(response, reverse("notes:success"))
+
+    def test_delete(self) -> None:
+        # Заметка; версии; отпечатки; заметка.
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                reverse("notes:delete", args=(self.note.slug,))
+            )
+        self.assertRedirects(response, reverse("notes:success"))
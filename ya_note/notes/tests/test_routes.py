@@ -1,8 +1,12 @@
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from notes import cache
+
 from notes.models import Note
 
 User = get_user_model()
@@ -52,6 +56,8 @@ class TestRoutes(TestCase):
             ("notes:add", None),
             ("notes:success", None),
             ("notes:list", None),
+            ("notes:export", None),
+            ("notes:import", None),
             ("users:login", None),
             ("users:logout", None),
             ("users:signup", None),
@@ -80,6 +86,8 @@ class TestRoutes(TestCase):
             ("notes:edit", (self.notes.slug,)),
             ("notes:detail", (self.notes.slug,)),
             ("notes:delete", (self.notes.slug,)),
+            ("notes:history", (self.notes.slug,)),
+            ("notes:revision", (self.notes.slug, self.notes.revision)),
         )
         for user, status in users_statuses:
             # Логиним пользователя в клиенте:
@@ -103,9 +111,13 @@ class TestRoutes(TestCase):
             ("notes:add", None),
             ("notes:success", None),
             ("notes:list", None),
+            ("notes:export", None),
+            ("notes:import", None),
             ("notes:edit", (self.notes.slug,)),
             ("notes:detail", (self.notes.slug,)),
             ("notes:delete", (self.notes.slug,)),
+            ("notes:history", (self.notes.slug,)),
+            ("notes:revision", (self.notes.slug, self.notes.revision)),
         )
         for name, args in urls:
             with self.subTest(name=name):
@@ -113,3 +125,61 @@ class TestRoutes(TestCase):
                 redirect_url = f"{login_url}?next={url}"
                 response = self.client.get(url)
                 self.assertRedirects(response, redirect_url)
+
+
+class TestQueryPlans(TestCase):
+    """
+    Проверяет по EXPLAIN QUERY PLAN, что запросы страниц идут
+    по индексам: без полного просмотра таблиц и без сортировки
+    во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author: User = User.objects.create(username="Автор")
+        cls.note: Note = Note.objects.create(
+            title="Заголовок", text="Текст", author=cls.author
+        )
+        cls.note.text = "Новый текст"
+        cls.note.save()
+
+    def setUp(self) -> None:
+        # Страницы из кэша не покажут запросов.
+        cache.get_cache().clear()
+        self.client.force_login(self.author)
+
+    def assert_indexed(self, queries: list[dict]) -> None:
+        for query in queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                plan = [row[-1] for row in cursor.fetchall()]
+            for step in plan:
+                self.assertFalse(
+                    step.startswith("SCAN") and "INDEX" not in step,
+                    f"Полный просмотр таблицы: {step}\n{query['sql']}",
+                )
+                self.assertNotIn(
+                    "TEMP B-TREE", step,
+                    f"Сортировка без индекса: {step}\n{query['sql']}",
+                )
+
+    def test_page_queries_use_indexes(self) -> None:
+        slug = self.note.slug
+        urls = (
+            ("notes:list", None),
+            ("notes:detail", (slug,)),
+            ("notes:edit", (slug,)),
+            ("notes:delete", (slug,)),
+            ("notes:history", (slug,)),
+            ("notes:revision", (slug, 1)),
+            ("notes:add", None),
+            ("notes:success", None),
+        )
+        for name, args in urls:
+            with self.subTest(name=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assert_indexed(queries.captured_queries)
@@ -8,8 +8,25 @@ urlpatterns = [
     path('', views.Home.as_view(), name='home'),
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
+    path(
+        'autosave/<slug:slug>/',
+        views.NoteAutosave.as_view(),
+        name='autosave'
+    ),
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path(
+        'history/<slug:slug>/',
+        views.NoteHistory.as_view(),
+        name='history'
+    ),
+    path(
+        'history/<slug:slug>/<int:number>/',
+        views.NoteRevisionDetail.as_view(),
+        name='revision'
+    ),
+    path('export/', views.NoteExport.as_view(), name='export'),
+    path('import/', views.NoteImport.as_view(), name='import'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
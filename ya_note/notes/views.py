@@ -1,9 +1,28 @@
+import json
+from http import HTTPStatus
+from zipfile import BadZipFile
+
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.db.models.functions import Length
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.defaultfilters import filesizeformat
 from django.urls import reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
+from . import archive, cache, minhash, revisions, similarity
+from .forms import NoteBulkForm, NoteForm, NoteImportForm
+from .identity import IdentityMapMixin
 from .models import Note
+from .zipstream import MemberTooLarge
+
+# Наибольший id заметки: BigAutoField хранит 64-битное целое.
+MAX_ID = 2 ** 63 - 1
+
+DUPLICATE_WARNING = 'Заметка сохранена, но почти такая же уже есть: «{title}».'
 
 
 class Home(generic.TemplateView):
@@ -16,7 +35,7 @@ class NoteSuccess(LoginRequiredMixin, generic.TemplateView):
     template_name = 'notes/success.html'
 
 
-class NoteBase(LoginRequiredMixin):
+class NoteBase(LoginRequiredMixin, IdentityMapMixin):
     """Базовый класс для остальных CBV."""
     model = Note
     success_url = reverse_lazy('notes:success')
@@ -34,7 +53,12 @@ class NoteCreate(NoteBase, generic.CreateView):
     def form_valid(self, form):
         new_note = form.save(commit=False)
         new_note.author = self.request.user
+        duplicate = minhash.find_duplicate(new_note.author_id, new_note.text)
         new_note.save()
+        if duplicate:
+            messages.warning(
+                self.request, DUPLICATE_WARNING.format(title=duplicate.title)
+            )
         return super().form_valid(form)
 
 
@@ -50,10 +74,179 @@ class NoteDelete(NoteBase, generic.DeleteView):
 
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """
+    Список заметок пользователя.
+
+    Заметки выводятся страницами по NOTES_PER_PAGE штук. Следующая
+    страница начинается после id из параметра cursor, поэтому запрос
+    идёт по индексу (author, id) и не зависит от числа заметок.
+    Страницы кэшируются по автору до изменения его заметок.
+
+    POST-запрос удаляет или переименовывает выбранные заметки
+    одним запросом к базе.
+    """
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        # Шаблон списка выводит только id, slug и заголовок.
+        queryset = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            # isdigit() пропускает «²» и другие цифры Юникода, а id
+            # больше 64-битного SQLite не сравнивает.
+            if not (
+                cursor.isascii() and cursor.isdecimal()
+                and len(cursor) <= len(str(MAX_ID)) and int(cursor) <= MAX_ID
+            ):
+                raise Http404('Некорректный курсор.')
+            queryset = queryset.filter(id__gt=int(cursor))
+        # Одна лишняя запись показывает, есть ли следующая страница.
+        return queryset[:settings.NOTES_PER_PAGE + 1]
+
+    def get_context_data(self, **kwargs):
+        notes = cache.get_list(
+            self.request.user.id,
+            self.request.GET.get('cursor'),
+            lambda: list(self.object_list),
+        )
+        next_cursor = None
+        if len(notes) > settings.NOTES_PER_PAGE:
+            notes = notes[:settings.NOTES_PER_PAGE]
+            next_cursor = notes[-1].id
+        context = super().get_context_data(object_list=notes, **kwargs)
+        context['next_cursor'] = next_cursor
+        context['note_count'] = self.model.cached.filter(
+            author=self.request.user
+        ).count()
+        context.setdefault('form', NoteBulkForm(author=self.request.user))
+        return context
+
+    def post(self, request, *args, **kwargs):
+        form = NoteBulkForm(request.POST, author=request.user)
+        if not form.is_valid():
+            self.object_list = self.get_queryset()
+            return self.render_to_response(self.get_context_data(form=form))
+        notes = form.cleaned_data['notes']
+        if form.cleaned_data['action'] == 'delete':
+            notes.delete()
+        else:
+            notes.update(title=form.cleaned_data['title'])
+        return redirect(request.get_full_path())
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['similar_notes'] = similarity.similar_notes(self.object)
+        return context
+
+
+class NoteHistory(NoteBase, generic.DetailView):
+    """История правок заметки."""
+    template_name = 'notes/history.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['revisions'] = self.object.revisions.defer('data').annotate(
+            size=Length('data')
+        ).order_by('-number')
+        return context
+
+
+class NoteRevisionDetail(NoteBase, generic.DetailView):
+    """Текст заметки в одной из прошлых версий."""
+    template_name = 'notes/revision.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        text = revisions.reconstruct(self.object, self.kwargs['number'])
+        if text is None:
+            raise Http404('Такой версии заметки нет.')
+        context['number'] = self.kwargs['number']
+        context['text'] = text
+        return context
+
+
+class NoteExport(NoteBase, generic.View):
+    """Выгрузка всех заметок пользователя архивом ZIP."""
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            archive.export_notes(self.get_queryset()),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = 'attachment; filename="notes.zip"'
+        return response
+
+
+class NoteImport(NoteBase, generic.FormView):
+    """Загрузка заметок из архива ZIP."""
+    template_name = 'notes/import.html'
+    form_class = NoteImportForm
+
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                archive.import_notes(
+                    form.cleaned_data['archive'], self.request.user
+                )
+        except MemberTooLarge:
+            form.add_error(
+                'archive',
+                'Файлы в архиве должны быть не больше '
+                f'{filesizeformat(settings.NOTES_IMPORT_MAX_MEMBER_SIZE)}.',
+            )
+            return self.form_invalid(form)
+        except BadZipFile:
+            form.add_error('archive', 'Архив повреждён.')
+            return self.form_invalid(form)
+        return super().form_valid(form)
+
+
+class NoteAutosave(NoteBase, generic.View):
+    """
+    Автосохранение текста заметки.
+
+    Принимает JSON {"revision": номер версии, "delta": разница} и
+    возвращает номер новой версии. Если заметку уже изменили,
+    отвечает 409 с номером текущей версии.
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+            base_revision = payload['revision']
+            delta = payload['delta']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse(
+                {'error': 'Ожидается JSON с полями revision и delta.'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        note = get_object_or_404(
+            # Индекс похожих заметок после сохранения читает slug и title.
+            self.get_queryset().only(
+                'id', 'author_id', 'slug', 'title', 'text', 'revision'
+            ),
+            slug=self.kwargs['slug'],
+        )
+        if note.revision != base_revision:
+            return JsonResponse(
+                {'revision': note.revision}, status=HTTPStatus.CONFLICT
+            )
+        try:
+            saved = revisions.autosave(note, base_revision, delta)
+        except ValueError as error:
+            return JsonResponse(
+                {'error': str(error)}, status=HTTPStatus.BAD_REQUEST
+            )
+        if not saved:
+            note.refresh_from_db(fields=('revision',))
+            return JsonResponse(
+                {'revision': note.revision}, status=HTTPStatus.CONFLICT
+            )
+        return JsonResponse({'revision': note.revision})
@@ -0,0 +1,258 @@
+"""
+Потоковая запись и чтение архивов ZIP.
+
+zipfile держит в памяти описание каждого файла архива, поэтому память
+растёт с числом файлов. Здесь центральный каталог при записи
+сбрасывается во временный файл, а при чтении разбирается по одной
+записи, так что расход памяти не зависит от размера архива.
+"""
+import struct
+import tempfile
+import time
+import zlib
+from zipfile import (BadZipFile, ZIP_DEFLATED, ZIP_STORED,
+                     sizeCentralDir, sizeEndCentDir, sizeEndCentDir64,
+                     sizeEndCentDir64Locator, sizeFileHeader,
+                     stringCentralDir, stringEndArchive, stringEndArchive64,
+                     stringEndArchive64Locator, stringFileHeader,
+                     structCentralDir, structEndArchive, structEndArchive64,
+                     structEndArchive64Locator, structFileHeader)
+
+# Бит флагов: имя файла в UTF-8.
+UTF8_FLAG = 0x800
+# Бит флагов: файл зашифрован.
+ENCRYPTED_FLAG = 0x1
+# Идентификатор дополнительного поля ZIP64.
+ZIP64_EXTRA = 0x0001
+ZIP64_COUNT_LIMIT = 0xFFFF
+ZIP64_SIZE_LIMIT = 0xFFFFFFFF
+# Сколько байт центрального каталога держать в памяти.
+SPOOL_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Ошибки разбора, которые в повреждённом архиве означают BadZipFile.
+CORRUPTION_ERRORS = (struct.error, UnicodeDecodeError, zlib.error)
+
+
+def _dos_datetime(timestamp):
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    return (
+        (hour << 11) | (minute << 5) | (second // 2),
+        ((max(year, 1980) - 1980) << 9) | (month << 5) | day,
+    )
+
+
+class ZipStreamWriter:
+    """
+    Пишет архив порциями байт.
+
+    write() возвращает байты очередного файла архива, close() — байты
+    центрального каталога и конца архива.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.count = 0
+        self.directory = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        self.dos_time, self.dos_date = _dos_datetime(time.time())
+
+    def write(self, name, data):
+        name = name.encode()
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        compressed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        header = struct.pack(
+            structFileHeader, stringFileHeader, 20, 0, UTF8_FLAG,
+            ZIP_DEFLATED, self.dos_time, self.dos_date, crc,
+            len(compressed), len(data), len(name), 0,
+        ) + name
+        self._add_to_directory(name, crc, len(compressed), len(data))
+        self.offset += len(header) + len(compressed)
+        self.count += 1
+        return header + compressed
+
+    def _add_to_directory(self, name, crc, compressed_size, size):
+        offset, extra, version = self.offset, b'', 20
+        if offset >= ZIP64_SIZE_LIMIT:
+            offset, version = ZIP64_SIZE_LIMIT, 45
+            extra = struct.pack('<HHQ', ZIP64_EXTRA, 8, self.offset)
+        self.directory.write(struct.pack(
+            structCentralDir, stringCentralDir, version, 3, version, 0,
+            UTF8_FLAG, ZIP_DEFLATED, self.dos_time, self.dos_date, crc,
+            compressed_size, size, len(name), len(extra), 0, 0, 0,
+            0o644 << 16, offset,
+        ) + name + extra)
+
+    def close(self):
+        """Генератор байт центрального каталога и конца архива."""
+        directory_offset = self.offset
+        directory_size = self.directory.tell()
+        self.directory.seek(0)
+        while True:
+            chunk = self.directory.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        self.directory.close()
+        count, size, offset = self.count, directory_size, directory_offset
+        if (count >= ZIP64_COUNT_LIMIT or size >= ZIP64_SIZE_LIMIT
+                or offset >= ZIP64_SIZE_LIMIT):
+            yield struct.pack(
+                structEndArchive64, stringEndArchive64, 44, 45, 45, 0, 0,
+                count, count, size, offset,
+            ) + struct.pack(
+                structEndArchive64Locator, stringEndArchive64Locator, 0,
+                offset + size, 1,
+            )
+            count = min(count, ZIP64_COUNT_LIMIT)
+            size = min(size, ZIP64_SIZE_LIMIT)
+            offset = min(offset, ZIP64_SIZE_LIMIT)
+        yield struct.pack(
+            structEndArchive, stringEndArchive, 0, 0, count, count,
+            size, offset, 0,
+        )
+
+
+class MemberTooLarge(BadZipFile):
+    """Файл архива больше допустимого размера."""
+
+
+class ZipStreamReader:
+    """
+    Читает файлы архива по одному.
+
+    Архив должен поддерживать seek(): загруженный файл Django
+    это умеет. Для повреждённого архива выбрасывается BadZipFile.
+    Файл, который заявлен или распаковывается больше max_member_size
+    байт, не читается дальше предела: выбрасывается MemberTooLarge.
+    """
+
+    def __init__(self, file, max_member_size=None):
+        self.file = file
+        self.max_member_size = max_member_size
+        try:
+            self.count, self.directory_offset = self._find_directory()
+        except CORRUPTION_ERRORS as error:
+            raise BadZipFile(f'Повреждён конец архива: {error}') from error
+
+    def _find_directory(self):
+        self.file.seek(0, 2)
+        file_size = self.file.tell()
+        tail_size = min(file_size, sizeEndCentDir + 0xFFFF)
+        self.file.seek(file_size - tail_size)
+        tail = self.file.read(tail_size)
+        position = tail.rfind(stringEndArchive)
+        if position < 0 or len(tail) - position < sizeEndCentDir:
+            raise BadZipFile('Не найден конец архива ZIP.')
+        record = struct.unpack(
+            structEndArchive, tail[position:position + sizeEndCentDir]
+        )
+        count, offset = record[4], record[6]
+        locator_start = position - sizeEndCentDir64Locator
+        if locator_start >= 0 and tail[
+            locator_start:locator_start + 4
+        ] == stringEndArchive64Locator:
+            locator = struct.unpack(
+                structEndArchive64Locator, tail[locator_start:position]
+            )
+            self.file.seek(locator[2])
+            record = struct.unpack(
+                structEndArchive64, self.file.read(sizeEndCentDir64)
+            )
+            if record[0] != stringEndArchive64:
+                raise BadZipFile('Повреждён конец архива ZIP64.')
+            count, offset = record[7], record[9]
+        return count, offset
+
+    def __iter__(self):
+        """Пары (имя файла, содержимое) для всех файлов архива."""
+        try:
+            yield from self._members()
+        except CORRUPTION_ERRORS as error:
+            raise BadZipFile(f'Повреждён архив: {error}') from error
+
+    def _members(self):
+        position = self.directory_offset
+        for _ in range(self.count):
+            self.file.seek(position)
+            record = self.file.read(sizeCentralDir)
+            if len(record) != sizeCentralDir or (
+                record[:4] != stringCentralDir
+            ):
+                raise BadZipFile('Повреждён центральный каталог архива.')
+            entry = struct.unpack(structCentralDir, record)
+            name = self.file.read(entry[12])
+            extra = self.file.read(entry[13])
+            position += sizeCentralDir + entry[12] + entry[13] + entry[14]
+            flags, method, crc = entry[5], entry[6], entry[9]
+            name = name.decode('utf-8' if flags & UTF8_FLAG else 'cp437')
+            if flags & ENCRYPTED_FLAG or method not in (
+                ZIP_STORED, ZIP_DEFLATED
+            ):
+                continue
+            compressed_size, size, offset = _zip64_values(
+                extra, entry[10], entry[11], entry[18]
+            )
+            if self.max_member_size is not None and (
+                size > self.max_member_size
+            ):
+                raise MemberTooLarge(f'Слишком большой файл: {name}')
+            data = self._read_member(offset, compressed_size, size, method)
+            if zlib.crc32(data) != crc:
+                raise BadZipFile(f'Неверная контрольная сумма: {name}')
+            yield name, data
+
+    def _read_member(self, offset, compressed_size, size, method):
+        self.file.seek(offset)
+        header = self.file.read(sizeFileHeader)
+        if len(header) != sizeFileHeader or header[:4] != stringFileHeader:
+            raise BadZipFile('Повреждён заголовок файла в архиве.')
+        header = struct.unpack(structFileHeader, header)
+        self.file.seek(header[10] + header[11], 1)
+        if method == ZIP_STORED:
+            if compressed_size != size:
+                raise BadZipFile('Неверный размер файла в архиве.')
+            return self.file.read(size)
+        # Распаковываем не больше заявленного размера и ещё байт, чтобы
+        # заметить превышение: маленький архив может развернуться
+        # в гигабайты.
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        parts = []
+        unpacked = 0
+        remaining = compressed_size
+        while remaining:
+            data = self.file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise BadZipFile('Архив обрывается.')
+            remaining -= len(data)
+            while data:
+                part = decompressor.decompress(data, size + 1 - unpacked)
+                unpacked += len(part)
+                if unpacked > size:
+                    raise MemberTooLarge(
+                        'Файл распаковывается больше заявленного размера.'
+                    )
+                parts.append(part)
+                data = decompressor.unconsumed_tail
+        parts.append(decompressor.flush())
+        return b''.join(parts)
+
+
+def _zip64_values(extra, compressed_size, size, offset):
+    """Подставляет значения из поля ZIP64 вместо переполненных."""
+    values = [size, compressed_size, offset]
+    while len(extra) >= 4:
+        kind, length = struct.unpack('<HH', extra[:4])
+        if kind == ZIP64_EXTRA:
+            numbers = iter(struct.unpack(
+                f'<{length // 8}Q', extra[4:4 + length // 8 * 8]
+            ))
+            values = [
+                next(numbers, value) if value == ZIP64_SIZE_LIMIT else value
+                for value in values
+            ]
+            break
+        extra = extra[4 + length:]
+    size, compressed_size, offset = values
+    return compressed_size, size, offset
@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
-from django.core.asgi import get_asgi_application
+# Время запуска отсчитывается до импорта Django и прогрева.
+started = time.perf_counter()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+from yanote import warmup  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
 
 application = get_asgi_application()
+
+if os.environ.get('NOTES_WARMUP') == '1':
+    warmup.run(started)
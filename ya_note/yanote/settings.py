@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -33,12 +34,26 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yanote.urls'
 
+# Боевой режим шаблонов: кэширующий загрузчик читает и разбирает
+# каждый шаблон один раз на процесс, правки видны после перезапуска.
+NOTES_CACHED_TEMPLATES = os.environ.get(
+    'NOTES_CACHED_TEMPLATES', '0' if DEBUG else '1'
+) == '1'
+template_loaders = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if NOTES_CACHED_TEMPLATES:
+    template_loaders = [
+        ('django.template.loaders.cached.Loader', template_loaders),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': template_loaders,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -60,6 +75,53 @@ DATABASES = {
 }
 
 
+# Кэш списков заметок. По умолчанию кэш в памяти процесса; при запуске
+# нескольких процессов укажите общий бэкенд, например
+# NOTES_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# и NOTES_CACHE_LOCATION с каталогом, куда пишет только приложение.
+NOTES_CACHE_BACKEND = os.getenv(
+    'NOTES_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'notes': {
+        'BACKEND': NOTES_CACHE_BACKEND,
+        'LOCATION': os.getenv('NOTES_CACHE_LOCATION', 'notes'),
+    },
+}
+# Сессии и пользователи кэшируются, только если кэш общий для всех
+# процессов: иначе выход из аккаунта или смену пароля увидел бы
+# лишь один воркер manage.py serve.
+NOTES_SHARED_CACHE = not NOTES_CACHE_BACKEND.endswith('.LocMemCache')
+
+NOTES_CACHE_ALIAS = 'notes'
+NOTES_CACHE_TIMEOUT = 300
+NOTES_USER_CACHE_TIMEOUT = 60
+# Кэш запросов (notes.querycache): сколько секунд запись свежая, сколько
+# ещё её можно отдавать, пока она обновляется, и сколько ждать
+# обновления, начатого другим процессом.
+NOTES_QUERY_CACHE_TIMEOUT = 30
+NOTES_QUERY_CACHE_STALE_TIMEOUT = 10 * 60
+NOTES_QUERY_CACHE_LOCK_TIMEOUT = 30
+
+# ModelBackend остаётся в списке: сессии, открытые до кэша
+# пользователей, ссылаются на него и не должны разлогиниться.
+AUTHENTICATION_BACKENDS = [
+    'notes.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# С общим кэшем сессии читаются из кэша заметок, а пишутся и в кэш,
+# и в базу. Без него сессии хранятся только в базе.
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if NOTES_SHARED_CACHE
+    else 'django.contrib.sessions.backends.db'
+)
+SESSION_CACHE_ALIAS = NOTES_CACHE_ALIAS
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
@@ -87,6 +149,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+NOTES_PER_PAGE = 50
+NOTE_REVISION_SNAPSHOT_EVERY = 10
+NOTES_EXPORT_CHUNK_SIZE = 500
+NOTES_IMPORT_BATCH_SIZE = 500
+# Наибольший размер одного файла архива после распаковки.
+NOTES_IMPORT_MAX_MEMBER_SIZE = 5 * 1024 * 1024
+SIMILAR_NOTES_COUNT = 5
+SIMILAR_NOTES_MAX_INDEXES = 100
+NOTE_DUPLICATE_THRESHOLD = 0.9
+
 NUM_NOTE1 = 5
 NUM_NOTE2 = 10
 NOTE_TEXT = "Текст заметки"
@@ -0,0 +1,129 @@
+"""
+Прогрев процесса до первого запроса.
+
+Маршруты, перевод, шаблоны и соединение с базой Django загружает
+лениво, на первых запросах после запуска. run() загружает их заранее
+и печатает в stderr, сколько занял каждый шаг. Включается переменной
+окружения NOTES_WARMUP=1 в wsgi.py и asgi.py; manage.py serve прогревает
+главный процесс всегда.
+"""
+import os
+import sys
+import time
+import warnings
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.loaders import cached
+from django.urls import get_resolver
+from django.utils import translation
+
+
+def load_urls():
+    resolver = get_resolver()
+    # reverse_dict заполняет resolver целиком, вместе с include().
+    with translation.override(settings.LANGUAGE_CODE):
+        resolver.reverse_dict
+    return f'пространств имён: {len(resolver.namespace_dict)}'
+
+
+def load_translations():
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('')
+    return settings.LANGUAGE_CODE
+
+
+def template_names(engine):
+    directories = dict.fromkeys(
+        directory
+        for loader in engine.engine.template_loaders
+        for directory in loader.get_dirs()
+    )
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+
+def is_cached(engine):
+    return any(
+        isinstance(loader, cached.Loader)
+        for loader in engine.engine.template_loaders
+    )
+
+
+def load_templates():
+    """
+    Загружает и один раз рендерит каждый шаблон с пустым контекстом.
+
+    Скомпилированные шаблоны остаются в памяти, только если включён
+    кэширующий загрузчик (NOTES_CACHED_TEMPLATES).
+    """
+    rendered = failed = 0
+    cached_engines = 0
+    with warnings.catch_warnings():
+        # Без запроса {% csrf_token %} предупреждает о пустом токене.
+        warnings.simplefilter('ignore')
+        for engine in engines.all():
+            cached_engines += is_cached(engine)
+            for name in template_names(engine):
+                try:
+                    engine.get_template(name).render({})
+                except Exception:
+                    # Шаблону нужен контекст, который есть только
+                    # у запроса: он всё равно уже скомпилирован.
+                    failed += 1
+                else:
+                    rendered += 1
+    note = f'отрендерено {rendered}, без контекста не вышло {failed}'
+    if not cached_engines:
+        note += ', кэш шаблонов выключен'
+    return note
+
+
+def connect_database():
+    """
+    Открывает соединения с базой.
+
+    Открытое соединение переживёт первый запрос, только если
+    CONN_MAX_AGE это позволяет; модули драйвера загружаются в любом случае.
+    """
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    return f'соединений: {len(connections.all())}'
+
+
+def run(started=None, database=True, stream=sys.stderr):
+    """
+    Прогревает процесс и печатает отчёт.
+
+    started — время time.perf_counter() до загрузки Django, чтобы
+    отчёт показал и её. Без database соединения не открываются:
+    так нужно перед fork(), чтобы воркеры не делили одно соединение.
+    """
+    stages = []
+    if started is not None:
+        stages.append((
+            'запуск Django', time.perf_counter() - started,
+            f'модулей: {len(sys.modules)}',
+        ))
+    steps = [
+        ('маршруты', load_urls),
+        ('перевод', load_translations),
+        ('шаблоны', load_templates),
+    ]
+    if database:
+        steps.append(('база данных', connect_database))
+    for name, step in steps:
+        step_started = time.perf_counter()
+        note = step()
+        stages.append((name, time.perf_counter() - step_started, note))
+    stream.write(f'Прогрев, процесс {os.getpid()}:\n')
+    for name, elapsed, note in stages:
+        stream.write(f'  {name:<14} {elapsed * 1000:8.1f} мс  {note}\n')
+    total = sum(elapsed for _, elapsed, _ in stages)
+    stream.write(f'  {"итого":<14} {total * 1000:8.1f} мс\n')
+    stream.flush()
+    return stages